@@ -30,16 +30,16 @@ Credits to River Tae Smith <river@r-tae.dev> for coming up with the idea!
 """
 
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-import csv
-import re
-import os
-from pathlib import Path
-from collections import defaultdict
-from typing import List, Dict, Set, Any
+from tkinter import ttk
 
+from clippy_stats.app import AnalyzerApp
+from clippy_stats.widgets import VirtualTable
+
+
+class ClippyAnalyzer(AnalyzerApp):
+    # Use (desc) for descending and (asc) for ascending in column headings
+    sort_markers = ('(asc)', '(desc)')
 
-class ClippyAnalyzer:
     def __init__(self):
         self.root = tk.Tk()
         try:
@@ -57,6 +57,8 @@ class ClippyAnalyzer:
         # Define the font for consistent styling for general UI elements
         self.the_font = ("Segoe UI", 14)
         self.setup_ui()
+        # Show the last session's rows first, then load its log in the background
+        self.warm_start()
 
     def setup_ui(self):
         """
@@ -84,6 +86,8 @@ class ClippyAnalyzer:
         file_button_frame.columnconfigure(0, weight=0)
         file_button_frame.columnconfigure(1, weight=1)
         file_button_frame.columnconfigure(2, weight=0)
+        file_button_frame.columnconfigure(3, weight=0)
+        file_button_frame.columnconfigure(4, weight=0)
 
         # Button to select the .org file
         self.select_file_btn = tk.Button(file_button_frame, text="Select .org File", command=self.select_file)
@@ -96,19 +100,46 @@ class ClippyAnalyzer:
         self.file_label.grid(row=0, column=1, sticky=(tk.W, tk.E))
 
         # Button to export data to CSV, initially disabled
-        self.export_btn = tk.Button(file_button_frame, text="Export CSV", command=self.export_csv, state='disabled')
+        self.export_btn = tk.Button(file_button_frame, text="Export", command=self.export_csv, state='disabled')
         self.export_btn["font"] = self.the_font
         self.export_btn.grid(row=0, column=2, padx=(10, 0), sticky=tk.E)
 
+        # Button to keep the table updated while Plover appends to the file
+        self.follow_btn = tk.Button(file_button_frame, text="Follow", command=self.toggle_follow)
+        self.follow_btn["font"] = self.the_font
+        self.follow_btn.grid(row=0, column=3, padx=(10, 0), sticky=tk.E)
+
+        # Button to add the selected file to the history database and rank all history
+        self.history_btn = tk.Button(file_button_frame, text="History", command=self.show_history)
+        self.history_btn["font"] = self.the_font
+        self.history_btn.grid(row=0, column=4, padx=(10, 0), sticky=tk.E)
+
         # Frame to display results in a Treeview
         results_frame = ttk.Frame(main_frame)
         results_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(20, 0))
         results_frame.columnconfigure(0, weight=1)
-        results_frame.rowconfigure(0, weight=1)
+        results_frame.rowconfigure(1, weight=1)
 
-        # Define columns for the Treeview
-        columns = ('Translation', 'Suggestions', 'Severity', 'Count', 'Score')
-        self.tree = ttk.Treeview(results_frame, columns=columns, show='headings', height=15)
+        # Search box above the table: narrows the rows as you type, Escape clears it
+        search_frame = ttk.Frame(results_frame)
+        search_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        search_frame.columnconfigure(1, weight=1)
+
+        search_label = tk.Label(search_frame, text="Search:", anchor="w")
+        search_label["font"] = self.the_font
+        search_label.grid(row=0, column=0, padx=(0, 10), sticky=tk.W)
+
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', self.filter_rows)
+        self.search_entry = tk.Entry(search_frame, textvariable=self.search_var)
+        self.search_entry["font"] = self.the_font
+        self.search_entry.bind('<Escape>', lambda e: self.search_var.set(''))
+        self.search_entry.grid(row=0, column=1, sticky=(tk.W, tk.E))
+
+        # Define columns for the Treeview; only the rows on screen become Tk items
+        columns = ('Translation', 'Suggestions', 'Severity', 'Count', 'Score', 'Strokes saved')
+        self.table = VirtualTable(results_frame, columns, height=15)
+        self.tree = self.table.tree
 
         # Set up column headings and their sort commands
         for col in columns:
@@ -120,16 +151,17 @@ class ClippyAnalyzer:
         self.tree.column('Severity', width=80)
         self.tree.column('Count', width=80)
         self.tree.column('Score', width=80)
+        self.tree.column('Strokes saved', width=100)
 
-        # Add scrollbars to the Treeview
-        v_scrollbar = ttk.Scrollbar(results_frame, orient="vertical", command=self.tree.yview)
+        # Add scrollbars to the Treeview (the vertical one scrolls over all rows)
+        v_scrollbar = self.table.scrollbar
         h_scrollbar = ttk.Scrollbar(results_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.tree.configure(xscrollcommand=h_scrollbar.set)
 
         # Place Treeview and scrollbars in the grid
-        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        self.tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        v_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        h_scrollbar.grid(row=2, column=0, sticky=(tk.W, tk.E))
 
         # Configure Treeview and Treeview.Heading styles for font size
         style = ttk.Style()
@@ -146,187 +178,29 @@ class ClippyAnalyzer:
         results_frame.grid_remove()
         self.results_frame = results_frame
 
-    def select_file(self):
-        """
-        Opens a file dialog for the user to select a .org file.
-        Processes the selected file if one is chosen.
-        """
-        # Set initial directory to Plover's local app data if it exists, otherwise current working directory
-        initial_dir = os.path.expandvars(r'%LOCALAPPDATA%\\plover\\plover')
-        if not os.path.exists(initial_dir):
-            initial_dir = os.getcwd()
-
-        file_path = filedialog.askopenfilename(
-            title="Select Clippy output file",
-            initialdir=initial_dir,
-            filetypes=[("Org files", "*.org"), ("Text files", "*.txt"), ("All files", "*.*")]
-        )
-
-        if file_path:
-            self.file_label.configure(text=f"Selected: {file_path}")
-            self.process_file(file_path)
-
-    def strip_ansi(self, text: str) -> str:
-        """
-        Removes ANSI escape codes from a given string.
-        """
-        ansi_escape = re.compile(r'\x1B\[[0-9;]*[mK]')
-        return ansi_escape.sub('', text)
-
-    def process_file(self, file_path: str):
-        """
-        Reads and processes the content of the selected file.
-        Parses translation entries, suggestions, severity, and calculates scores.
-        Populates self.data_entries and displays results.
-        """
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-
-            # Strip ANSI codes and leading/trailing whitespace from each line
-            lines = [self.strip_ansi(line.strip()) for line in content.split('\n')]
-            # Use defaultdict to store aggregated data for each unique translation
-            entry_map = defaultdict(lambda: {'count': 0, 'severity': 0, 'suggestions': set()})
-
-            for line in lines:
-                # Skip header/footer lines and lines not starting with '*'
-                if line.startswith('START') or line.startswith('END') or not line.startswith('*'):
-                    continue
-                # Regex to extract stars (severity), translation, and suggestion
-                match = re.match(r'^(\*+)\s+(.*?)\s{2,}(.+?)\s*<.+$', line)
-                if not match:
-                    continue
-
-                stars, translation, suggestion = match.groups()
-                severity = len(stars) # Severity is determined by the number of stars
-                entry = entry_map[translation]
-                entry['count'] += 1
-                entry['severity'] = severity
-                entry['suggestions'].add(suggestion) # Use a set to store unique suggestions
-
-            self.data_entries = []
-            # Convert aggregated data into a list of dictionaries for display
-            for translation, data in entry_map.items():
-                suggestions_str = '; '.join(sorted(data['suggestions'])) # Join suggestions with semicolon
-                severity_stars = '*' * data['severity'] # Convert severity back to stars for display
-                score = data['severity'] * data['count'] # Calculate score
-
-                self.data_entries.append({
-                    'translation': translation,
-                    'suggestions': suggestions_str,
-                    'severity_stars': severity_stars,
-                    'severity': data['severity'], # Keep numeric severity for sorting
-                    'count': data['count'],
-                    'score': score
-                })
-
-            # Sort data by score in descending order by default
-            self.data_entries.sort(key=lambda x: x['score'], reverse=True)
-            self.display_results()
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to process file: {str(e)}")
-
-    def display_results(self):
-        """
-        Clears existing Treeview data and populates it with processed data entries.
-        Enables the export button and shows the results frame.
-        """
-        # Clear existing items in the Treeview
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        # Insert new data entries into the Treeview
-        for entry in self.data_entries:
-            self.tree.insert('', 'end', values=(
-                entry['translation'], entry['suggestions'],
-                entry['severity_stars'], entry['count'], entry['score']
-            ))
-
-        # Show the results frame and enable the export button
-        self.results_frame.grid()
-        self.export_btn.configure(state='normal')
-
-    def sort_by_column(self, col: str, reverse: bool):
-        """
-        Sorts the Treeview content by the specified column.
-        Handles numeric and string sorting.
-        Updates column headings to show sort direction.
-        """
-        # Get all items from the Treeview and their values for the specified column
-        data = [(self.tree.set(child, col), child) for child in self.tree.get_children('')]
-        numeric_cols = {'Count', 'Score', 'Severity'} # Columns that should be sorted numerically
-
-        if col in numeric_cols:
-            # Attempt to sort numerically, fallback to string sort if conversion fails
-            try:
-                data.sort(key=lambda x: int(x[0]) if str(x[0]).isdigit() else 0, reverse=reverse)
-            except (ValueError, TypeError):
-                data.sort(key=lambda x: x[0], reverse=reverse)
-        else:
-            # Sort as strings for other columns
-            data.sort(key=lambda x: x[0], reverse=reverse)
-
-        # Rearrange Treeview items based on sorted data
-        for index, (val, child) in enumerate(data):
-            self.tree.move(child, '', index)
-
-        # Update column headings to show sort direction indicators
-        for column in ('Translation', 'Suggestions', 'Severity', 'Count', 'Score'):
-            if column == col:
-                # Use (desc) for descending and (asc) for ascending
-                self.tree.heading(column, text=f"{column} {'(desc)' if reverse else '(asc)'}")
-            else:
-                self.tree.heading(column, text=column)
-
-        # Toggle sort direction for the next click on the same column
-        self.tree.heading(col, command=lambda: self.sort_by_column(col, not reverse))
-
-    def export_csv(self):
-        """
-        Exports the current data entries to a CSV file.
-        Prompts the user for a save location.
-        """
-        if not self.data_entries:
-            messagebox.showwarning("Warning", "No data to export")
-            return
-
-        # Suggest downloads directory or current working directory
-        downloads_dir = Path.home() / "Downloads"
-        if not downloads_dir.exists():
-            downloads_dir = Path.cwd()
-
-        file_path = filedialog.asksaveasfilename(
-            title="Save CSV file",
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-            initialdir=str(downloads_dir),
-            initialfile="sorted_translations.csv"
-        )
-
-        if not file_path:
-            return # User cancelled the save dialog
-
-        try:
-            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                # Write header row
-                writer.writerow(['Translation', 'Suggestions', 'Severity', 'Count', 'Score'])
-                # Write data rows
-                for entry in self.data_entries:
-                    writer.writerow([
-                        entry['translation'], entry['suggestions'],
-                        entry['severity_stars'], entry['count'], entry['score']
-                    ])
-            messagebox.showinfo("Success", f"Data exported to {file_path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export data: {e}")
-
-    def run(self):
-        """
-        Starts the Tkinter event loop.
-        """
-        self.root.mainloop()
+        # Status row: parsing runs in the background and reports its progress here
+        status_frame = ttk.Frame(main_frame)
+        status_frame.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
+        status_frame.columnconfigure(1, weight=1)
+
+        # Progress bar for the file being parsed
+        self.progress_bar = ttk.Progressbar(status_frame, orient="horizontal", length=200, mode="determinate")
+        self.progress_bar.grid(row=0, column=0, padx=(0, 10), sticky=tk.W)
+
+        # Label showing bytes parsed, lines per second and time left
+        self.status_label = tk.Label(status_frame, text="", anchor="w")
+        self.status_label.grid(row=0, column=1, sticky=(tk.W, tk.E))
+
+        # Session selector: pick a preset or type a range such as '-20:' and press Enter
+        self.sessions_box = ttk.Combobox(status_frame, values=list(self.session_choices), width=16)
+        self.sessions_box.set('All sessions')
+        self.sessions_box.bind('<<ComboboxSelected>>', self.select_sessions)
+        self.sessions_box.bind('<Return>', self.select_sessions)
+        self.sessions_box.grid(row=0, column=2, padx=(10, 0), sticky=tk.E)
+
+        # Button to stop parsing; the rows parsed so far stay in the table
+        self.cancel_btn = tk.Button(status_frame, text="Cancel", command=self.cancel_ingest, state='disabled')
+        self.cancel_btn.grid(row=0, column=3, padx=(10, 0), sticky=tk.E)
 
 
 if __name__ == "__main__":
@@ -30,16 +30,13 @@ Credits to River Tae Smith <river@r-tae.dev> for coming up with the idea!
 """
 
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-import csv
-import re
-import os
-from pathlib import Path
-from collections import defaultdict
-from typing import List, Dict, Set, Any
+from tkinter import ttk
 
+from clippy_stats.app import AnalyzerApp
+from clippy_stats.widgets import VirtualTable
 
-class ClippyAnalyzer:
+
+class ClippyAnalyzer(AnalyzerApp):
     def __init__(self):
         self.root = tk.Tk()
         try:
@@ -68,6 +65,7 @@ class ClippyAnalyzer:
         self.current_theme = 'dark'
         self.setup_ui()
         self.apply_theme()
+        self.warm_start()
 
     def setup_ui(self):
         main_frame = ttk.Frame(self.root, padding="20")
@@ -89,6 +87,8 @@ class ClippyAnalyzer:
         button_row.columnconfigure(1, weight=1)
         button_row.columnconfigure(2, weight=0)
         button_row.columnconfigure(3, weight=0)
+        button_row.columnconfigure(4, weight=0)
+        button_row.columnconfigure(5, weight=0)
 
         self.select_file_btn = tk.Button(button_row, text="Select .org File", command=self.select_file)
         self.select_file_btn["font"] = self.the_font
@@ -98,21 +98,43 @@ class ClippyAnalyzer:
         self.file_label["font"] = self.the_font
         self.file_label.grid(row=0, column=1, sticky=(tk.W, tk.E))
 
-        self.export_btn = tk.Button(button_row, text="Export CSV", command=self.export_csv, state='disabled')
+        self.export_btn = tk.Button(button_row, text="Export", command=self.export_csv, state='disabled')
         self.export_btn["font"] = self.the_font
         self.export_btn.grid(row=0, column=2, padx=(10, 10), sticky=tk.E)
 
+        self.follow_btn = tk.Button(button_row, text="Follow", command=self.toggle_follow)
+        self.follow_btn["font"] = self.the_font
+        self.follow_btn.grid(row=0, column=3, padx=(0, 10), sticky=tk.E)
+
+        self.history_btn = tk.Button(button_row, text="History", command=self.show_history)
+        self.history_btn["font"] = self.the_font
+        self.history_btn.grid(row=0, column=4, padx=(0, 10), sticky=tk.E)
+
         self.theme_btn = tk.Button(button_row, text="Toggle Theme", command=self.toggle_theme)
         self.theme_btn["font"] = self.the_font
-        self.theme_btn.grid(row=0, column=3, padx=(0, 0), sticky=tk.E)
+        self.theme_btn.grid(row=0, column=5, padx=(0, 0), sticky=tk.E)
 
         results_frame = ttk.Frame(main_frame)
         results_frame.grid(row=2, column=0, columnspan=3, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(20, 0))
         results_frame.columnconfigure(0, weight=1)
-        results_frame.rowconfigure(0, weight=1)
+        results_frame.rowconfigure(1, weight=1)
+
+        search_row = ttk.Frame(results_frame)
+        search_row.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        search_row.columnconfigure(1, weight=1)
+
+        self.search_label = tk.Label(search_row, text="Search:", anchor="w")
+        self.search_label.grid(row=0, column=0, padx=(0, 10), sticky=tk.W)
 
-        columns = ('Translation', 'Suggestions', 'Severity', 'Count', 'Score')
-        self.tree = ttk.Treeview(results_frame, columns=columns, show='headings', height=15)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', self.filter_rows)
+        self.search_entry = tk.Entry(search_row, textvariable=self.search_var)
+        self.search_entry.bind('<Escape>', lambda e: self.search_var.set(''))
+        self.search_entry.grid(row=0, column=1, sticky=(tk.W, tk.E))
+
+        columns = ('Translation', 'Suggestions', 'Severity', 'Count', 'Score', 'Strokes saved')
+        self.table = VirtualTable(results_frame, columns, height=15)
+        self.tree = self.table.tree
 
         for col in columns:
             self.tree.heading(col, text=col, command=lambda c=col: self.sort_by_column(c, False), anchor="w")
@@ -122,26 +144,50 @@ class ClippyAnalyzer:
         self.tree.column('Severity', width=80)
         self.tree.column('Count', width=80)
         self.tree.column('Score', width=80)
+        self.tree.column('Strokes saved', width=100)
 
-        v_scrollbar = ttk.Scrollbar(results_frame, orient="vertical", command=self.tree.yview)
+        v_scrollbar = self.table.scrollbar
         h_scrollbar = ttk.Scrollbar(results_frame, orient="horizontal", command=self.tree.xview)
-        self.tree.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.tree.configure(xscrollcommand=h_scrollbar.set)
 
-        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        h_scrollbar.grid(row=1, column=0, sticky=(tk.W, tk.E))
+        self.tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        v_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        h_scrollbar.grid(row=2, column=0, sticky=(tk.W, tk.E))
 
         results_frame.grid_remove()
         self.results_frame = results_frame
 
+        status_row = ttk.Frame(main_frame)
+        status_row.grid(row=3, column=0, columnspan=3, sticky=(tk.W, tk.E), pady=(10, 0))
+        status_row.columnconfigure(1, weight=1)
+
+        self.progress_bar = ttk.Progressbar(status_row, orient="horizontal", length=200, mode="determinate")
+        self.progress_bar.grid(row=0, column=0, padx=(0, 10), sticky=tk.W)
+
+        self.status_label = tk.Label(status_row, text="", anchor="w")
+        self.status_label.grid(row=0, column=1, sticky=(tk.W, tk.E))
+
+        self.sessions_box = ttk.Combobox(status_row, values=list(self.session_choices), width=16)
+        self.sessions_box.set('All sessions')
+        self.sessions_box.bind('<<ComboboxSelected>>', self.select_sessions)
+        self.sessions_box.bind('<Return>', self.select_sessions)
+        self.sessions_box.grid(row=0, column=2, padx=(10, 0), sticky=tk.E)
+
+        self.cancel_btn = tk.Button(status_row, text="Cancel", command=self.cancel_ingest, state='disabled')
+        self.cancel_btn.grid(row=0, column=3, padx=(10, 0), sticky=tk.E)
+
     def apply_theme(self):
         theme = self.colors[self.current_theme]
 
         self.root.configure(bg=theme['bg'])
         self.title_label.configure(bg=theme['bg'], fg=theme['accent'])
         self.file_label.configure(bg=theme['bg'], fg=theme['fg'])
+        self.status_label.configure(bg=theme['bg'], fg=theme['fg'])
+        self.search_label.configure(bg=theme['bg'], fg=theme['fg'])
+        self.search_entry.configure(bg=theme['bg_alt'], fg=theme['fg'], insertbackground=theme['fg'])
 
-        for btn in [self.select_file_btn, self.export_btn, self.theme_btn]:
+        for btn in [self.select_file_btn, self.export_btn, self.follow_btn, self.history_btn,
+                    self.theme_btn, self.cancel_btn]:
             btn.configure(bg=theme['button'], fg=theme['button_fg'],
                           activebackground=theme['accent'], activeforeground=theme['button_fg'])
 
@@ -159,139 +205,6 @@ class ClippyAnalyzer:
         self.current_theme = 'light' if self.current_theme == 'dark' else 'dark'
         self.apply_theme()
 
-    def select_file(self):
-        initial_dir = os.path.expandvars(r'%LOCALAPPDATA%\\plover\\plover')
-        if not os.path.exists(initial_dir):
-            initial_dir = os.getcwd()
-
-        file_path = filedialog.askopenfilename(
-            title="Select Clippy output file",
-            initialdir=initial_dir,
-            filetypes=[("Org files", "*.org"), ("Text files", "*.txt"), ("All files", "*.*")]
-        )
-
-        if file_path:
-            self.file_label.configure(text=f"Selected: {file_path}")
-            self.process_file(file_path)
-
-    def strip_ansi(self, text: str) -> str:
-        ansi_escape = re.compile(r'\x1B\[[0-9;]*[mK]')
-        return ansi_escape.sub('', text)
-
-    def process_file(self, file_path: str):
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-
-            lines = [self.strip_ansi(line.strip()) for line in content.split('\n')]
-            entry_map = defaultdict(lambda: {'count': 0, 'severity': 0, 'suggestions': set()})
-
-            for line in lines:
-                if line.startswith('START') or line.startswith('END') or not line.startswith('*'):
-                    continue
-                match = re.match(r'^(\*+)\s+(.*?)\s{2,}(.+?)\s*<.+$', line)
-                if not match:
-                    continue
-
-                stars, translation, suggestion = match.groups()
-                severity = len(stars)
-                entry = entry_map[translation]
-                entry['count'] += 1
-                entry['severity'] = severity
-                entry['suggestions'].add(suggestion)
-
-            self.data_entries = []
-            for translation, data in entry_map.items():
-                suggestions_str = '; '.join(sorted(data['suggestions']))
-                severity_stars = '*' * data['severity']
-                score = data['severity'] * data['count']
-
-                self.data_entries.append({
-                    'translation': translation,
-                    'suggestions': suggestions_str,
-                    'severity_stars': severity_stars,
-                    'severity': data['severity'],
-                    'count': data['count'],
-                    'score': score
-                })
-
-            self.data_entries.sort(key=lambda x: x['score'], reverse=True)
-            self.display_results()
-
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to process file: {str(e)}")
-
-    def display_results(self):
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-
-        for entry in self.data_entries:
-            self.tree.insert('', 'end', values=(
-                entry['translation'], entry['suggestions'],
-                entry['severity_stars'], entry['count'], entry['score']
-            ))
-
-        self.results_frame.grid()
-        self.export_btn.configure(state='normal')
-
-    def sort_by_column(self, col: str, reverse: bool):
-        data = [(self.tree.set(child, col), child) for child in self.tree.get_children('')]
-        numeric_cols = {'Count', 'Score', 'Severity'}
-        if col in numeric_cols:
-            try:
-                data.sort(key=lambda x: int(x[0]) if x[0].isdigit() else 0, reverse=reverse)
-            except (ValueError, TypeError):
-                data.sort(key=lambda x: x[0], reverse=reverse)
-        else:
-            data.sort(key=lambda x: x[0], reverse=reverse)
-
-        for index, (val, child) in enumerate(data):
-            self.tree.move(child, '', index)
-
-        for column in ('Translation', 'Suggestions', 'Severity', 'Count', 'Score'):
-            if column == col:
-                self.tree.heading(column, text=f"{column} {'\u2193' if reverse else '\u2191'}")
-            else:
-                self.tree.heading(column, text=column)
-
-        self.tree.heading(col, command=lambda: self.sort_by_column(col, not reverse))
-
-    def export_csv(self):
-        if not self.data_entries:
-            messagebox.showwarning("Warning", "No data to export")
-            return
-
-        downloads_dir = Path.home() / "Downloads"
-        if not downloads_dir.exists():
-            downloads_dir = Path.cwd()
-
-        file_path = filedialog.asksaveasfilename(
-            title="Save CSV file",
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
-            initialdir=str(downloads_dir),
-            initialfile="sorted_translations.csv"
-        )
-
-        if not file_path:
-            return
-
-        try:
-            with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(['Translation', 'Suggestions', 'Severity', 'Count', 'Score'])
-                for entry in self.data_entries:
-                    writer.writerow([
-                        entry['translation'], entry['suggestions'],
-                        entry['severity_stars'], entry['count'], entry['score']
-                    ])
-            messagebox.showinfo("Success", f"Data exported to {file_path}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to export data: {e}")
-
-    def run(self):
-        self.root.mainloop()
-
 
 if __name__ == "__main__":
     app = ClippyAnalyzer()
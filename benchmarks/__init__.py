@@ -0,0 +1,16 @@
+"""
+Benchmarks for the clippy_stats engine. Run from the repository root, e.g.
+
+    python -m benchmarks.parse_throughput path/to/clippy.org
+
+For comparable runs, generate the input and keep the JSON results:
+
+    python -m benchmarks.generate_log bench.org --size 100M
+    python -m benchmarks.stages bench.org --json before.json
+    python -m benchmarks.stages bench.org --compare before.json
+
+After touching a parser, check that every engine (the page's included)
+still reproduces the golden corpus:
+
+    python -m benchmarks.differential --log bench.org
+"""
@@ -0,0 +1,256 @@
+"""
+Every parser against the golden corpus, with lines/sec per engine.
+
+    python -m benchmarks.differential [--log LOG ...] [--repeat N] [--json PATH]
+    python -m benchmarks.differential --update
+
+benchmarks/corpus holds small logs that exercise what real logs throw at
+the parser: ANSI colours, non-ASCII text and whitespace, malformed
+entries, CRLF line endings, very long lines, a missing final newline and
+translations with more than MAX_SUGGESTIONS suggestions. Next to each
+NAME.org, NAME.json is its expected aggregate: every translation in rank
+order with its totals, its counted suggestions and its row as shown.
+
+Each engine (see ENGINES, plus the browser's parser in index.html when
+Node is installed) must reproduce every golden file exactly. The parallel
+engine splits even these tiny files into ranges, so it is held to the
+suggestion counts only where merging ranges is exact, i.e. where fewer
+than MAX_SUGGESTIONS were kept. Each --log is checked against the serial
+engine instead, and is what makes the lines/sec figures meaningful.
+
+--update rewrites the golden files from the serial engine; review the
+diff before committing it.
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from clippy_stats.batch import aggregate_stream
+from clippy_stats.core import MAX_SUGGESTIONS, Aggregate, aggregate_file, iter_entries, rank, row_values
+from clippy_stats.fastpath import aggregate_mmap
+from clippy_stats.parallel import aggregate_parallel
+from clippy_stats.profiling import Profiler, profile_file
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+CORPUS = os.path.join(BENCHMARKS, 'corpus')
+INDEX_HTML = os.path.join(os.path.dirname(BENCHMARKS), 'index.html')
+PARSER_SCRIPT = re.compile(r'<script id="parser">(.*?)</script>', re.S)
+
+
+def aggregate_serial(file_path: str) -> Aggregate:
+    with open(file_path, 'rb') as file:
+        text = file.read().decode('utf-8')
+    return Aggregate().update(iter_entries(text.split('\n')))
+
+
+def aggregate_batch_stream(file_path: str) -> Aggregate:
+    with open(file_path, 'rb') as file:
+        return aggregate_stream(file)[0]
+
+
+ENGINES: Dict[str, Callable[[str], Aggregate]] = {
+    'serial': aggregate_serial,
+    'stream': aggregate_file,
+    'mmap': aggregate_mmap,
+    'parallel': lambda file_path: aggregate_parallel(file_path, workers=2, min_chunk_bytes=1),
+    'batch': aggregate_batch_stream,
+    'profile': lambda file_path: profile_file(file_path, Profiler()),
+}
+
+# Runs index.html's parser block on each file named in argv, best of
+# REPEAT, and prints one JSON result per file
+JS_RUNNER = """
+const fs = require('fs');
+const repeat = Number(process.argv[1]);
+for (const path of process.argv.slice(2)) {
+  const content = fs.readFileSync(path, 'utf8');
+  let best = Infinity, entryMap, rows;
+  for (let i = 0; i < repeat; i++) {
+    const start = process.hrtime.bigint();
+    entryMap = aggregateLog(content);
+    rows = rankRows(entryMap);
+    best = Math.min(best, Number(process.hrtime.bigint() - start) / 1e9);
+  }
+  const translations = rows.map(row => {
+    const entry = entryMap.get(row.translation);
+    return {
+      translation: row.translation, count: entry.count, total: entry.total, strokes: entry.strokes,
+      severities: entry.severities,
+      suggestions: sortedSuggestions(entry).map(suggestion => [suggestion, entry.suggestions.get(suggestion)]),
+      row: [row.translation, row.suggestions, row.severityStars, row.count, row.score, row.strokes_saved]
+    };
+  });
+  console.log(JSON.stringify({ seconds: best, translations }));
+}
+"""
+
+
+def count_lines(text: bytes) -> int:
+    # As split('\\n') sees them, less the empty piece after a final newline
+    return text.count(b'\n') + (not text.endswith(b'\n') and bool(text))
+
+
+def summarize(aggregate: Aggregate) -> List[Dict[str, Any]]:
+    """
+    The golden form of an aggregate: its translations in rank order.
+    """
+    translations = []
+    for row in rank(aggregate):
+        entry = row.entry
+        counts = entry['suggestions']
+        translations.append({
+            'translation': row.translation,
+            'count': entry['count'],
+            'total': entry['total'],
+            'strokes': entry['strokes'],
+            'severities': entry['severities'],
+            'suggestions': [[suggestion, counts[suggestion]]
+                            for suggestion in sorted(counts, key=lambda s: (-counts[s], s))],
+            'row': list(row_values(row)),
+        })
+    return translations
+
+
+def relax(translations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    translations without what merging ranges may change: the suggestions
+    of translations that filled their counter, and the row columns
+    derived from them.
+    """
+    relaxed = []
+    for translation in translations:
+        if len(translation['suggestions']) >= MAX_SUGGESTIONS:
+            row = translation['row']
+            translation = dict(translation, suggestions=None, row=row[:1] + row[2:5])
+        relaxed.append(translation)
+    return relaxed
+
+
+def first_difference(expected: List[Dict[str, Any]], actual: List[Dict[str, Any]]) -> Optional[str]:
+    for rank_index, (want, got) in enumerate(zip(expected, actual), 1):
+        if want != got:
+            fields = [key for key in want if want[key] != got.get(key)]
+            return f"rank {rank_index}, {want['translation']!r}: {', '.join(fields)} differ"
+    if len(expected) != len(actual):
+        return f"{len(actual)} translations, expected {len(expected)}"
+    return None
+
+
+def time_engine(engine: Callable[[str], Aggregate], file_path: str, repeat: int):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        aggregate = engine(file_path)
+        best = min(best, time.perf_counter() - start)
+    return aggregate, best
+
+
+def run_js(paths: List[str], repeat: int) -> Optional[List[Dict[str, Any]]]:
+    """
+    The browser parser's results for paths, or None without Node.
+    """
+    node = shutil.which('node')
+    if node is None or not paths:
+        return None
+    with open(INDEX_HTML, encoding='utf-8') as file:
+        parser = PARSER_SCRIPT.search(file.read()).group(1)
+    output = subprocess.run([node, '-e', parser + JS_RUNNER, str(repeat), *paths],
+                            capture_output=True, text=True, check=True).stdout
+    # Not splitlines(): JSON leaves U+0085 and U+2028 unescaped
+    return [json.loads(line) for line in output.split('\n') if line]
+
+
+def golden_path(log: str) -> str:
+    return os.path.splitext(log)[0] + '.json'
+
+
+def corpus_logs() -> List[str]:
+    return sorted(os.path.join(CORPUS, name) for name in os.listdir(CORPUS) if name.endswith('.org'))
+
+
+def update_golden():
+    for log in corpus_logs():
+        with open(log, 'rb') as file:
+            lines = count_lines(file.read())
+        translations = summarize(aggregate_serial(log))
+        entries = sum(translation['count'] for translation in translations)
+        # One translation per line, so a changed golden file diffs readably
+        with open(golden_path(log), 'w', encoding='utf-8', newline='\n') as file:
+            file.write(f'{{"lines": {lines}, "entries": {entries}, "translations": [\n')
+            file.write(',\n'.join(json.dumps(translation, ensure_ascii=False) for translation in translations))
+            file.write('\n]}\n' if translations else ']}\n')
+        print(f"{os.path.relpath(golden_path(log))}: {len(translations)} translations")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--log', action='append', default=[], help="also check LOG against the serial engine")
+    parser.add_argument('--repeat', type=int, default=3, help="best of N runs (default: %(default)s)")
+    parser.add_argument('--json', help="save lines/sec per engine to this file")
+    parser.add_argument('--update', action='store_true', help="rewrite the golden files from the serial engine")
+    args = parser.parse_args()
+
+    if args.update:
+        update_golden()
+        return 0
+
+    cases = []  # (log, lines, expected translations)
+    for log in corpus_logs():
+        with open(golden_path(log), encoding='utf-8') as file:
+            golden = json.load(file)
+        cases.append((log, golden['lines'], golden['translations']))
+    for log in args.log:
+        with open(log, 'rb') as file:
+            cases.append((log, count_lines(file.read()), summarize(aggregate_serial(log))))
+
+    failures = 0
+    totals = {name: [0, 0.0] for name in ENGINES}  # lines, seconds
+    for log, lines, expected in cases:
+        name = os.path.relpath(log)
+        for engine_name, engine in ENGINES.items():
+            aggregate, seconds = time_engine(engine, log, args.repeat)
+            actual = summarize(aggregate)
+            if engine_name == 'parallel':
+                difference = first_difference(relax(expected), relax(actual))
+            else:
+                difference = first_difference(expected, actual)
+            totals[engine_name][0] += lines
+            totals[engine_name][1] += seconds
+            if difference:
+                failures += 1
+                print(f"MISMATCH {engine_name} on {name}: {difference}")
+
+    js = run_js([log for log, _, _ in cases], args.repeat)
+    if js is None:
+        print("js: skipped (node not found)")
+    else:
+        totals['js'] = [0, 0.0]
+        for (log, lines, expected), result in zip(cases, js):
+            totals['js'][0] += lines
+            totals['js'][1] += result['seconds']
+            difference = first_difference(expected, result['translations'])
+            if difference:
+                failures += 1
+                print(f"MISMATCH js on {os.path.relpath(log)}: {difference}")
+
+    print(f"{len(cases)} logs, {len(totals)} engines, {failures} mismatches")
+    results = {}
+    for engine_name, (lines, seconds) in totals.items():
+        rate = lines / seconds if seconds else 0.0
+        results[engine_name] = {'lines': lines, 'seconds': seconds, 'lines_per_sec': rate}
+        print(f"{engine_name:>8}: {seconds:8.3f} s  {rate:12,.0f} lines/s")
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
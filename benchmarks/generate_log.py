@@ -0,0 +1,180 @@
+"""
+Deterministic synthetic clippy.org logs for benchmarks.
+
+    python -m benchmarks.generate_log OUT --size 100M [--seed N] [--vocabulary N]
+
+The same options always write the same bytes. Word frequencies follow a
+Zipf distribution, as Clippy misses do: a few translations account for
+most entries. Entries are written in START/END sessions with optional
+ANSI colours and a sprinkling of non-entry lines.
+"""
+
+import argparse
+import itertools
+import random
+import re
+from typing import BinaryIO, Dict, List, Sequence, Tuple
+
+CHUNK_LINES = 10000
+SIZE_UNITS = {'': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30}
+
+CONSONANTS = 'bcdfghjklmnprstvwz'
+VOWELS = 'aeiou'
+ACCENTED = 'éèüöñçå'
+STENO_LEFT = 'STKPWHR'
+STENO_VOWELS = ['A', 'O', 'E', 'U', 'AO', 'AE', 'AOE', 'AU', 'EU', 'OU', 'OE']
+STENO_RIGHT = 'FRPBLGTSDZ'
+
+ANSI_STARS = '\x1b[33m{}\x1b[0m'
+ANSI_SUGGESTION = '\x1b[32m{}\x1b[0m'
+NOISE_LINES = ['', '#+TITLE: Clippy', 'Plover started', '   ', 'error: lost connection to machine']
+
+
+def parse_size(text: str) -> int:
+    """
+    '1M', '512K', '5G' or a plain number of bytes.
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?\s*', text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"invalid size: {text!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def parse_weights(text: str) -> Dict[int, float]:
+    """
+    A severity mix such as '1:40,2:30,3:20,4:10'.
+    """
+    weights = {}
+    for item in text.split(','):
+        severity, weight = item.split(':')
+        weights[int(severity)] = float(weight)
+    return weights
+
+
+def make_words(rng: random.Random, count: int, unicode_share: float) -> List[str]:
+    words, seen = [], set()
+    while len(words) < count:
+        word = ''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(rng.randint(1, 4)))
+        if rng.random() < unicode_share:
+            position = rng.randrange(len(word))
+            word = word[:position] + rng.choice(ACCENTED) + word[position + 1:]
+        if rng.random() < 0.05:
+            # Multi-word translations ("in the") occur too
+            word += ' ' + ''.join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(2))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def make_stroke(rng: random.Random) -> str:
+    left = ''.join(sorted(rng.sample(STENO_LEFT, rng.randint(0, 3)), key=STENO_LEFT.index))
+    right = ''.join(sorted(rng.sample(STENO_RIGHT, rng.randint(0, 3)), key=STENO_RIGHT.index))
+    vowel = rng.choice(STENO_VOWELS) if rng.random() < 0.8 else '-'
+    return left + vowel + right
+
+
+def make_outline(rng: random.Random) -> str:
+    return '/'.join(make_stroke(rng) for _ in range(rng.randint(1, 3)))
+
+
+def make_misses(rng: random.Random, words: Sequence[str]) -> List[List[Tuple[str, str, str]]]:
+    """
+    For each word, one (padding, suggested outline, typed outline) per
+    suggestion Clippy makes for it.
+    """
+    return [[(' ' * rng.randint(2, 6), make_outline(rng), make_outline(rng))
+             for _ in range(rng.choice((1, 1, 1, 2, 2, 3)))]
+            for _ in words]
+
+
+def entry_templates(words: Sequence[str], misses, ansi: bool) -> List[List[str]]:
+    """
+    The entry lines of each word, with the severity stars left as '{}'.
+    """
+    stars = ANSI_STARS if ansi else '{}'
+    suggestion_format = ANSI_SUGGESTION if ansi else '{}'
+    return [[f"{stars} {word}{padding}{suggestion_format.format(suggestion)} < {typed}\n"
+             for padding, suggestion, typed in word_misses]
+            for word, word_misses in zip(words, misses)]
+
+
+def generate(file: BinaryIO, size: int, seed: int = 0, vocabulary: int = 5000,
+             severities: Dict[int, float] = None, zipf: float = 1.1, ansi: float = 1.0,
+             noise: float = 0.05, session_lines: int = 2000, unicode_share: float = 0.01) -> int:
+    """
+    Writes about `size` bytes of log to file, stopping at the first line
+    end past it. Returns the number of lines written.
+    """
+    rng = random.Random(seed)
+    severities = severities or {1: 40, 2: 30, 3: 20, 4: 10}
+    words = make_words(rng, vocabulary, unicode_share)
+    misses = make_misses(rng, words)
+    templates = entry_templates(words, misses, ansi > 0)
+    plain_templates = entry_templates(words, misses, False)
+    word_weights = list(itertools.accumulate(1 / (rank + 1) ** zipf for rank in range(vocabulary)))
+    severity_values = list(severities)
+    severity_weights = list(itertools.accumulate(severities.values()))
+    star_strings = {severity: '*' * severity for severity in severity_values}
+
+    written = lines = 0
+    session = 0
+    left_in_session = 0
+    while written < size:
+        chunk = []
+        picks = rng.choices(range(vocabulary), cum_weights=word_weights, k=CHUNK_LINES)
+        stars = rng.choices(severity_values, cum_weights=severity_weights, k=CHUNK_LINES)
+        for word, severity in zip(picks, stars):
+            if left_in_session == 0:
+                if session:
+                    chunk.append(f"END {session}\n")
+                session += 1
+                chunk.append(f"START {session} 2024-01-01 {session % 24:02d}:00:00\n")
+                left_in_session = max(1, int(rng.expovariate(1 / session_lines)))
+            left_in_session -= 1
+            if rng.random() < noise:
+                chunk.append(rng.choice(NOISE_LINES) + '\n')
+            source = templates if ansi >= 1 or rng.random() < ansi else plain_templates
+            options = source[word]
+            chunk.append(options[rng.randrange(len(options))].format(star_strings[severity]))
+        data = ''.join(chunk).encode('utf-8')
+        if written + len(data) > size:
+            # Cut at the first line end past size so the file ends cleanly
+            cut = data.find(b'\n', size - written) + 1 or len(data)
+            data = data[:cut]
+        file.write(data)
+        written += len(data)
+        lines += data.count(b'\n')
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('output')
+    parser.add_argument('--size', type=parse_size, default=parse_size('10M'),
+                        help="approximate file size, e.g. 1M or 5G (default: 10M)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--vocabulary', type=int, default=5000, metavar='N',
+                        help="distinct translations (default: %(default)s)")
+    parser.add_argument('--zipf', type=float, default=1.1, metavar='S',
+                        help="skew of the word frequencies (default: %(default)s)")
+    parser.add_argument('--severities', type=parse_weights, default=parse_weights('1:40,2:30,3:20,4:10'),
+                        metavar='MIX', help="severity weights (default: 1:40,2:30,3:20,4:10)")
+    parser.add_argument('--ansi', type=float, default=1.0, metavar='SHARE',
+                        help="share of entries with ANSI colours (default: %(default)s)")
+    parser.add_argument('--noise', type=float, default=0.05, metavar='SHARE',
+                        help="share of extra non-entry lines (default: %(default)s)")
+    parser.add_argument('--session-lines', type=int, default=2000, metavar='N',
+                        help="mean entries per START/END session (default: %(default)s)")
+    parser.add_argument('--unicode', type=float, default=0.01, metavar='SHARE',
+                        help="share of words with a non-ASCII letter (default: %(default)s)")
+    args = parser.parse_args()
+
+    with open(args.output, 'wb') as file:
+        lines = generate(file, args.size, args.seed, args.vocabulary, args.severities, args.zipf,
+                         args.ansi, args.noise, args.session_lines, args.unicode)
+    print(f"{args.output}: {lines:,} lines")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Lines/sec of the streaming parser against the mmap fast path.
+
+    python -m benchmarks.parse_throughput LOG [--repeat N]
+"""
+
+import argparse
+import os
+import time
+
+from clippy_stats.core import aggregate_file, rank
+from clippy_stats.fastpath import aggregate_mmap
+
+ENGINES = {
+    'stream': aggregate_file,
+    'mmap': aggregate_mmap,
+}
+
+
+def count_lines(file_path: str) -> int:
+    lines = 0
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            lines += block.count(b'\n')
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('log')
+    parser.add_argument('--repeat', type=int, default=3, help="best of N runs (default: %(default)s)")
+    args = parser.parse_args()
+
+    lines = count_lines(args.log)
+    size = os.path.getsize(args.log)
+    print(f"{args.log}: {size / 2**20:.1f} MiB, {lines} lines")
+
+    results = {}
+    for name, engine in ENGINES.items():
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            aggregate = engine(args.log)
+            best = min(best, time.perf_counter() - start)
+        results[name] = rank(aggregate)
+        print(f"{name:>8}: {best:7.3f} s  {lines / best:12,.0f} lines/s  {size / 2**20 / best:8.1f} MiB/s")
+
+    baseline = results['stream']
+    for name, rows in results.items():
+        if rows != baseline:
+            print(f"warning: {name} disagrees with the streaming parser")
+
+
+if __name__ == '__main__':
+    main()
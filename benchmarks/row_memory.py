@@ -0,0 +1,63 @@
+"""
+Memory held by the ranked rows, compared with the old six-key dict rows.
+
+    python -m benchmarks.row_memory LOG
+"""
+
+import argparse
+import gc
+import tracemalloc
+
+from clippy_stats.core import aggregate_file, rank
+
+
+def dict_rows(aggregate):
+    """
+    The rows as rank() built them before Row: one dict per translation
+    holding eagerly joined suggestions and severity stars.
+    """
+    data_entries = []
+    for translation, data in aggregate.entry_map.items():
+        data_entries.append({
+            'translation': translation,
+            'suggestions': '; '.join(sorted(data['suggestions'])),
+            'severity_stars': '*' * len(data['severities']),
+            'severity': len(data['severities']),
+            'count': data['count'],
+            'score': data['total']
+        })
+    data_entries.sort(key=lambda x: x['score'], reverse=True)
+    return data_entries
+
+
+def retained(build, aggregate) -> int:
+    """
+    Bytes still allocated after build(aggregate), while its result is alive.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rows = build(aggregate)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del rows
+    return after - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('log')
+    args = parser.parse_args()
+
+    aggregate = aggregate_file(args.log)
+    translations = len(aggregate)
+    print(f"{args.log}: {translations} translations")
+
+    results = {'dict rows': retained(dict_rows, aggregate), 'Row': retained(rank, aggregate)}
+    for name, size in results.items():
+        print(f"{name:>10}: {size / 2**20:8.1f} MiB  {size / max(1, translations):6.0f} bytes/row")
+    print(f"reduction: {results['dict rows'] / max(1, results['Row']):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,304 @@
+"""
+Time each stage of the analyzer on one log and save the results as JSON.
+
+    python -m benchmarks.stages LOG [--repeat N] [--json OUT] [--compare OLD.json]
+
+Stages run in pipeline order and each one works on the previous stage's
+output, held in memory, so keep LOG to a few hundred MiB; the
+aggregate_file and aggregate_mmap stages stream and show end-to-end
+throughput at any size. Every stage reports its best time of --repeat
+runs, its throughput and the peak memory traced during one extra run.
+display_results and sort_by_column drive a real (withdrawn) Tk window and
+are skipped where no display is available.
+
+Make inputs with benchmarks.generate_log for runs that can be compared.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from clippy_stats.columnar import EventTable, load_numpy
+from clippy_stats.core import COLUMNS, Aggregate, aggregate_file, iter_entries, iter_lines, rank, strip_ansi
+from clippy_stats.export import export_rows
+from clippy_stats.fastpath import aggregate_mmap
+from clippy_stats.search import SearchIndex
+from clippy_stats.view import RowIndex
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+FORMAT_VERSION = 1
+
+
+class Stage(NamedTuple):
+    name: str
+    run: Callable[[Dict[str, Any]], Any]   # takes the shared state, returns its output
+    unit: str                              # what the stage processes: lines, entries or rows
+    setup: Optional[Callable[[Dict[str, Any]], None]] = None   # untimed, before each run
+    needs_tk: bool = False
+
+
+def read_lines(state):
+    with open(state['log'], 'rb') as file:
+        state['lines'] = list(iter_lines(file))
+
+
+def strip_lines(state):
+    return [strip_ansi(line) for line in state['lines']]
+
+
+def parse_lines(state):
+    state['entries'] = list(iter_entries(state['lines']))
+
+
+def aggregate_entries(state):
+    state['aggregate'] = Aggregate().update(state['entries'])
+
+
+def rank_rows(state):
+    state['rows'] = rank(state['aggregate'])
+
+
+def index_rows(state):
+    state['search_index'] = SearchIndex(state['rows'])
+
+
+def sort_stage(column: str) -> Stage:
+    def setup(state):
+        state['row_index'] = RowIndex(state['rows'])
+
+    def run(state):
+        state['row_index'].order(column)
+
+    return Stage(f"sort:{column}", run, 'rows', setup)
+
+
+def display_results(state):
+    app = state['app']
+    app.data_entries, app.search_index = state['rows'], state['search_index']
+    app.display_results()
+    app.root.update()
+
+
+def sort_by_column_stage(column: str) -> Stage:
+    def setup(state):
+        state['app'].row_index.invalidate()
+
+    def run(state):
+        state['app'].sort_by_column(column, False)
+        state['app'].root.update()
+
+    return Stage(f"sort_by_column:{column}", run, 'rows', setup, needs_tk=True)
+
+
+def event_table(state):
+    state['event_table'] = EventTable(state['log'])
+    state['event_table'].update()
+
+
+def group_by_stage(keys: str, aggregations: str = 'count,score') -> Stage:
+    def run(state):
+        state['event_table'].group_by(keys.split(','), aggregations.split(','))
+
+    # NumPy, when installed, is imported on the first group_by; keep that out of the timing
+    return Stage(f"group_by:{keys}", run, 'entries', lambda state: load_numpy())
+
+
+def export_stage(name: str) -> Stage:
+    def run(state):
+        export_rows(state['rows'], os.path.join(state['directory'], name))
+
+    return Stage(f"export:{name}", run, 'rows')
+
+
+STAGES: List[Stage] = [
+    Stage('read', read_lines, 'lines'),
+    Stage('strip_ansi', strip_lines, 'lines'),
+    Stage('parse', parse_lines, 'lines'),
+    Stage('aggregate', aggregate_entries, 'entries'),
+    Stage('aggregate_file', lambda state: aggregate_file(state['log']), 'lines'),
+    Stage('aggregate_mmap', lambda state: aggregate_mmap(state['log']), 'lines'),
+    Stage('rank', rank_rows, 'rows'),
+    Stage('search_index', index_rows, 'rows'),
+    *(sort_stage(column) for column in COLUMNS),
+    Stage('display_results', display_results, 'rows', needs_tk=True),
+    *(sort_by_column_stage(column) for column in COLUMNS),
+    Stage('event_table', event_table, 'lines'),
+    group_by_stage('translation', 'count,score,strokes,max_severity'),
+    group_by_stage('suggestion', 'translations,count'),
+    group_by_stage('suggestion,severity'),
+    group_by_stage('session'),
+    *(export_stage(name) for name in ('rows.csv', 'rows.csv.gz', 'rows.jsonl', 'rows.sqlite')),
+]
+BYTE_STAGES = {'read', 'aggregate_file', 'aggregate_mmap', 'event_table'}
+
+
+def make_app():
+    """
+    An AnalyzerApp on a withdrawn Tk root with the widgets it needs, or
+    None and the reason when Tk cannot open a window.
+    """
+    try:
+        import tkinter as tk
+        from tkinter import ttk
+        from clippy_stats.app import AnalyzerApp
+        from clippy_stats.widgets import VirtualTable
+        root = tk.Tk()
+    except Exception as e:  # no tkinter, or no display
+        return None, str(e)
+    root.withdraw()
+
+    app = AnalyzerApp.__new__(AnalyzerApp)
+    app.root = root
+    app.results_frame = ttk.Frame(root)
+    app.table = VirtualTable(app.results_frame, COLUMNS, height=40)
+    app.tree = app.table.tree
+    app.tree.grid(row=0, column=0)
+    for name in ('file_label', 'status_label'):
+        setattr(app, name, tk.Label(app.results_frame))
+    for name in ('export_btn', 'follow_btn', 'history_btn', 'cancel_btn'):
+        setattr(app, name, tk.Button(app.results_frame))
+    app.progress_bar = ttk.Progressbar(app.results_frame)
+    app.sessions_box = ttk.Combobox(app.results_frame)
+    app.search_var = tk.StringVar(root)
+    app.data_entries = []
+    return app, None
+
+
+def measure(stage: Stage, state: Dict[str, Any], repeat: int, memory: bool) -> Dict[str, Any]:
+    best = float('inf')
+    for _ in range(repeat):
+        if stage.setup is not None:
+            stage.setup(state)
+        gc.collect()
+        start = time.perf_counter()
+        stage.run(state)
+        best = min(best, time.perf_counter() - start)
+    result = {'name': stage.name, 'seconds': best}
+
+    if memory:
+        if stage.setup is not None:
+            stage.setup(state)
+        gc.collect()
+        tracemalloc.start()
+        stage.run(state)
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def run_stages(log: str, repeat: int = 3, memory: bool = True,
+               only: Optional[List[str]] = None) -> Dict[str, Any]:
+    size = os.path.getsize(log)
+    with open(log, 'rb') as file:
+        lines = sum(block.count(b'\n') for block in iter(lambda: file.read(1 << 20), b''))
+    app, no_tk = make_app()
+    state: Dict[str, Any] = {'log': log, 'app': app}
+    results = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        state['directory'] = directory
+        for stage in STAGES:
+            # Earlier stages still run when filtered out; later ones need their output
+            wanted = not only or any(stage.name.startswith(prefix) for prefix in only)
+            if stage.needs_tk and app is None:
+                if wanted:
+                    results.append({'name': stage.name, 'skipped': no_tk})
+                    print(format_result(results[-1]), file=sys.stderr)
+                continue
+            if not wanted:
+                if stage.setup is not None:
+                    stage.setup(state)
+                stage.run(state)
+                continue
+            result = measure(stage, state, repeat, memory)
+            items = {'lines': lines, 'entries': len(state.get('entries', ())),
+                     'rows': len(state.get('rows', ()))}[stage.unit]
+            result.update(items=items, unit=stage.unit,
+                          per_second=items / result['seconds'] if result['seconds'] else None)
+            if stage.name in BYTE_STAGES:
+                result['mib_per_second'] = size / 2**20 / result['seconds'] if result['seconds'] else None
+            results.append(result)
+            print(format_result(result), file=sys.stderr)
+    if app is not None:
+        app.root.destroy()
+
+    meta = {
+        'log': os.path.abspath(log),
+        'bytes': size,
+        'lines': lines,
+        'translations': len(state.get('rows', ())),
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    }
+    if resource is not None:
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        meta['max_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    return {'version': FORMAT_VERSION, 'meta': meta, 'stages': results}
+
+
+def format_result(result: Dict[str, Any]) -> str:
+    if 'skipped' in result:
+        return f"{result['name']:>28}: skipped ({result['skipped']})"
+    text = (f"{result['name']:>28}: {result['seconds'] * 1000:10.1f} ms"
+            f"  {result['per_second'] or 0:14,.0f} {result['unit']}/s")
+    if 'mib_per_second' in result:
+        text += f"  {result['mib_per_second']:8.1f} MiB/s"
+    if 'peak_bytes' in result:
+        text += f"  peak {result['peak_bytes'] / 2**20:8.1f} MiB"
+    return text
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> str:
+    """
+    Each stage's time against the baseline run; above 1.00x is faster now.
+    """
+    old = {stage['name']: stage for stage in baseline['stages'] if 'seconds' in stage}
+    lines = [f"{'stage':>28}  {'before':>10}  {'after':>10}  speedup"]
+    for stage in current['stages']:
+        before = old.get(stage['name'])
+        if before is None or 'seconds' not in stage:
+            continue
+        lines.append(f"{stage['name']:>28}  {before['seconds'] * 1000:8.1f}ms  {stage['seconds'] * 1000:8.1f}ms"
+                     f"  {before['seconds'] / stage['seconds']:6.2f}x")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('log')
+    parser.add_argument('--repeat', type=int, default=3, help="best of N runs (default: %(default)s)")
+    parser.add_argument('--json', metavar='OUT', help="write the results here ('-' for stdout)")
+    parser.add_argument('--compare', metavar='OLD', help="print speedups against an earlier --json file")
+    parser.add_argument('--stages', nargs='+', metavar='NAME',
+                        help="only report stages whose names start with these")
+    parser.add_argument('--no-memory', action='store_true', help="skip the traced peak-memory runs")
+    args = parser.parse_args()
+
+    results = run_stages(args.log, args.repeat, not args.no_memory, args.stages)
+    if args.json == '-':
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    elif args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            print(compare(json.load(file), results))
+
+
+if __name__ == '__main__':
+    main()
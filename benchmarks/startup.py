@@ -0,0 +1,86 @@
+"""
+Time from launching the GUI to its first painted window.
+
+    python -m benchmarks.startup LOG [--repeat N] [--script PATH] [--cold]
+
+Each run starts a fresh interpreter that opens the GUI script the way a
+double-click would, except that the window is shown through warm_start
+and closed right after the first paint. LOG is analyzed once beforehand
+and saved as the snapshot the runs warm-start from; with --cold there is
+no snapshot and the window paints empty. Reported per run: the app's own
+first_paint (process start to painted window) and the wall time the
+parent saw until the child printed it. The budget is BUDGET_MS.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from clippy_stats.core import aggregate_file, rank
+from clippy_stats.snapshot import save_snapshot
+
+BUDGET_MS = 300
+DEFAULT_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Clippy analyzer.py')
+
+CHILD = """
+import importlib.util, json, sys
+from clippy_stats.app import AnalyzerApp
+AnalyzerApp.snapshot_path = sys.argv[2] or None
+spec = importlib.util.spec_from_file_location('clippy_gui', sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+app = module.ClippyAnalyzer()
+print(json.dumps({'first_paint': app.first_paint, 'rows': len(app.data_entries)}), flush=True)
+app.root.destroy()
+"""
+
+
+def run_once(script: str, snapshot_path: str) -> dict:
+    start = time.perf_counter()
+    child = subprocess.Popen([sys.executable, '-c', CHILD, script, snapshot_path],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                             cwd=os.path.dirname(os.path.abspath(script)))
+    line = child.stdout.readline()
+    wall = time.perf_counter() - start
+    _, errors = child.communicate()
+    if not line:
+        raise RuntimeError(errors.strip().splitlines()[-1] if errors.strip() else "the GUI exited early")
+    return dict(json.loads(line), wall=wall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('log')
+    parser.add_argument('--repeat', type=int, default=5, help="runs to take the median of (default: %(default)s)")
+    parser.add_argument('--script', default=DEFAULT_SCRIPT, help="GUI script to launch (default: %(default)s)")
+    parser.add_argument('--cold', action='store_true', help="start without a snapshot")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot_path = ''
+        if not args.cold:
+            snapshot_path = os.path.join(directory, 'bench.snapshot')
+            rows = rank(aggregate_file(args.log))
+            save_snapshot(args.log, rows, len(rows), snapshot_path=snapshot_path)
+        try:
+            runs = [run_once(args.script, snapshot_path) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"startup: skipped ({e})", file=sys.stderr)
+            return 1
+
+    for i, run in enumerate(runs, 1):
+        print(f"run {i}: first paint {run['first_paint'] * 1000:7.1f} ms  wall {run['wall'] * 1000:7.1f} ms"
+              f"  {run['rows']:,} rows")
+    median = statistics.median(run['first_paint'] for run in runs) * 1000
+    verdict = 'within' if median <= BUDGET_MS else 'OVER'
+    print(f"median first paint {median:.1f} ms, {verdict} the {BUDGET_MS} ms budget")
+    return 0 if median <= BUDGET_MS else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,35 @@
+"""
+Clippy Stats - headless analysis engine behind the Clippy Analyzer GUIs.
+
+Only clippy_stats.app imports tkinter; everything re-exported here runs
+without a display. The daemon's names are imported on first use, so the
+GUI's start-up does not pay for asyncio.
+"""
+
+from .core import (
+    ANSI_ESCAPE, COLUMNS, ENTRY_PATTERN, Aggregate, aggregate_file, analyze_file,
+    entry_row, export_csv, iter_entries, iter_lines, match_entry, merge_all, parse_line, rank, row_values,
+    strip_ansi, write_csv,
+)
+from .batch import aggregate_batch, decompressor, expand_inputs
+from .cache import AggregateCache, aggregate_file_cached, open_follower
+from .columnar import Breakdown, EventTable, EventTableCache, open_event_table
+from .compare import DeltaRow, SideLoader, compare
+from .export import ExportWorker, export_rows
+from .follow import LogFollower, make_watcher
+from .heavy import HeavyHitters
+from .history import HistoryStore
+from .ingest import HistoryWorker, IngestWorker, Progress
+from .parallel import aggregate_parallel, aggregate_span
+from .profiling import Profiler, profile_file
+from .search import SearchIndex
+from .sessions import SessionIndex, SessionIndexCache, open_session_index, parse_session_range
+from .snapshot import Snapshot, load_snapshot, save_snapshot
+from .strokes import StrokeIndex, StrokeIndexCache, load_stroke_index, plover_dictionaries
+
+
+def __getattr__(name):
+    if name in ('LogServer', 'serve'):
+        from . import server
+        return getattr(server, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
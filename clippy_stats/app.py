@@ -0,0 +1,474 @@
+"""
+Tk behaviour shared by both Clippy Analyzer front-ends.
+
+The scripts own their window layout and styling; everything that touches
+the data goes through the headless core.
+"""
+
+from tkinter import filedialog, messagebox
+import os
+import queue
+import time
+from pathlib import Path
+
+from .cache import AggregateCache
+from .core import COLUMNS, copy_entry, entry_row, rank
+from .export import ExportWorker
+from .follow import make_watcher
+from .history import default_history_path
+from .batch import is_compressed
+from .ingest import BatchWorker, HistoryWorker, IngestWorker, SessionWorker
+from .parallel import default_workers
+from .profiling import process_uptime
+from .search import SearchIndex
+from .sessions import SessionIndexCache, parse_session_range
+from .snapshot import load_snapshot, save_snapshot
+from .strokes import StrokeIndexCache, plover_dictionaries
+from .view import RowIndex
+
+IMPORTED_AT = time.perf_counter()  # start-up is timed from here where the process start is unknown
+
+
+class AnalyzerApp:
+    """
+    Base class for the GUIs. Subclasses create self.root, self.table (a
+    VirtualTable) and its self.tree, self.file_label, self.export_btn,
+    self.follow_btn, self.history_btn, self.results_frame, the search box's
+    self.search_var (a StringVar whose writes call filter_rows) and the
+    status row (self.status_label, self.progress_bar, self.sessions_box, a
+    combobox of session_choices, and self.cancel_btn) in setup_ui, then
+    call warm_start.
+    """
+
+    sort_markers = ('↑', '↓')
+    follow_interval = 500  # ms between checks for appended data
+    ingest_interval = 100  # ms between checks for parsing and export progress
+
+    # Labels for the session selector; anything else typed into it is
+    # read as a range such as '-20:' or '3:7'
+    session_choices = {
+        'All sessions': None,
+        'Last session': '-1:',
+        'Last 5 sessions': '-5:',
+        'Last 10 sessions': '-10:',
+        'Last 50 sessions': '-50:',
+    }
+
+    cache = AggregateCache()
+    session_cache = SessionIndexCache()
+    stroke_cache = StrokeIndexCache()
+    dictionaries = None  # JSON dictionaries for 'Strokes saved'; Plover's own when None
+    stroke_index = None  # loaded by the last ingest worker
+    workers = default_workers()
+    history_path = None  # default_history_path() when None
+    snapshot_path = None  # snapshot.default_snapshot_path() when None
+    first_paint = None  # seconds from launch until warm_start painted the window
+    file_path = None
+    follower = None
+    watcher = None
+    follow_job = None
+    ingest = None
+    ingest_job = None
+    export = None
+    export_job = None
+    sort_column = None
+    sort_reverse = False
+    row_index = None
+    showing_snapshot = False  # the table still shows warm_start's rows while their log loads
+    search_index = None  # None while a load is still showing partial rows
+    load_summary = ''  # Profiler.describe() of the last load, shown in the status bar
+
+    def select_file(self):
+        initial_dir = os.path.expandvars(r'%LOCALAPPDATA%\\plover\\plover')
+        if not os.path.exists(initial_dir):
+            initial_dir = os.getcwd()
+
+        file_paths = filedialog.askopenfilenames(
+            title="Select Clippy output files",
+            initialdir=initial_dir,
+            filetypes=[("Org files", "*.org"), ("Rotated logs", "*.org.*"),
+                       ("Compressed logs", "*.gz *.bz2 *.xz"), ("Text files", "*.txt"), ("All files", "*.*")]
+        )
+
+        if len(file_paths) == 1 and not is_compressed(file_paths[0]):
+            self.file_label.configure(text=f"Selected: {file_paths[0]}")
+            self.process_file(file_paths[0])
+        elif file_paths:
+            self.process_batch(file_paths)
+
+    def warm_start(self):
+        """
+        Paints the last session's snapshot, if there is one, and only then
+        starts loading its log. The aggregate cache makes that load parse
+        just what Plover appended since; its rows replace the snapshot.
+        """
+        snapshot = load_snapshot(self.snapshot_path)
+        if snapshot is not None:
+            self.file_path = snapshot.log
+            self.file_label.configure(text=f"Selected: {snapshot.log}")
+            self.data_entries = snapshot.rows
+            self.display_results()
+            if snapshot.sort_column in COLUMNS:
+                self.sort_by_column(snapshot.sort_column, snapshot.sort_reverse)
+            state = "unchanged" if snapshot.unchanged() else "checking for changes"
+            status = f"Last session: top {len(snapshot.rows):,} of {snapshot.translations:,} translations ({state})"
+            self.status_label.configure(text=status)
+        self.root.update_idletasks()
+        uptime = process_uptime()
+        self.first_paint = uptime if uptime is not None else time.perf_counter() - IMPORTED_AT
+        if snapshot is not None:
+            self.status_label.configure(text=f"{status} · first paint {self.first_paint * 1000:.0f} ms")
+            self.root.after_idle(self.process_file, snapshot.log, True)
+
+    def process_file(self, file_path: str, keep_rows: bool = False):
+        """
+        Starts parsing file_path on a worker thread; poll_ingest picks up
+        its progress and results. With keep_rows the table keeps its rows
+        until the first results arrive.
+        """
+        self.file_path = file_path
+        self.sessions_box.set('All sessions')
+        self.start_ingest(IngestWorker(file_path, self.cache, self.workers), keep_rows)
+
+    def process_batch(self, file_paths):
+        """
+        Ranks several, possibly compressed, logs together on the worker
+        pool. Following, sessions and history apply to single logs only.
+        """
+        self.file_path = None
+        self.sessions_box.set('All sessions')
+        selected = file_paths[0] if len(file_paths) == 1 else f"{len(file_paths)} files"
+        self.file_label.configure(text=f"Selected: {selected}")
+        self.start_ingest(BatchWorker(file_paths, self.workers))
+
+    def select_sessions(self, event=None):
+        """
+        Ranks only the sessions chosen in the session selector, using the
+        log's session index.
+        """
+        if self.file_path is None:
+            messagebox.showwarning("Warning", "Select a file first")
+            return
+        choice = self.sessions_box.get()
+        choice = self.session_choices.get(choice, choice)
+        if choice is None:
+            self.process_file(self.file_path)
+            return
+        try:
+            sessions = parse_session_range(choice)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.file_label.configure(text=f"Selected: {self.file_path} ({self.sessions_box.get()})")
+        self.start_ingest(SessionWorker(self.file_path, sessions, self.session_cache))
+
+    def show_history(self):
+        """
+        Adds the selected log, if any, to the history database and shows
+        the ranked history of every log added so far.
+        """
+        history_path = self.history_path or default_history_path()
+        self.file_label.configure(text=f"History: {history_path}")
+        self.start_ingest(HistoryWorker(self.file_path, history_path))
+
+    def start_ingest(self, worker: IngestWorker, keep_rows: bool = False):
+        self.stop_following()
+        self.stop_ingest()
+        self.follower = None
+        self.search_index = None
+        self.load_summary = ''
+        self.showing_snapshot = keep_rows
+        if not keep_rows:
+            self.data_entries = []
+            self.table.set_rows(self.data_entries)
+        self.ingest = worker
+        worker.dictionaries = plover_dictionaries() if self.dictionaries is None else self.dictionaries
+        worker.stroke_cache = self.stroke_cache
+        self.ingest.start()
+        self.cancel_btn.configure(state='normal')
+        self.progress_bar.configure(value=0)
+        self.status_label.configure(text="Loading...")
+        self.ingest_job = self.root.after(self.ingest_interval, self.poll_ingest)
+
+    def poll_ingest(self):
+        self.ingest_job = None
+        ingest = self.ingest
+        finished = False
+        while not finished:
+            try:
+                message = ingest.messages.get_nowait()
+            except queue.Empty:
+                break
+            kind = message[0]
+            if kind == 'progress':
+                progress = message[1]
+                self.progress_bar.configure(value=100 * progress.fraction)
+                self.status_label.configure(text=progress.describe())
+            elif kind == 'partial':
+                if self.showing_snapshot:
+                    continue  # partial rows would show less than the snapshot does
+                self.data_entries = message[1]
+                self.display_results(keep_position=True)
+            elif kind == 'done':
+                finished = True
+                self.follower, self.data_entries, self.search_index = message[1:]
+                self.stroke_index = ingest.stroke_index
+                with ingest.profiler.stage('table'):
+                    self.display_results(keep_position=True)
+                    self.root.update_idletasks()
+                self.progress_bar.configure(value=100)
+                self.load_summary = ingest.profiler.describe()
+                if ingest.dictionary_errors:
+                    count = len(ingest.dictionary_errors)
+                    self.load_summary += f" · skipped {count} unreadable dictionar{'y' if count == 1 else 'ies'}"
+                self.status_label.configure(text=self.describe_rows())
+                if self.follower is not None:
+                    self.save_snapshot()
+            elif kind == 'cancelled':
+                finished = True
+                status = f"Cancelled; showing {len(self.data_entries):,} translations parsed so far"
+                self.status_label.configure(text=status)
+            elif kind == 'error':
+                finished = True
+                self.status_label.configure(text="Failed")
+                messagebox.showerror("Error", f"Failed to process file: {str(message[1])}")
+
+        if finished:
+            self.ingest = None
+            self.showing_snapshot = False
+            if self.export is None:
+                self.cancel_btn.configure(state='disabled')
+        else:
+            self.ingest_job = self.root.after(self.ingest_interval, self.poll_ingest)
+
+    def cancel_ingest(self):
+        """
+        Asks the parsing or export worker to stop; poll_ingest or
+        poll_export reports when it has.
+        """
+        for worker in (self.ingest, self.export):
+            if worker is not None:
+                worker.cancel()
+                self.status_label.configure(text="Cancelling...")
+
+    def stop_ingest(self):
+        """
+        Abandons the running parse, if any, without waiting for it.
+        """
+        if self.ingest_job is not None:
+            self.root.after_cancel(self.ingest_job)
+            self.ingest_job = None
+        if self.ingest is not None:
+            self.ingest.cancel()
+            self.ingest = None
+            if self.export is None:
+                self.cancel_btn.configure(state='disabled')
+
+    def display_results(self, keep_position: bool = False):
+        self.entry_rows = {entry.translation: entry for entry in self.data_entries}
+        self.row_index = RowIndex(self.data_entries)
+        self.table.set_rows(self.current_view(), keep_position)
+
+        self.results_frame.grid()
+        self.export_btn.configure(state='normal')
+
+    def update_rows(self, translations):
+        """
+        Shows the changes to translations. Existing rows read through to the
+        aggregate and are already current; new translations are appended
+        to the end of the table.
+        """
+        entry_map = self.follower.aggregate.entry_map
+        if self.stroke_index is not None:
+            self.stroke_index.annotate((translation, entry_map[translation]) for translation in translations)
+        for translation in translations:
+            if translation not in self.entry_rows:
+                row = self.entry_rows[translation] = entry_row(translation, entry_map[translation])
+                self.data_entries.append(row)
+        self.row_index.invalidate()
+        if self.search_index is not None:
+            self.search_index.update(translations)
+        self.table.set_rows(self.current_view(), keep_position=True)
+
+    def current_view(self):
+        """
+        data_entries as the table should show them: narrowed to the rows
+        matching the search box and sorted by the chosen column.
+        """
+        subset = None
+        if self.search_index is not None:
+            subset = self.search_index.search(self.search_var.get())
+        return self.row_index.view(self.sort_column, self.sort_reverse, subset)
+
+    def filter_rows(self, *args):
+        """
+        Re-filters the table as the search box changes. Each keystroke
+        usually only re-checks the rows the previous text matched.
+        """
+        if self.row_index is None:
+            return
+        self.table.set_rows(self.current_view())
+        if self.ingest is None:
+            self.status_label.configure(text=self.describe_rows())
+
+    def describe_rows(self) -> str:
+        shown, total = len(self.table.rows), len(self.data_entries)
+        text = f"{total:,} translations" if shown == total else f"Showing {shown:,} of {total:,} translations"
+        if self.load_summary:
+            text += f" · {self.load_summary}"
+        return text
+
+    def toggle_follow(self):
+        if self.watcher is not None:
+            self.stop_following()
+            return
+        if self.follower is None:
+            if self.ingest is not None:
+                messagebox.showwarning("Warning", "Wait for the file to finish loading")
+            else:
+                messagebox.showwarning("Warning", "Select a file to follow first")
+            return
+
+        self.watcher = make_watcher(self.follower.file_path)
+        self.follow_btn.configure(text="Stop Following")
+        self.refresh_follow(force=True)
+
+    def stop_following(self):
+        if self.follow_job is not None:
+            self.root.after_cancel(self.follow_job)
+            self.follow_job = None
+        if self.watcher is not None:
+            self.watcher.close()
+            self.watcher = None
+            self.follow_btn.configure(text="Follow")
+
+    def refresh_follow(self, force: bool = False):
+        self.follow_job = None
+        if force or self.watcher.changed():
+            try:
+                changed, was_reset = self.follower.poll()
+            except Exception as e:
+                self.stop_following()
+                messagebox.showerror("Error", f"Failed to follow file: {e}")
+                return
+            if was_reset:
+                if self.stroke_index is not None:
+                    self.stroke_index.annotate(self.follower.aggregate.entry_map.items())
+                self.data_entries = rank(self.follower.aggregate)
+                self.search_index = SearchIndex(self.data_entries)
+                self.display_results()
+            elif changed:
+                self.update_rows(changed)
+        self.follow_job = self.root.after(self.follow_interval, self.refresh_follow)
+
+    def sort_by_column(self, col: str, reverse: bool):
+        # data_entries stays in rank order; the table shows it through a
+        # cached permutation for the column.
+        self.sort_column, self.sort_reverse = col, reverse
+        self.table.set_rows(self.current_view(), keep_position=True)
+
+        for column in COLUMNS:
+            if column == col:
+                self.tree.heading(column, text=f"{column} {self.sort_markers[reverse]}")
+            else:
+                self.tree.heading(column, text=column)
+
+        self.tree.heading(col, command=lambda: self.sort_by_column(col, not reverse))
+
+    def export_csv(self):
+        """
+        Exports the rows as shown to CSV, JSON Lines or SQLite, optionally
+        gzipped, on a worker thread; poll_export reports its progress.
+        """
+        if not self.data_entries:
+            messagebox.showwarning("Warning", "No data to export")
+            return
+        if self.export is not None:
+            messagebox.showwarning("Warning", "Wait for the current export to finish")
+            return
+
+        downloads_dir = Path.home() / "Downloads"
+        if not downloads_dir.exists():
+            downloads_dir = Path.cwd()
+
+        file_path = filedialog.asksaveasfilename(
+            title="Save CSV file",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("JSON Lines", "*.jsonl"), ("SQLite databases", "*.sqlite"),
+                       ("Compressed exports", "*.csv.gz *.jsonl.gz *.sqlite.gz"), ("All files", "*.*")],
+            initialdir=str(downloads_dir),
+            initialfile="sorted_translations.csv"
+        )
+
+        if not file_path:
+            return
+
+        # Copies of the rows and their entries: following keeps polling on
+        # this thread while the export reads them on its own
+        rows = []
+        for row in self.table.rows:
+            entry = copy_entry(row.entry)
+            if 'best' in row.entry:
+                entry['best'] = row.entry['best']
+            rows.append(entry_row(row.translation, entry))
+        self.export = ExportWorker(rows, file_path)
+        self.export.start()
+        self.export_btn.configure(state='disabled')
+        self.cancel_btn.configure(state='normal')
+        self.status_label.configure(text="Exporting...")
+        self.export_job = self.root.after(self.ingest_interval, self.poll_export)
+
+    def poll_export(self):
+        self.export_job = None
+        export = self.export
+        finished = False
+        while not finished:
+            try:
+                message = export.messages.get_nowait()
+            except queue.Empty:
+                break
+            kind = message[0]
+            if kind == 'progress':
+                done, total = message[1:]
+                self.progress_bar.configure(value=100 * done / total if total else 100)
+                self.status_label.configure(text=f"Exported {done:,} of {total:,} rows")
+            elif kind == 'done':
+                finished = True
+                self.status_label.configure(text=self.describe_rows())
+                messagebox.showinfo("Success", f"Data exported to {export.file_path}")
+            elif kind == 'cancelled':
+                finished = True
+                self.status_label.configure(text="Export cancelled")
+            elif kind == 'error':
+                finished = True
+                self.status_label.configure(text="Export failed")
+                messagebox.showerror("Error", f"Failed to export data: {message[1]}")
+
+        if finished:
+            self.export = None
+            self.export_btn.configure(state='normal')
+            if self.ingest is None:
+                self.cancel_btn.configure(state='disabled')
+        else:
+            self.export_job = self.root.after(self.ingest_interval, self.poll_export)
+
+    def save_snapshot(self):
+        """
+        Remembers the selected log and the top of the table as shown, for
+        warm_start on the next launch. Only a whole single log is saved.
+        """
+        if self.follower is None or self.row_index is None:
+            return
+        try:
+            save_snapshot(self.follower.file_path, self.row_index.view(self.sort_column, self.sort_reverse),
+                          len(self.data_entries), self.sort_column, self.sort_reverse, self.snapshot_path)
+        except OSError:
+            pass  # a read-only cache directory only costs the warm start
+
+    def close(self):
+        self.save_snapshot()
+        self.root.destroy()
+
+    def run(self):
+        self.root.protocol('WM_DELETE_WINDOW', self.close)
+        self.root.mainloop()
@@ -0,0 +1,208 @@
+"""
+Persistent cache of aggregated log state.
+
+Each log gets one cache file named after a hash of its absolute path. The
+entry records the size, mtime and a hash of the first PREFIX_BYTES of the
+log alongside the entry_map and the offset it covers. Re-opening an
+unchanged log loads the entry instead of parsing. A log that has only grown
+(same prefix, size >= offset) resumes parsing from the cached offset.
+
+Entries are zlib-compressed marshal data, so loading never executes code.
+"""
+
+import hashlib
+import marshal
+import os
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .core import Aggregate, iter_entries
+from .follow import LogFollower
+from .parallel import ProgressCallback, aggregate_span, last_line_end
+
+CACHE_VERSION = 4
+CACHE_MAGIC = b'CLPC'
+PREFIX_BYTES = 64 * 1024
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def default_cache_dir() -> Path:
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        return Path(os.environ['LOCALAPPDATA']) / 'clippy_stats' / 'cache'
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'clippy_stats'
+
+
+def prefix_hash(file_path: str, length: int) -> str:
+    with open(file_path, 'rb') as file:
+        return hashlib.sha1(file.read(length)).hexdigest()
+
+
+class AggregateCache:
+    """
+    Directory of cache entries, bounded to max_bytes in total. The least
+    recently used entries are evicted first.
+
+    Subclasses can keep other per-log state in the same directory by
+    choosing their own suffix, magic and version and building on
+    read_state and write_state.
+    """
+
+    suffix = '.cache'
+    magic = CACHE_MAGIC
+    version = CACHE_VERSION
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory) if directory else default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def entry_path(self, file_path: str) -> Path:
+        key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8', 'surrogateescape')).hexdigest()
+        return self.directory / (key + self.suffix)
+
+    def read_state(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the stored state for file_path, or None when there is no
+        entry or it does not describe the file as it is now on disk. The
+        state still applies when the file has only grown past its offset.
+        """
+        entry_path = self.entry_path(file_path)
+        try:
+            with open(entry_path, 'rb') as file:
+                header = file.read(len(self.magic) + 2)
+                if header != self.magic + bytes((self.version, marshal.version)):
+                    raise ValueError("stale cache format")
+                state = marshal.loads(zlib.decompress(file.read()))
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, EOFError, TypeError, zlib.error):
+            self.discard(file_path)
+            return None
+
+        if state['path'] != os.path.abspath(file_path):
+            return None
+        unchanged = stat.st_size == state['size'] and stat.st_mtime_ns == state['mtime_ns']
+        if not unchanged and (stat.st_size < state['offset'] or
+                              prefix_hash(file_path, state['prefix_length']) != state['prefix_hash']):
+            return None
+
+        os.utime(entry_path)
+        return state
+
+    def write_state(self, file_path: str, offset: int, state: Dict[str, Any]):
+        """
+        Stores state for file_path, which covers the file up to offset.
+        """
+        stat = os.stat(file_path)
+        prefix_length = min(PREFIX_BYTES, offset)
+        state = dict(state, **{
+            'path': os.path.abspath(file_path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'prefix_length': prefix_length,
+            'prefix_hash': prefix_hash(file_path, prefix_length),
+            'offset': offset,
+        })
+        payload = self.magic + bytes((self.version, marshal.version)) + zlib.compress(marshal.dumps(state), 1)
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(payload)
+            os.replace(tmp_path, self.entry_path(file_path))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.evict()
+
+    def load(self, file_path: str) -> Optional[LogFollower]:
+        """
+        Returns a follower positioned at the cached offset, or None when
+        there is no usable entry for the file as it is now on disk.
+        """
+        state = self.read_state(file_path)
+        if state is None:
+            return None
+        aggregate = Aggregate(state['origin'])
+        aggregate.entry_map = state['entry_map']
+        return LogFollower(file_path, aggregate, state['offset'])
+
+    def store(self, follower: LogFollower):
+        self.write_state(follower.file_path, follower.offset, {
+            'origin': follower.aggregate.origin,
+            'entry_map': follower.aggregate.entry_map,
+        })
+
+    def discard(self, file_path: str):
+        try:
+            os.unlink(self.entry_path(file_path))
+        except OSError:
+            pass
+
+    def evict(self):
+        entries = []
+        for path in self.directory.glob('*' + self.suffix):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+
+
+def open_follower(file_path: str, cache: Optional[AggregateCache] = None, workers: int = 1,
+                  progress: Optional[ProgressCallback] = None) -> LogFollower:
+    """
+    Brings a follower for file_path up to date, resuming from the cache
+    when possible and refreshing the cache entry afterwards. The unparsed
+    span of complete lines goes through the mmap fast path, split across
+    a process pool when there are several workers and enough bytes.
+    progress is passed on to parallel.aggregate_span.
+    """
+    follower = cache.load(file_path) if cache is not None else None
+    if follower is None:
+        follower = LogFollower(file_path)
+    start = follower.offset
+
+    end = last_line_end(file_path)
+    if end > follower.offset:
+        follower.aggregate = aggregate_span(file_path, follower.offset, end, workers, progress,
+                                            follower.aggregate)
+        follower.offset = end
+    follower.poll()
+    if cache is not None and (follower.offset != start or not cache.entry_path(file_path).exists()):
+        try:
+            cache.store(follower)
+        except OSError:
+            pass  # a read-only cache directory only costs the next parse
+    return follower
+
+
+def aggregate_file_cached(file_path: str, cache: Optional[AggregateCache], workers: int = 1) -> Aggregate:
+    """
+    Same result as core.aggregate_file, but served from the cache when the
+    log is unchanged or has only grown.
+    """
+    follower = open_follower(file_path, cache, workers)
+    aggregate = follower.aggregate
+    with open(file_path, 'rb') as file:
+        file.seek(follower.offset)
+        tail = file.read()
+    if tail:
+        # An unterminated last line counts for a one-off analysis but is
+        # left out of the cache so a later resume can read it whole.
+        aggregate.update(iter_entries(line.decode('utf-8') for line in tail.split(b'\n')))
+    return aggregate
@@ -0,0 +1,437 @@
+"""
+clippy-stats: rank Clippy misses from the command line.
+
+Uses only the headless core, so it runs on servers without a display and
+starts without paying for Tk.
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import sqlite3
+import sys
+import time
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .batch import (
+    DECOMPRESSION_ERRORS, aggregate_batch, aggregate_stream, decompressor, expand_inputs, format_summary,
+    is_batch_input,
+)
+from .cache import AggregateCache, aggregate_file_cached, open_follower
+from .columnar import AGGREGATIONS, KEYS, EventTableCache, open_event_table, parse_names
+from .compare import (
+    DELTA_COLUMNS, DELTA_SORT_KEYS, SideLoader, compare, delta_values, format_summary as format_delta_summary,
+    summarize,
+)
+from .core import COLUMNS, Aggregate, Row, rank, row_values
+from .export import EXPORT_FORMATS, export_rows, write_rows
+from .follow import LogFollower, make_watcher
+from .heavy import HeavyHitters
+from .history import HistoryStore
+from .profiling import Profiler, profile_file
+from .sessions import SessionIndexCache, open_session_index, parse_session_range
+from .parallel import default_workers
+from .strokes import StrokeIndexCache, load_stroke_index
+from .view import SORT_KEYS, RowIndex
+
+# server.DEFAULT_PORT, repeated so that only --serve imports the daemon
+# (and asyncio)
+SERVE_PORT = 8765
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='clippy-stats',
+        description="Rank the translations Clippy flagged in a clippy.org log."
+    )
+    parser.add_argument('log', nargs='?',
+                        help="path to the clippy.org file; a directory, a quoted glob or a gzip/bz2/xz "
+                             "file ranks every matching log together (batch mode)")
+    parser.add_argument('-o', '--output', metavar='FILE',
+                        help="write every row to a file ('-' for stdout) instead of printing a table; "
+                             "the extension picks CSV, JSON Lines (.jsonl) or SQLite (.sqlite), "
+                             "and a further .gz compresses it")
+    parser.add_argument('--format', choices=EXPORT_FORMATS,
+                        help="with --output, the format to write whatever the extension")
+    parser.add_argument('-n', '--top', type=int, default=25, metavar='N',
+                        help="rows to print in the table (0 for all, default: %(default)s)")
+    parser.add_argument('-f', '--follow', action='store_true',
+                        help="keep running and re-rank whenever Plover appends to the log")
+    parser.add_argument('--interval', type=float, default=1.0, metavar='SECONDS',
+                        help="polling interval where inotify is unavailable (default: %(default)s)")
+    parser.add_argument('-j', '--workers', type=int, default=default_workers(), metavar='N',
+                        help="processes used to parse large logs (default: %(default)s)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="always parse the whole log and leave the aggregate cache untouched")
+    parser.add_argument('--cache-dir', metavar='DIR',
+                        help="where to keep cached aggregates (default: the user cache directory)")
+    parser.add_argument('--sessions', metavar='RANGE',
+                        help="rank only these sessions, as a slice over the log's sessions, oldest first "
+                             "(e.g. --sessions=-10: for the last ten, 3:7, or 5 for one)")
+    parser.add_argument('--history', nargs='?', const='', metavar='DB',
+                        help="add the log to a SQLite history database and rank the whole history "
+                             "(default DB: the user data directory)")
+    parser.add_argument('--approx', type=int, metavar='CAPACITY',
+                        help="keep only the CAPACITY most frequent translations (Space-Saving), so "
+                             "memory stays fixed however long the log or --follow runs; counts may be "
+                             "overestimated by at most the bound printed to stderr")
+    parser.add_argument('--profile', nargs='?', const='-', metavar='JSON',
+                        help="parse serially with per-stage timers and line counters and write the "
+                             "report as JSON (default: stderr); ignores the cache")
+    parser.add_argument('--cprofile', metavar='FILE',
+                        help="save cProfile statistics of the whole run, for pstats or snakeviz")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help="show how each translation changed from BEFORE to AFTER: count and score "
+                             "deltas, new and resolved misses. Each side is a log, LOG@RANGE for some of "
+                             "its sessions (e.g. clippy.org@-20:-10 clippy.org@-10:), or a batch input")
+    parser.add_argument('--sort', metavar='COLUMN',
+                        help="order the output by this column instead of by score (or by size of "
+                             "change with --compare)")
+    parser.add_argument('--reverse', action='store_true', help="with --sort, sort in descending order")
+    parser.add_argument('--dictionary', action='append', metavar='JSON',
+                        help="Plover JSON dictionary to measure 'Strokes saved' against; repeat for "
+                             "several, highest priority first (default: Clippy's suggestions)")
+    parser.add_argument('--group-by', type=names(KEYS), metavar='KEYS',
+                        help="instead of ranking translations, break the entries down by any of "
+                             f"{', '.join(KEYS)}, comma-separated (e.g. --group-by suggestion)")
+    parser.add_argument('--agg', type=names(AGGREGATIONS), metavar='LIST',
+                        help="with --group-by, what to compute per group, comma-separated; the first "
+                             f"ranks the rows (one or more of {', '.join(AGGREGATIONS)}; default: "
+                             "count,score)")
+    parser.add_argument('--pivot', choices=KEYS, metavar='KEY',
+                        help="with --group-by of one key, give each value of KEY its own column "
+                             "(e.g. --group-by suggestion --pivot severity)")
+    parser.add_argument('--serve', nargs='?', type=int, const=SERVE_PORT, metavar='PORT',
+                        help="follow the log and serve the ranking to index.html as JSON on "
+                             "http://127.0.0.1:PORT/ (default port: %(const)s)")
+    return parser
+
+
+def names(choices: Sequence[str]) -> Callable[[str], List[str]]:
+    def parse(text: str) -> List[str]:
+        try:
+            return parse_names(text, choices)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e)) from None
+    return parse
+
+
+def format_table(data_entries: Sequence[Any], top: int, columns: Sequence[str] = COLUMNS,
+                 values: Callable[[Any], Sequence[Any]] = row_values) -> str:
+    if top > 0:
+        data_entries = data_entries[:top]
+    rows = [columns] + [tuple(str(value) for value in values(entry)) for entry in data_entries]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(columns))]
+    return '\n'.join(
+        '  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+        for row in rows
+    )
+
+
+def ranked(aggregate: Aggregate, args: argparse.Namespace) -> List[Row]:
+    """
+    The rows emit() will show: only the top N when printing a table,
+    picked with a heap rather than a full sort.
+    """
+    if args.stroke_index is not None:
+        args.stroke_index.annotate(aggregate.entry_map.items())
+    if args.output or args.top <= 0 or args.sort:
+        return rank(aggregate)
+    return rank(aggregate, args.top)
+
+
+def report_bound(aggregate: HeavyHitters):
+    print(f"clippy-stats: approximate counts from {aggregate.total:,} entries; "
+          f"each may be over by at most {aggregate.error_bound:,}", file=sys.stderr)
+
+
+def sort_rows(data_entries: List[Any], args: argparse.Namespace,
+              keys: Dict[str, str] = SORT_KEYS) -> Sequence[Any]:
+    if args.sort is None:
+        return data_entries
+    return RowIndex(data_entries, keys).view(args.sort, args.reverse)
+
+
+def emit(data_entries: Sequence[Any], args: argparse.Namespace, columns: Sequence[str] = COLUMNS,
+         values: Callable[[Any], Sequence[Any]] = row_values):
+    if args.output == '-':
+        write_rows(data_entries, sys.stdout, args.format or 'csv', columns, values)
+    elif args.output:
+        export_rows(data_entries, args.output, args.format, None, columns, values)
+    else:
+        print(format_table(data_entries, args.top, columns, values))
+    sys.stdout.flush()
+
+
+def follow(args: argparse.Namespace, cache: Optional[AggregateCache]) -> int:
+    if args.approx:
+        follower = LogFollower(args.log, factory=partial(HeavyHitters, args.approx))
+        follower.poll()
+        report_bound(follower.aggregate)
+    else:
+        follower = open_follower(args.log, cache, args.workers)
+    emit(sort_rows(ranked(follower.aggregate, args), args), args)
+
+    watcher = make_watcher(args.log, args.interval)
+    try:
+        while True:
+            if not watcher.wait(args.interval):
+                continue
+            changed, was_reset = follower.poll()
+            if changed or was_reset:
+                if not args.output:
+                    print(f"\n-- {time.strftime('%H:%M:%S')}: {len(follower.aggregate)} translations --")
+                emit(sort_rows(ranked(follower.aggregate, args), args), args)
+                if args.approx:
+                    report_bound(follower.aggregate)
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        watcher.close()
+
+
+def serve_log(args: argparse.Namespace, cache: Optional[AggregateCache]) -> int:
+    from .server import serve
+    try:
+        serve(args.log, args.serve, cache, args.workers, args.interval, stroke_index=args.stroke_index)
+    except KeyboardInterrupt:
+        return 0
+    except OSError as e:
+        print(f"clippy-stats: cannot serve on port {args.serve}: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def compare_sides(args: argparse.Namespace, cache: Optional[AggregateCache]) -> int:
+    session_cache = None if args.no_cache else SessionIndexCache(args.cache_dir)
+    loader = SideLoader(cache, session_cache, args.workers)
+    try:
+        before, after = (loader.load(spec) for spec in args.compare)
+        rows = compare(before, after)
+    except (OSError, UnicodeDecodeError, ValueError) + DECOMPRESSION_ERRORS as e:
+        print(f"clippy-stats: failed to compare: {e}", file=sys.stderr)
+        return 1
+    print(f"clippy-stats: {len(before):,} translations before, {len(after):,} after; "
+          f"{format_delta_summary(summarize(rows))}", file=sys.stderr)
+    emit(sort_rows(rows, args, DELTA_SORT_KEYS), args, DELTA_COLUMNS, delta_values)
+    return 0
+
+
+def breakdown(args: argparse.Namespace, sessions: Optional[slice]) -> int:
+    """
+    Groups the log's entries with --group-by and --pivot through its event
+    table, which the cache keeps up to date like the session index.
+    """
+    cache = None if args.no_cache else EventTableCache(args.cache_dir)
+    table = open_event_table(args.log, cache)
+    if sessions is not None:
+        table = table.select(sessions)
+    if args.pivot:
+        result = table.pivot(args.group_by[0], args.pivot, args.agg[0] if args.agg else 'count')
+    elif args.agg:
+        result = table.group_by(args.group_by, args.agg)
+    else:
+        result = table.group_by(args.group_by)
+    rows = result.rows
+    if args.sort:
+        column = find_column(args.sort, result.columns)
+        if column is None:
+            print(f"clippy-stats: --sort must be one of: {', '.join(result.columns)}", file=sys.stderr)
+            return 2
+        rows = result.sorted_by(column, args.reverse)
+    emit(rows, args, result.columns, tuple)
+    return 0
+
+
+def batch(args: argparse.Namespace) -> List[Row]:
+    paths = expand_inputs([args.log])
+    if not paths:
+        raise FileNotFoundError(f"no files match {args.log}")
+    start = time.perf_counter()
+    aggregate, stats = aggregate_batch(paths, args.workers)
+    print(format_summary(stats, time.perf_counter() - start), file=sys.stderr)
+    return ranked(aggregate, args)
+
+
+def approximate(args: argparse.Namespace) -> List[Row]:
+    """
+    Streams every input, plain or compressed, through one HeavyHitters.
+    """
+    paths = expand_inputs([args.log])
+    if not paths:
+        raise FileNotFoundError(f"no files match {args.log}")
+    aggregate = HeavyHitters(args.approx)
+    for path in paths:
+        with (decompressor(path) or open)(path, 'rb') as file:
+            aggregate_stream(file, aggregate=aggregate)
+    report_bound(aggregate)
+    return ranked(aggregate, args)
+
+
+def profiled(args: argparse.Namespace, profiler: Profiler) -> List[Row]:
+    opener = decompressor(args.log)
+    if opener is None:
+        aggregate = profile_file(args.log, profiler)
+    else:
+        with opener(args.log, 'rb') as file:
+            aggregate = profile_file(args.log, profiler, file)
+    with profiler.stage('rank'):
+        return ranked(aggregate, args)
+
+
+def write_profile(profiler: Profiler, args: argparse.Namespace):
+    report = dict(profiler.report(), log=os.path.abspath(args.log))
+    if args.profile == '-':
+        json.dump(report, sys.stderr, indent=2)
+        print(file=sys.stderr)
+    else:
+        with open(args.profile, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+
+def history(args: argparse.Namespace) -> List[Row]:
+    with HistoryStore(args.history or None) as store:
+        if args.log:
+            store.ingest(args.log)
+        return ranked(store.aggregate(), args)
+
+
+def column_name(parser: argparse.ArgumentParser, name: Optional[str],
+                columns: Sequence[str]) -> Optional[str]:
+    """
+    The column --sort names, matched case-insensitively and with '_' for
+    spaces ('count_delta').
+    """
+    if name is None:
+        return None
+    column = find_column(name, columns)
+    if column is None:
+        parser.error(f"--sort must be one of: {', '.join(columns)}")
+    return column
+
+
+def find_column(name: str, columns: Sequence[str]) -> Optional[str]:
+    wanted = name.strip().lower().replace('_', ' ')
+    for column in columns:
+        if column.lower() == wanted:
+            return column
+    return None
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    sessions = None
+    if args.compare is not None:
+        if (args.log is not None or args.follow or args.sessions is not None or args.history is not None or
+                args.approx or args.profile is not None or args.serve is not None):
+            parser.error("--compare takes both sides itself and cannot be combined with a log, "
+                         "--follow, --sessions, --history, --approx, --profile or --serve")
+        args.sort = column_name(parser, args.sort, DELTA_COLUMNS)
+    elif args.group_by is not None:
+        pass  # the columns of a breakdown are only known once it is computed
+    else:
+        args.sort = column_name(parser, args.sort, COLUMNS)
+    if args.log is None and args.history is None and args.compare is None:
+        parser.error("a log is required unless --history or --compare is given")
+    if args.follow and args.history is not None:
+        parser.error("--follow cannot be combined with --history")
+    if args.sessions is not None:
+        if args.follow or args.history is not None or args.log is None:
+            parser.error("--sessions needs a log and cannot be combined with --follow or --history")
+        try:
+            sessions = parse_session_range(args.sessions)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.approx is not None:
+        if args.approx < 1:
+            parser.error("--approx needs a capacity of at least 1")
+        if args.log is None or args.sessions is not None or args.history is not None:
+            parser.error("--approx needs a log and cannot be combined with --sessions or --history")
+    batch_mode = args.log is not None and is_batch_input(args.log)
+    if batch_mode and (args.follow or args.sessions is not None or args.history is not None):
+        parser.error("a directory, glob or compressed log cannot be combined with "
+                     "--follow, --sessions or --history")
+    if args.profile is not None and (args.log is None or not os.path.isfile(args.log) or args.follow or
+                                     args.sessions is not None or args.history is not None or args.approx):
+        parser.error("--profile needs a single log and cannot be combined with "
+                     "--follow, --sessions, --history or --approx")
+    if args.serve is not None and (args.log is None or not os.path.isfile(args.log) or batch_mode or
+                                   args.output or args.sessions is not None or args.history is not None or
+                                   args.approx or args.profile is not None):
+        parser.error("--serve needs a single log and cannot be combined with "
+                     "--output, --sessions, --history, --approx or --profile")
+    if args.group_by is not None:
+        if (args.log is None or not os.path.isfile(args.log) or batch_mode or args.follow or
+                args.history is not None or args.approx or args.profile is not None or args.serve is not None):
+            parser.error("--group-by needs a single log and cannot be combined with "
+                         "--follow, --history, --approx, --profile or --serve")
+        if args.pivot is not None:
+            if len(args.group_by) != 1 or args.pivot in args.group_by:
+                parser.error("--pivot needs --group-by of one other key")
+            if args.agg is not None and len(args.agg) != 1:
+                parser.error("--pivot takes a single --agg")
+    elif args.agg is not None or args.pivot is not None:
+        parser.error("--agg and --pivot need --group-by")
+    if args.format is not None and not args.output:
+        parser.error("--format needs --output")
+    if args.format == 'sqlite' and args.output == '-':
+        parser.error("SQLite cannot be written to stdout")
+    cache = None if args.no_cache else AggregateCache(args.cache_dir)
+    args.stroke_index = None
+    if args.dictionary:
+        try:
+            args.stroke_index = load_stroke_index(
+                args.dictionary, None if args.no_cache else StrokeIndexCache(args.cache_dir))
+        except (OSError, ValueError) as e:
+            print(f"clippy-stats: failed to read dictionary: {e}", file=sys.stderr)
+            return 1
+
+    if args.cprofile:
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(run, args, cache, batch_mode, sessions)
+        finally:
+            profiler.dump_stats(args.cprofile)
+    return run(args, cache, batch_mode, sessions)
+
+
+def run(args: argparse.Namespace, cache: Optional[AggregateCache], batch_mode: bool,
+        sessions: Optional[slice]) -> int:
+    profiler = Profiler() if args.profile is not None else None
+    try:
+        if args.compare is not None:
+            return compare_sides(args, cache)
+        if args.serve is not None:
+            return serve_log(args, cache)
+        if args.group_by is not None:
+            return breakdown(args, sessions)
+        if args.follow:
+            return follow(args, cache)
+        if profiler is not None:
+            data_entries = profiled(args, profiler)
+        elif args.approx:
+            data_entries = approximate(args)
+        elif batch_mode:
+            data_entries = batch(args)
+        elif args.history is not None:
+            data_entries = history(args)
+        elif args.sessions is not None:
+            session_cache = None if args.no_cache else SessionIndexCache(args.cache_dir)
+            data_entries = ranked(open_session_index(args.log, session_cache).aggregate(sessions), args)
+        else:
+            data_entries = ranked(aggregate_file_cached(args.log, cache, args.workers), args)
+    except (OSError, UnicodeDecodeError, sqlite3.Error) + DECOMPRESSION_ERRORS as e:
+        print(f"clippy-stats: failed to process file: {e}", file=sys.stderr)
+        return 1
+
+    data_entries = sort_rows(data_entries, args)
+    if profiler is None:
+        emit(data_entries, args)
+        return 0
+    with profiler.stage('output'):
+        emit(data_entries, args)
+    write_profile(profiler, args)
+    return 0
@@ -0,0 +1,440 @@
+"""
+Columnar event table: every entry of a log, one array per field.
+
+An Aggregate only keeps per-translation totals, so questions such as
+"which suggestions recur across many translations" or "how severe are
+the misses each suggestion is given for" used to mean parsing the log
+again with a new script. An EventTable keeps the parsed entries
+themselves, as parallel columns:
+
+    severity     array('I')  stars
+    translation  array('I')  id of the interned translation
+    suggestion   array('I')  id of the interned suggestion
+    strokes      array('I')  strokes typed
+    session      array('i')  the session's ordinal, NO_SESSION outside one
+
+Each distinct string is stored once, in the order first seen, so an entry
+costs 20 bytes. group_by() computes any of AGGREGATIONS over any of KEYS
+in one pass over the columns, and pivot() spreads one key across the
+columns of the result. With NumPy installed the pass is vectorized
+(numpy.unique and numpy.bincount over the arrays, without copying them);
+otherwise it runs in plain Python, with the same results in the same
+order. NumPy is only imported by the first group_by.
+
+Sessions are numbered like SessionIndex.sessions, so session 3 here is
+--sessions 3. Only complete lines are read, and the table is stored
+beside the aggregate cache entry of the log: when the log has grown,
+only the appended lines are parsed.
+"""
+
+import mmap
+from array import array
+from itertools import compress
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .cache import AggregateCache
+from .core import Entry
+from .fastpath import iter_entries_buffer
+from .parallel import last_line_end
+from .sessions import ANSI_ESCAPE_BYTES, SESSION_MARKER
+
+EVENTS_VERSION = 1
+NO_SESSION = -1
+
+KEYS = ('translation', 'suggestion', 'severity', 'session')
+AGGREGATIONS = ('count', 'score', 'strokes', 'mean_severity', 'max_severity',
+                'translations', 'suggestions', 'sessions')
+DEFAULT_AGGREGATIONS = ('count', 'score')
+# Aggregations that count the distinct values of a column
+DISTINCT = {'translations': 'translation', 'suggestions': 'suggestion', 'sessions': 'session'}
+
+_numpy = None
+
+
+def load_numpy():
+    """
+    The numpy module, or None when it is not installed. Imported on first
+    use, since it takes longer to import than the rest of the package.
+    """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+def title(name: str) -> str:
+    """
+    The column header of a key or aggregation: 'mean_severity' is
+    'Mean severity'. export.field_name turns it back.
+    """
+    return name.replace('_', ' ').capitalize()
+
+
+def parse_names(text: str, choices: Sequence[str]) -> List[str]:
+    """
+    Parses a comma-separated list of names from choices, as in
+    'suggestion,severity'. Case, spaces and '-' for '_' are forgiven.
+    """
+    names = [name.strip().lower().replace(' ', '_').replace('-', '_') for name in text.split(',')]
+    names = [name for name in names if name]
+    if not names:
+        raise ValueError(f"expected one or more of: {', '.join(choices)}")
+    for name in names:
+        if name not in choices:
+            raise ValueError(f"unknown name {name!r}; use one of: {', '.join(choices)}")
+    if len(set(names)) != len(names):
+        raise ValueError(f"repeated name in {text!r}")
+    return names
+
+
+class Breakdown(NamedTuple):
+    """
+    The result of a group_by or pivot: column headers and one tuple of
+    values per group, in the order the rows were ranked.
+    """
+    columns: Tuple[str, ...]
+    rows: List[tuple]
+
+    def sorted_by(self, column: str, reverse: bool = False) -> List[tuple]:
+        index = self.columns.index(column)
+        # Lines outside any session have no session; they sort last in
+        # either direction
+        valued = [row for row in self.rows if row[index] is not None]
+        valued.sort(key=lambda row: row[index], reverse=reverse)
+        return valued + [row for row in self.rows if row[index] is None]
+
+
+class EventTable:
+    """
+    The entries of file_path up to offset, the end of its last complete
+    line, as columns. translations and suggestions map each string to its
+    id; sessions holds the START labels, oldest first.
+    """
+
+    def __init__(self, file_path: Optional[str] = None, offset: int = 0):
+        self.file_path = file_path
+        self.offset = offset
+        self.severity = array('I')
+        self.translation = array('I')
+        self.suggestion = array('I')
+        self.strokes = array('I')
+        self.session = array('i')
+        self.translations: Dict[str, int] = {}
+        self.suggestions: Dict[str, int] = {}
+        self.sessions: List[str] = []
+        self.open_session = NO_SESSION  # the session the next line belongs to
+
+    def __len__(self) -> int:
+        return len(self.severity)
+
+    def columns(self) -> Tuple[array, ...]:
+        return self.severity, self.translation, self.suggestion, self.strokes, self.session
+
+    def extend(self, entries: Iterable[Entry], session: int = NO_SESSION):
+        """
+        Appends entries, all from the same session.
+        """
+        before = len(self.severity)
+        translations = self.translations
+        suggestions = self.suggestions
+        severity = self.severity.append
+        translation_id = self.translation.append
+        suggestion_id = self.suggestion.append
+        strokes_typed = self.strokes.append
+        # setdefault with the dict's length interns in one lookup
+        for stars, translation, suggestion, strokes in entries:
+            severity(stars)
+            translation_id(translations.setdefault(translation, len(translations)))
+            suggestion_id(suggestions.setdefault(suggestion, len(suggestions)))
+            strokes_typed(strokes)
+        self.session.extend(array('i', [session]) * (len(self.severity) - before))
+
+    def scan(self, buffer, start: int, end: int):
+        """
+        Appends the entries of the complete lines in buffer[start:end],
+        following the START and END lines between them. start must be the
+        beginning of a line.
+        """
+        position, session = start, self.open_session
+        for marker in SESSION_MARKER.finditer(buffer, start, end):
+            self.extend(iter_entries_buffer(buffer, position, marker.start()), session)
+            if marker.group(1) == b'START':
+                self.sessions.append(ANSI_ESCAPE_BYTES.sub(b'', marker.group(2)).decode('utf-8').strip())
+                session = len(self.sessions) - 1
+            else:
+                session = NO_SESSION
+            position = min(end, marker.end() + 1)
+        self.extend(iter_entries_buffer(buffer, position, end), session)
+        self.open_session = session
+
+    def update(self) -> bool:
+        """
+        Reads the lines appended since the last update. Returns whether
+        there were any.
+        """
+        end = last_line_end(self.file_path)
+        if end <= self.offset:
+            return False
+        with open(self.file_path, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                self.scan(buffer, self.offset, end)
+        self.offset = end
+        return True
+
+    def select(self, sessions: slice) -> 'EventTable':
+        """
+        A table of the entries in the sessions the slice selects, counted
+        over sessions only, oldest first (see parse_session_range). It
+        shares the string ids and session numbers of this one.
+        """
+        wanted = range(*sessions.indices(len(self.sessions)))
+        keep = bytes(map(wanted.__contains__, self.session))
+        table = EventTable(self.file_path, self.offset)
+        for name in ('severity', 'translation', 'suggestion', 'strokes', 'session'):
+            column = getattr(self, name)
+            setattr(table, name, array(column.typecode, compress(column, keep)))
+        table.translations = self.translations
+        table.suggestions = self.suggestions
+        table.sessions = self.sessions
+        table.open_session = self.open_session
+        return table
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            'columns': tuple(column.tobytes() for column in self.columns()),
+            'translations': tuple(self.translations),
+            'suggestions': tuple(self.suggestions),
+            'sessions': tuple(self.sessions),
+            'open_session': self.open_session,
+        }
+
+    @classmethod
+    def from_state(cls, file_path: str, offset: int, state: Dict[str, Any]) -> 'EventTable':
+        table = cls(file_path, offset)
+        for column, data in zip(table.columns(), state['columns']):
+            column.frombytes(data)
+        table.translations = dict(zip(state['translations'], range(len(state['translations']))))
+        table.suggestions = dict(zip(state['suggestions'], range(len(state['suggestions']))))
+        table.sessions = list(state['sessions'])
+        table.open_session = state['open_session']
+        return table
+
+    def _key(self, key: str) -> Tuple[array, int, int]:
+        # (column, number of distinct codes, what to add to make codes >= 0)
+        if key == 'translation':
+            return self.translation, len(self.translations), 0
+        if key == 'suggestion':
+            return self.suggestion, len(self.suggestions), 0
+        if key == 'severity':
+            return self.severity, max(self.severity, default=0) + 1, 0
+        if key == 'session':
+            return self.session, len(self.sessions) + 1, 1
+        raise ValueError(f"unknown key {key!r}; use one of: {', '.join(KEYS)}")
+
+    def _decoder(self, key: str):
+        if key == 'translation':
+            return list(self.translations).__getitem__
+        if key == 'suggestion':
+            return list(self.suggestions).__getitem__
+        if key == 'session':
+            return lambda session: None if session == NO_SESSION else session
+        return int
+
+    def _group(self, keys: Sequence[str], aggregations: Sequence[str]) -> Tuple[List[list], List[list]]:
+        """
+        The distinct combinations of keys, ordered by their ids, as one
+        list of values per key, and the aggregations of each combination
+        as one list per aggregation.
+        """
+        for name in aggregations:
+            if name not in AGGREGATIONS:
+                raise ValueError(f"unknown aggregation {name!r}; use one of: {', '.join(AGGREGATIONS)}")
+        specs = [self._key(key) for key in keys]
+        codes_size = 1
+        for _, size, _ in specs:
+            codes_size *= size
+        numpy = load_numpy()
+        # Combined codes must fit NumPy's int64; Python's ints always do
+        if numpy is not None and len(self) and codes_size < 2 ** 63:
+            codes, totals = self._group_numpy(numpy, specs, aggregations)
+        else:
+            codes, totals = self._group_python(specs, aggregations)
+
+        key_values = [[] for _ in keys]
+        for code in codes:
+            for values, (_, size, shift) in zip(reversed(key_values), reversed(specs)):
+                code, value = divmod(code, size)
+                values.append(value - shift)
+        return [list(map(self._decoder(key), values)) for key, values in zip(keys, key_values)], totals
+
+    def _group_python(self, specs, aggregations) -> Tuple[List[int], List[list]]:
+        codes: Sequence[int] = array('B', [0]) * len(self)
+        for column, size, shift in specs:
+            codes = [code * size + value + shift for code, value in zip(codes, column)]
+        unique = sorted(set(codes))
+        group_of = dict(zip(unique, range(len(unique))))
+        groups = list(map(group_of.__getitem__, codes))
+
+        # One pass for every sum; distinct counts need a set of pairs each
+        groups_count = len(unique)
+        count = [0] * groups_count
+        score = [0] * groups_count
+        strokes = [0] * groups_count
+        highest = [0] * groups_count
+        if aggregations:
+            for group, severity, typed in zip(groups, self.severity, self.strokes):
+                count[group] += 1
+                score[group] += severity
+                strokes[group] += typed
+                if severity > highest[group]:
+                    highest[group] = severity
+
+        totals = []
+        for name in aggregations:
+            if name == 'count':
+                totals.append(count)
+            elif name == 'score':
+                totals.append(score)
+            elif name == 'strokes':
+                totals.append(strokes)
+            elif name == 'mean_severity':
+                totals.append([round(s / c, 2) for s, c in zip(score, count)])
+            elif name == 'max_severity':
+                totals.append(highest)
+            else:
+                distinct = [0] * groups_count
+                for group, value in set(zip(groups, getattr(self, DISTINCT[name]))):
+                    if value != NO_SESSION:
+                        distinct[group] += 1
+                totals.append(distinct)
+        return unique, totals
+
+    def _group_numpy(self, numpy, specs, aggregations) -> Tuple[List[int], List[list]]:
+        def view(column: array):
+            return numpy.frombuffer(column, dtype=column.typecode)
+
+        codes = numpy.zeros(len(self), dtype=numpy.int64)
+        for column, size, shift in specs:
+            codes *= size
+            codes += view(column)
+            if shift:
+                codes += shift
+        unique, groups = numpy.unique(codes, return_inverse=True)
+        groups = groups.ravel()
+        groups_count = len(unique)
+
+        severity = view(self.severity)
+        count = numpy.bincount(groups, minlength=groups_count)
+        totals = []
+        for name in aggregations:
+            if name == 'count':
+                totals.append(count.tolist())
+            elif name == 'score':
+                totals.append(numpy.bincount(groups, severity, groups_count).astype(numpy.int64).tolist())
+            elif name == 'strokes':
+                totals.append(numpy.bincount(groups, view(self.strokes), groups_count)
+                              .astype(numpy.int64).tolist())
+            elif name == 'mean_severity':
+                score = numpy.bincount(groups, severity, groups_count).astype(numpy.int64)
+                totals.append([round(s / c, 2) for s, c in zip(score.tolist(), count.tolist())])
+            elif name == 'max_severity':
+                highest = numpy.zeros(groups_count, dtype=severity.dtype)
+                numpy.maximum.at(highest, groups, severity)
+                totals.append(highest.tolist())
+            else:
+                column = view(getattr(self, DISTINCT[name])).astype(numpy.int64)
+                keep = column != NO_SESSION
+                width = int(column.max(initial=0)) + 1
+                pairs = numpy.unique(groups[keep] * width + column[keep])
+                totals.append(numpy.bincount(pairs // width, minlength=groups_count).tolist())
+        return unique.tolist(), totals
+
+    def group_by(self, keys: Sequence[str], aggregations: Sequence[str] = DEFAULT_AGGREGATIONS) -> Breakdown:
+        """
+        One row per distinct combination of keys with its aggregations,
+        highest first aggregation first. For example group_by(['suggestion'],
+        ['translations', 'count']) ranks the suggestions Clippy gave for
+        the most different translations.
+        """
+        key_values, totals = self._group(keys, aggregations)
+        rows = list(zip(*key_values, *totals))
+        if aggregations:
+            rows.sort(key=itemgetter(len(keys)), reverse=True)
+        return Breakdown(tuple(map(title, keys)) + tuple(map(title, aggregations)), rows)
+
+    def pivot(self, index: str, columns: str, aggregation: str = 'count') -> Breakdown:
+        """
+        One row per value of index and one column per value of columns,
+        holding the aggregation of the entries with both (0 where there
+        are none), followed by the aggregation over the whole row. For
+        example pivot('suggestion', 'severity') is the distribution of
+        severities for each suggestion.
+        """
+        if index == columns:
+            raise ValueError("a pivot needs two different keys")
+        (row_values, column_values), (cells,) = self._group((index, columns), (aggregation,))
+        (row_keys,), (row_totals,) = self._group((index,), (aggregation,))
+        (column_keys,), _ = self._group((columns,), ())
+
+        place = dict(zip(column_keys, range(len(column_keys))))
+        row_of = dict(zip(row_keys, range(len(row_keys))))
+        grid = [[0] * len(column_keys) for _ in row_keys]
+        for row_key, column_key, value in zip(row_values, column_values, cells):
+            grid[row_of[row_key]][place[column_key]] = value
+
+        rows = [(row_key, *values, total) for row_key, values, total in zip(row_keys, grid, row_totals)]
+        rows.sort(key=itemgetter(-1), reverse=True)
+        headers = tuple(pivot_label(columns, value) for value in column_keys)
+        return Breakdown((title(index),) + headers + (title(aggregation),), rows)
+
+
+def pivot_label(key: str, value: Any) -> str:
+    """
+    The header of a pivot column: severities as stars, like the Severity
+    column, and sessions by number.
+    """
+    if key == 'severity':
+        return '*' * value
+    if key == 'session':
+        return 'No session' if value is None else f'Session {value}'
+    return value
+
+
+class EventTableCache(AggregateCache):
+    """
+    Stores event tables beside the aggregate cache entries.
+    """
+
+    suffix = '.events'
+    magic = b'CLPE'
+    version = EVENTS_VERSION
+
+    def load(self, file_path: str) -> Optional[EventTable]:
+        state = self.read_state(file_path)
+        if state is None:
+            return None
+        return EventTable.from_state(file_path, state['offset'], state)
+
+    def store(self, table: EventTable):
+        self.write_state(table.file_path, table.offset, table.state())
+
+
+def open_event_table(file_path: str, cache: Optional[EventTableCache] = None) -> EventTable:
+    """
+    Loads the event table of file_path from the cache when it is still
+    valid, brings it up to date and stores it again.
+    """
+    table = cache.load(file_path) if cache is not None else None
+    if table is None:
+        table = EventTable(file_path)
+    if table.update() and cache is not None:
+        try:
+            cache.store(table)
+        except OSError:
+            pass  # a read-only cache directory only costs the next scan
+    return table
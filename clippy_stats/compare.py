@@ -0,0 +1,166 @@
+"""
+Compare two rankings: did drilling make a translation come up less often?
+
+Each side is an aggregate from whatever is cheapest to load: a log
+through the aggregate cache, a range of one log's sessions through its
+session index, or a batch of logs. Nothing is re-parsed that a cache
+already holds, and two ranges of the same log share one session index,
+so a compare costs little more than loading one side. The deltas
+themselves are one pass over the translations of both sides.
+"""
+
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .batch import aggregate_batch, expand_inputs, is_batch_input
+from .cache import AggregateCache, aggregate_file_cached
+from .core import Aggregate
+from .sessions import SessionIndex, SessionIndexCache, open_session_index, parse_session_range
+
+DELTA_COLUMNS = ('Translation', 'Status', 'Count before', 'Count after', 'Count delta',
+                 'Score before', 'Score after', 'Score delta')
+DELTA_SORT_KEYS = dict(zip(DELTA_COLUMNS, (
+    'translation', 'status', 'count_before', 'count_after', 'count_delta',
+    'score_before', 'score_after', 'score_delta',
+)))
+
+NO_ENTRY = {'count': 0, 'total': 0}
+
+
+class DeltaRow:
+    """
+    One translation on both sides of a compare. An entry is None on the
+    side where the translation does not occur.
+    """
+
+    __slots__ = ('translation', 'before', 'after')
+
+    def __init__(self, translation: str, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]):
+        self.translation = translation
+        self.before = before
+        self.after = after
+
+    @property
+    def count_before(self) -> int:
+        return (self.before or NO_ENTRY)['count']
+
+    @property
+    def count_after(self) -> int:
+        return (self.after or NO_ENTRY)['count']
+
+    @property
+    def count_delta(self) -> int:
+        return self.count_after - self.count_before
+
+    @property
+    def score_before(self) -> int:
+        return (self.before or NO_ENTRY)['total']
+
+    @property
+    def score_after(self) -> int:
+        return (self.after or NO_ENTRY)['total']
+
+    @property
+    def score_delta(self) -> int:
+        return self.score_after - self.score_before
+
+    @property
+    def status(self) -> str:
+        """
+        'new' or 'resolved' when the translation is missing on one side,
+        otherwise 'more', 'fewer' or 'same' by count.
+        """
+        if self.before is None:
+            return 'new'
+        if self.after is None:
+            return 'resolved'
+        delta = self.count_delta
+        return 'more' if delta > 0 else 'fewer' if delta < 0 else 'same'
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    def __repr__(self) -> str:
+        return f"DeltaRow{delta_values(self)!r}"
+
+
+def delta_values(row: DeltaRow) -> Tuple[Any, ...]:
+    """
+    The values shown for a delta row, in DELTA_COLUMNS order.
+    """
+    return (row.translation, row.status, row.count_before, row.count_after, row.count_delta,
+            row.score_before, row.score_after, row.score_delta)
+
+
+def _magnitude(row: DeltaRow) -> Tuple[int, int]:
+    return abs(row.score_delta), abs(row.count_delta)
+
+
+def compare(before: Aggregate, after: Aggregate) -> List[DeltaRow]:
+    """
+    A row for every translation on either side, largest change in score
+    first, whichever way it went.
+    """
+    old, new = before.entry_map, after.entry_map
+    rows = [DeltaRow(translation, old.get(translation), entry) for translation, entry in new.items()]
+    rows += [DeltaRow(translation, entry, None) for translation, entry in old.items() if translation not in new]
+    rows.sort(key=_magnitude, reverse=True)
+    return rows
+
+
+def summarize(rows: Iterable[DeltaRow]) -> Dict[str, int]:
+    """
+    How many translations have each status, plus the total count and
+    score change.
+    """
+    summary = dict.fromkeys(('new', 'resolved', 'more', 'fewer', 'same', 'count_delta', 'score_delta'), 0)
+    for row in rows:
+        summary[row.status] += 1
+        summary['count_delta'] += row.count_delta
+        summary['score_delta'] += row.score_delta
+    return summary
+
+
+def format_summary(summary: Dict[str, int]) -> str:
+    return (f"{summary['new']:,} new, {summary['resolved']:,} resolved, {summary['more']:,} more, "
+            f"{summary['fewer']:,} fewer, {summary['same']:,} unchanged; "
+            f"count {summary['count_delta']:+,}, score {summary['score_delta']:+,}")
+
+
+def split_side(spec: str) -> Tuple[str, Optional[slice]]:
+    """
+    Splits 'LOG@RANGE' into the log and its session range. A spec naming
+    an existing path, or without '@', is the whole input.
+    """
+    path, at, sessions = spec.rpartition('@')
+    if not at or os.path.exists(spec):
+        return spec, None
+    return path, parse_session_range(sessions)
+
+
+class SideLoader:
+    """
+    Loads compare sides, reusing the caches and, for several ranges of one
+    log, a single session index.
+    """
+
+    def __init__(self, cache: Optional[AggregateCache] = None,
+                 session_cache: Optional[SessionIndexCache] = None, workers: int = 1):
+        self.cache = cache
+        self.session_cache = session_cache
+        self.workers = workers
+        self.indexes: Dict[str, SessionIndex] = {}
+
+    def load(self, spec: str) -> Aggregate:
+        path, sessions = split_side(spec)
+        if sessions is not None:
+            index = self.indexes.get(path)
+            if index is None:
+                index = self.indexes[path] = open_session_index(path, self.session_cache)
+            return index.aggregate(sessions)
+        if is_batch_input(path):
+            paths = expand_inputs([path])
+            if not paths:
+                raise FileNotFoundError(f"no files match {path}")
+            return aggregate_batch(paths, self.workers)[0]
+        return aggregate_file_cached(path, self.cache, self.workers)
@@ -0,0 +1,414 @@
+"""
+Parsing, aggregation, ranking and CSV export for clippy.org logs.
+
+The pipeline is split into small stages so each front-end can drive it:
+
+    lines -> iter_entries -> Aggregate -> rank -> write_csv
+
+Nothing in this module imports tkinter.
+"""
+
+import csv
+import heapq
+import re
+from operator import attrgetter
+from typing import Any, BinaryIO, Callable, Dict, IO, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+ANSI_ESCAPE = re.compile(r'\x1B\[[0-9;]*[mK]')
+# What an entry line is. Matching it directly backtracks for minutes on a
+# long line with whitespace runs and no usable '<', so lines go through
+# match_entry, which returns the same groups in linear time.
+ENTRY_PATTERN = re.compile(r'^(\*+)\s+(.*?)\s{2,}(.+?)\s*<(.+)$')
+# Entry lines as Clippy writes them: a single-spaced translation and a
+# suggestion without '<'. Where this matches, ENTRY_PATTERN matches with
+# the same groups.
+COMMON_ENTRY = re.compile(r'^(\*+)\s+(\S+(?:\s\S+)*)\s{2,}([^\s<](?:[^<]*[^\s<])?)\s*<(.+)$')
+
+COLUMNS = ('Translation', 'Suggestions', 'Severity', 'Count', 'Score', 'Strokes saved')
+MAX_SUGGESTIONS = 8  # suggestions counted per translation
+
+Entry = Tuple[int, str, str, int]  # severity, translation, suggestion, strokes typed
+
+
+class Cancelled(Exception):
+    """
+    Raised from a progress callback to abandon a parse or an export.
+    """
+
+
+def strip_ansi(text: str) -> str:
+    return ANSI_ESCAPE.sub('', text)
+
+
+class EntryMatcher:
+    """
+    ENTRY_PATTERN's groups for one line (without a newline), found with a
+    few scans instead of backtracking. Works on str or bytes lines, given
+    the whitespace class the pattern uses (r'\\s' for str) and the
+    characters it covers, for rstrip (None for str).
+
+    ENTRY_PATTERN tries the shortest translation first, so it stops at
+    the first whitespace run of two or more that a usable '<' (one with
+    something after it) follows. The suggestion then runs up to the
+    next usable '<', less the whitespace before it. When no such run
+    exists, the pattern backtracks into the whitespace after the stars
+    and accepts an empty translation; the last two branches below are
+    those cases.
+    """
+
+    def __init__(self, whitespace, strip_chars=None):
+        text = isinstance(whitespace, str)
+        self.leading = re.compile(whitespace + ('+' if text else b'+'))
+        self.run = re.compile(whitespace + ('{2,}' if text else b'{2,}'))
+        self.strip_chars = strip_chars
+        self.star, self.less_than = ('*', '<') if text else (b'*', b'<')
+
+    def match(self, line):
+        end = len(line)
+        last = line.rfind(self.less_than, 0, end - 1)
+        if last < 0:
+            return None
+        stars = end - len(line.lstrip(self.star))
+        leading = self.leading.match(line, stars) if stars else None
+        if leading is None:
+            return None
+        start = leading.end()
+        run = self.run.search(line, start, last)
+        if run is not None and run.end() < last:
+            translation, suggestion = line[start:run.start()], run.end()
+        elif run is not None and run.end() - run.start() >= 3:
+            translation, suggestion = line[start:run.start()], run.end() - 1
+        elif start < last and start - stars >= 3:
+            translation, suggestion = line[:0], start
+        elif start == last and start - stars >= 4:
+            translation, suggestion = line[:0], start - 1
+        else:
+            return None
+        less_than = line.find(self.less_than, suggestion + 1, end - 1)
+        suggestion_end = suggestion + 1 + len(line[suggestion + 1:less_than].rstrip(self.strip_chars))
+        return line[:stars], translation, line[suggestion:suggestion_end], line[less_than + 1:]
+
+
+_match_linear = EntryMatcher(r'\s').match
+
+
+def match_entry(line: str) -> Optional[Tuple[str, str, str, str]]:
+    """
+    ENTRY_PATTERN.match(line).groups(), or None where it does not match:
+    (stars, translation, suggestion, typed outline).
+    """
+    match = COMMON_ENTRY.match(line)
+    if match is not None:
+        return match.groups()
+    if '\n' in line:
+        # Never the case for lines split from a log; '.' stops at newlines
+        match = ENTRY_PATTERN.match(line)
+        return None if match is None else match.groups()
+    return _match_linear(line)
+
+
+def parse_line(line: str) -> Optional[Entry]:
+    """
+    Returns (severity, translation, suggestion, strokes typed) for an entry
+    line, else None. The strokes are those of the outline after '<', the
+    one that was written instead of the suggestion.
+    """
+    line = strip_ansi(line.strip())
+    if line.startswith('START') or line.startswith('END') or not line.startswith('*'):
+        return None
+    groups = match_entry(line)
+    if groups is None:
+        return None
+
+    stars, translation, suggestion, typed = groups
+    return len(stars), translation, suggestion, typed.count('/') + 1
+
+
+def outline_strokes(outline: str) -> int:
+    """
+    The strokes in a steno outline such as 'TKPWO/-G', or in the shortest
+    of a comma-separated list of them.
+    """
+    return min(part.count('/') for part in outline.split(',')) + 1
+
+
+def iter_lines(file: BinaryIO) -> Iterator[str]:
+    """
+    Decodes a binary log one line at a time.
+
+    Lines are split on '\\n' only, like every other parser here and the
+    web page. The original GUI read the log in text mode, where a lone
+    '\\r' also ended a line; now it stays inside its line. A '\\r\\n'
+    ending is unaffected, since parse_line strips the '\\r'.
+    """
+    for raw in file:
+        yield raw.decode('utf-8')
+
+
+def iter_entries(lines: Iterable[str]) -> Iterator[Entry]:
+    for line in lines:
+        entry = parse_line(line)
+        if entry is not None:
+            yield entry
+
+
+def new_entry() -> Dict[str, Any]:
+    """
+    An empty entry_map record:
+
+    count        entries seen
+    total        their severities summed, so the mean is total / count
+    strokes      the strokes typed in them, summed
+    severities   a histogram: severities[s - 1] entries had s stars
+    suggestions  {suggestion: entries}, at most max_suggestions of them
+
+    strokes.StrokeIndex.annotate() may add 'best', the fewest strokes any
+    dictionary outline for the translation takes.
+    """
+    return {'count': 0, 'total': 0, 'strokes': 0, 'severities': [], 'suggestions': {}}
+
+
+def count_suggestion(suggestions: Dict[str, int], suggestion: str, cap: int, weight: int = 1):
+    """
+    Adds weight to suggestion in a counter that holds at most cap of them.
+    When full, a new suggestion replaces the rarest one and inherits its
+    count (Space-Saving), so the most frequent suggestions are always
+    kept, with counts that may be overestimated by what they inherited.
+    """
+    if suggestion in suggestions:
+        suggestions[suggestion] += weight
+    elif len(suggestions) < cap:
+        suggestions[suggestion] = weight
+    else:
+        rarest = min(suggestions, key=suggestions.__getitem__)
+        suggestions[suggestion] = suggestions.pop(rarest) + weight
+
+
+class Aggregate:
+    """
+    Per-translation totals: entry count, a histogram of severities (with
+    their sum, for the mean) and a bounded counter of the suggestions
+    Clippy gave. See new_entry() for the record kept per translation.
+
+    Every total is a sum, so aggregates of separate byte ranges combine to
+    the same totals in any order; the suggestion counters are exact until
+    a translation collects more than max_suggestions distinct suggestions.
+    origin is where this aggregate's lines start in the log.
+    """
+
+    def __init__(self, origin: int = 0, max_suggestions: int = MAX_SUGGESTIONS):
+        self.entry_map: Dict[str, Dict[str, Any]] = {}
+        self.origin = origin
+        self.max_suggestions = max_suggestions
+
+    def __len__(self) -> int:
+        return len(self.entry_map)
+
+    def add(self, severity: int, translation: str, suggestion: str, strokes: int = 1):
+        entry = self.entry_map.get(translation)
+        if entry is None:
+            entry = self.entry_map[translation] = new_entry()
+        entry['count'] += 1
+        entry['total'] += severity
+        entry['strokes'] += strokes
+        severities = entry['severities']
+        if severity > len(severities):
+            severities.extend([0] * (severity - len(severities)))
+        severities[severity - 1] += 1
+        count_suggestion(entry['suggestions'], suggestion, self.max_suggestions)
+
+    def update(self, entries: Iterable[Entry]) -> 'Aggregate':
+        # Same as calling add() per entry, inlined because this loop runs
+        # once for every entry line in the log.
+        entry_map = self.entry_map
+        cap = self.max_suggestions
+        for severity, translation, suggestion, strokes in entries:
+            entry = entry_map.get(translation)
+            if entry is None:
+                entry = entry_map[translation] = {'count': 0, 'total': 0, 'strokes': 0, 'severities': [],
+                                                  'suggestions': {}}
+            entry['count'] += 1
+            entry['total'] += severity
+            entry['strokes'] += strokes
+            severities = entry['severities']
+            if severity > len(severities):
+                severities.extend([0] * (severity - len(severities)))
+            severities[severity - 1] += 1
+            suggestions = entry['suggestions']
+            if suggestion in suggestions:
+                suggestions[suggestion] += 1
+            elif len(suggestions) < cap:
+                suggestions[suggestion] = 1
+            else:
+                count_suggestion(suggestions, suggestion, cap)
+        return self
+
+    def merge(self, other: 'Aggregate') -> 'Aggregate':
+        cap = self.max_suggestions
+        for translation, theirs in other.entry_map.items():
+            mine = self.entry_map.get(translation)
+            if mine is None:
+                self.entry_map[translation] = copy_entry(theirs)
+                continue
+            mine['count'] += theirs['count']
+            mine['total'] += theirs['total']
+            mine['strokes'] += theirs['strokes']
+            severities = mine['severities']
+            extra = len(theirs['severities']) - len(severities)
+            if extra > 0:
+                severities.extend([0] * extra)
+            for index, count in enumerate(theirs['severities']):
+                severities[index] += count
+            suggestions = mine['suggestions']
+            for suggestion, count in theirs['suggestions'].items():
+                count_suggestion(suggestions, suggestion, cap, count)
+        self.origin = max(self.origin, other.origin)
+        return self
+
+
+def copy_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    return {'count': entry['count'], 'total': entry['total'], 'strokes': entry['strokes'],
+            'severities': list(entry['severities']), 'suggestions': dict(entry['suggestions'])}
+
+
+def merge_all(aggregates: Iterable[Aggregate]) -> Aggregate:
+    """
+    Merges aggregates in log order. The totals do not depend on the order,
+    but merging by origin also keeps rows with equal scores in the order
+    a serial parse would list them.
+    """
+    ordered = sorted(aggregates, key=lambda a: a.origin)
+    if not ordered:
+        return Aggregate()
+    merged = ordered[0]
+    for aggregate in ordered[1:]:
+        merged.merge(aggregate)
+    return merged
+
+
+def aggregate_file(file_path: str) -> Aggregate:
+    with open(file_path, 'rb') as file:
+        return Aggregate().update(iter_entries(iter_lines(file)))
+
+
+class Row:
+    """
+    One ranked translation.
+
+    A row reads through to its entry_map record instead of copying it, so
+    it stays current while a followed log grows. The display strings
+    (joined suggestions, severity stars) are built when the row is shown
+    or exported, not kept per row.
+
+    severity is the highest severity the translation was flagged with and
+    score the sum of all its severities, i.e. count * mean_severity.
+    strokes_saved is what writing the shortest outline every time would
+    have saved.
+    """
+
+    __slots__ = ('translation', 'entry')
+
+    def __init__(self, translation: str, entry: Dict[str, Any]):
+        self.translation = translation
+        self.entry = entry
+
+    @property
+    def severity(self) -> int:
+        # The histogram ends at the highest severity seen
+        return len(self.entry['severities'])
+
+    @property
+    def mean_severity(self) -> float:
+        entry = self.entry
+        return entry['total'] / entry['count'] if entry['count'] else 0.0
+
+    @property
+    def count(self) -> int:
+        return self.entry['count']
+
+    @property
+    def score(self) -> int:
+        return self.entry['total']
+
+    @property
+    def suggestions(self) -> str:
+        # Most frequent first
+        counts = self.entry['suggestions']
+        return '; '.join(sorted(counts, key=lambda suggestion: (-counts[suggestion], suggestion)))
+
+    @property
+    def severity_stars(self) -> str:
+        return '*' * len(self.entry['severities'])
+
+    @property
+    def strokes_saved(self) -> int:
+        # The dictionary's shortest outline when annotated, else the
+        # shortest one Clippy suggested
+        entry = self.entry
+        best = entry.get('best')
+        if best is None:
+            best = min(map(outline_strokes, entry['suggestions']), default=1)
+        return max(0, entry['strokes'] - entry['count'] * best)
+
+    def __getitem__(self, key: str):
+        # Rows used to be dicts; keep row['score'] working for callers
+        return getattr(self, key)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Row):
+            return NotImplemented
+        return row_values(self) == row_values(other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"Row{row_values(self)!r}"
+
+
+def entry_row(translation: str, data: Dict[str, Any]) -> Row:
+    return Row(translation, data)
+
+
+def row_values(entry: Row) -> Tuple[str, str, str, int, int, int]:
+    """
+    The values shown for a row, in COLUMNS order.
+    """
+    return (entry.translation, entry.suggestions,
+            entry.severity_stars, entry.count, entry.score, entry.strokes_saved)
+
+
+def _score(item: Tuple[str, Dict[str, Any]]) -> int:
+    return item[1]['total']
+
+
+def rank(aggregate: Aggregate, top: Optional[int] = None) -> List[Row]:
+    """
+    Turns an aggregate into display rows sorted by score, highest first.
+
+    With top, only the first `top` rows are returned, picked with a heap
+    in O(n log top) and without building a Row for every translation.
+    The rows are the same as rank(aggregate)[:top], ties included.
+    """
+    if top is not None:
+        return [Row(translation, data)
+                for translation, data in heapq.nlargest(top, aggregate.entry_map.items(), key=_score)]
+    data_entries = [Row(translation, data) for translation, data in aggregate.entry_map.items()]
+    data_entries.sort(key=attrgetter('score'), reverse=True)
+    return data_entries
+
+
+def analyze_file(file_path: str) -> List[Row]:
+    return rank(aggregate_file(file_path))
+
+
+def write_csv(data_entries: Iterable[Row], csvfile: IO[str], columns: Sequence[str] = COLUMNS,
+              values: Callable[[Any], Sequence[Any]] = row_values):
+    writer = csv.writer(csvfile)
+    writer.writerow(columns)
+    writer.writerows(map(values, data_entries))
+
+
+def export_csv(data_entries: Iterable[Row], file_path: str, columns: Sequence[str] = COLUMNS,
+               values: Callable[[Any], Sequence[Any]] = row_values):
+    with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
+        write_csv(data_entries, csvfile, columns, values)
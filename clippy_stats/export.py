@@ -0,0 +1,260 @@
+"""
+Streaming export of ranked rows to CSV, JSON Lines or a SQLite table.
+
+Rows are converted and written EXPORT_BATCH at a time, so an export holds
+one batch of output in memory however many rows there are, and the
+progress callback runs between batches. The output is written to a
+temporary file beside the target and moved into place when complete, so
+a failed or cancelled export never leaves a partial file behind.
+
+The CLI, the GUIs (through ExportWorker) and the daemon's streamed
+downloads all go through the same batch writers.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import queue
+import shutil
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .core import COLUMNS, Cancelled, row_values
+
+EXPORT_BATCH = 2000  # rows converted and written at a time
+EXPORT_FORMATS = ('csv', 'jsonl', 'sqlite')
+SQLITE_TABLE = 'translations'
+
+# Called with (rows written, rows to write or None) after each batch. An
+# exception raised by the callback abandons the export, e.g. to cancel it.
+ExportProgress = Callable[[int, Optional[int]], None]
+
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.sqlite': 'sqlite',
+    '.sqlite3': 'sqlite',
+    '.db': 'sqlite',
+}
+
+# mkstemp files are private; exports get the permissions open() would give
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def export_format(file_path: str) -> Tuple[str, bool]:
+    """
+    The format a file name asks for and whether it ends in '.gz', e.g.
+    ('jsonl', True) for 'rows.jsonl.gz'. Unknown extensions are CSV.
+    """
+    name = file_path.lower()
+    compressed = name.endswith('.gz')
+    if compressed:
+        name = name[:-3]
+    return EXTENSIONS.get(os.path.splitext(name)[1], 'csv'), compressed
+
+
+def field_name(column: str) -> str:
+    """
+    The JSON and SQLite name of a column, as in view.SORT_KEYS:
+    'Strokes saved' is 'strokes_saved'.
+    """
+    return column.lower().replace(' ', '_')
+
+
+def iter_batches(data_entries: Iterable[Any], batch_size: int = EXPORT_BATCH) -> Iterator[List[Any]]:
+    batch = []
+    for entry in data_entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def csv_chunks(data_entries: Iterable[Any], columns: Sequence[str] = COLUMNS,
+               values: Callable[[Any], Sequence[Any]] = row_values,
+               batch_size: int = EXPORT_BATCH) -> Iterator[Tuple[str, int]]:
+    """
+    CSV text for the header and then for each batch of rows, with the
+    number of rows in it. Quoting follows the csv module's defaults.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in iter_batches(data_entries, batch_size):
+        writer.writerows(map(values, batch))
+        yield buffer.getvalue(), len(batch)
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue(), 0
+
+
+def jsonl_chunks(data_entries: Iterable[Any], columns: Sequence[str] = COLUMNS,
+                 values: Callable[[Any], Sequence[Any]] = row_values,
+                 batch_size: int = EXPORT_BATCH) -> Iterator[Tuple[str, int]]:
+    """
+    One JSON object per row, keyed by field_name(column), a batch at a
+    time, with the number of rows in each.
+    """
+    fields = [field_name(column) for column in columns]
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    for batch in iter_batches(data_entries, batch_size):
+        yield ''.join(encode(dict(zip(fields, values(entry)))) + '\n' for entry in batch), len(batch)
+
+
+CHUNK_WRITERS = {'csv': csv_chunks, 'jsonl': jsonl_chunks}
+
+
+def _total(data_entries: Iterable[Any]) -> Optional[int]:
+    try:
+        return len(data_entries)
+    except TypeError:
+        return None
+
+
+def write_rows(data_entries: Iterable[Any], file, fmt: str = 'csv', columns: Sequence[str] = COLUMNS,
+               values: Callable[[Any], Sequence[Any]] = row_values,
+               progress: Optional[ExportProgress] = None, batch_size: int = EXPORT_BATCH) -> int:
+    """
+    Writes rows as CSV or JSON Lines to a text file opened with newline=''.
+    Returns the number of rows written.
+    """
+    total = _total(data_entries)
+    done = 0
+    for text, count in CHUNK_WRITERS[fmt](data_entries, columns, values, batch_size):
+        file.write(text)
+        done += count
+        if progress is not None:
+            progress(done, total)
+    return done
+
+
+def write_sqlite(data_entries: Iterable[Any], db_path: str, columns: Sequence[str] = COLUMNS,
+                 values: Callable[[Any], Sequence[Any]] = row_values,
+                 progress: Optional[ExportProgress] = None, batch_size: int = EXPORT_BATCH,
+                 table: str = SQLITE_TABLE) -> int:
+    """
+    Writes rows to a new table in the SQLite database at db_path, in one
+    transaction, with a column per field_name(column). Integer values
+    keep their type. Returns the number of rows written.
+    """
+    total = _total(data_entries)
+    fields = ', '.join(f'"{field_name(column)}"' for column in columns)
+    placeholders = ', '.join('?' * len(columns))
+    db = sqlite3.connect(db_path)
+    try:
+        with db:
+            db.execute(f'DROP TABLE IF EXISTS "{table}"')
+            db.execute(f'CREATE TABLE "{table}" ({fields})')
+            done = 0
+            for batch in iter_batches(data_entries, batch_size):
+                db.executemany(f'INSERT INTO "{table}" VALUES ({placeholders})', map(values, batch))
+                done += len(batch)
+                if progress is not None:
+                    progress(done, total)
+    finally:
+        db.close()
+    return done
+
+
+def export_rows(data_entries: Iterable[Any], file_path: str, fmt: Optional[str] = None,
+                compress: Optional[bool] = None, columns: Sequence[str] = COLUMNS,
+                values: Callable[[Any], Sequence[Any]] = row_values,
+                progress: Optional[ExportProgress] = None, batch_size: int = EXPORT_BATCH) -> int:
+    """
+    Exports rows to file_path in fmt, gzipped when compress is true. Both
+    default to what the file name asks for (see export_format). Whatever
+    was at file_path is replaced once the export is complete. Returns the
+    number of rows written.
+    """
+    guessed, gzipped = export_format(file_path)
+    fmt = fmt or guessed
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}; use one of {', '.join(EXPORT_FORMATS)}")
+    if compress is None:
+        compress = gzipped
+
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.export-', suffix='.tmp')
+    os.close(fd)
+    db_path = None
+    try:
+        if fmt == 'sqlite':
+            # SQLite needs a seekable file; a compressed export gzips it afterwards
+            if compress:
+                fd, db_path = tempfile.mkstemp(dir=directory, prefix='.export-', suffix='.sqlite')
+                os.close(fd)
+            else:
+                db_path = tmp_path
+            count = write_sqlite(data_entries, db_path, columns, values, progress, batch_size)
+            if compress:
+                with open(db_path, 'rb') as source, gzip.open(tmp_path, 'wb') as target:
+                    shutil.copyfileobj(source, target, 1 << 20)
+        else:
+            if compress:
+                file = gzip.open(tmp_path, 'wt', encoding='utf-8', newline='')
+            else:
+                file = open(tmp_path, 'w', encoding='utf-8', newline='')
+            with file:
+                count = write_rows(data_entries, file, fmt, columns, values, progress, batch_size)
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    finally:
+        if db_path is not None and db_path != tmp_path:
+            os.unlink(db_path)
+    return count
+
+
+class ExportWorker(threading.Thread):
+    """
+    Runs export_rows on a daemon thread and reports back through a queue,
+    like ingest.IngestWorker:
+
+        ('progress', rows written, rows to write)
+        ('done', rows written)
+        ('cancelled',)
+        ('error', exception)
+
+    data_entries must not change while the export runs; the GUI passes
+    copies of the shown rows and their entries, since following keeps
+    updating the live ones.
+    """
+
+    def __init__(self, data_entries: Sequence[Any], file_path: str, fmt: Optional[str] = None,
+                 compress: Optional[bool] = None):
+        super().__init__(name='clippy-export', daemon=True)
+        self.data_entries = data_entries
+        self.file_path = file_path
+        self.fmt = fmt
+        self.compress = compress
+        self.messages: queue.Queue = queue.Queue()
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        try:
+            count = export_rows(self.data_entries, self.file_path, self.fmt, self.compress,
+                                progress=self._progress)
+            self.messages.put(('done', count))
+        except Cancelled:
+            self.messages.put(('cancelled',))
+        except Exception as e:
+            self.messages.put(('error', e))
+
+    def _progress(self, done: int, total: Optional[int]):
+        if self.cancelled.is_set():
+            raise Cancelled()
+        self.messages.put(('progress', done, total))
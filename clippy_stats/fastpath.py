@@ -0,0 +1,134 @@
+"""
+Zero-copy ingestion: memory-map the log and parse it as bytes.
+
+A single regex scan jumps from one candidate line to the next, where a
+candidate starts with '*' after optional whitespace and ANSI codes. Only
+candidates are copied out of the map. They are matched with bytes regexes,
+and only the captured translation and suggestion are decoded.
+
+The result is identical to core.parse_line for every line. Like
+core.match_entry, lines are tried against the common entry shape first
+and only the rest go through the linear EntryMatcher. str.strip()
+and the str regex '\\s' also treat Unicode spaces as whitespace, and bytes
+patterns cannot see those, so the rare line containing one takes the
+str path instead.
+"""
+
+import mmap
+import re
+from typing import Iterator, Optional
+
+from .core import Aggregate, Entry, EntryMatcher, parse_line
+
+# The ASCII characters str.isspace() accepts; bytes.strip() only knows six
+ASCII_WHITESPACE = b' \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f'
+_WS = rb'[ \t\n\r\x0b\x0c\x1c-\x1f]'
+_NOT_WS = rb'[^ \t\n\r\x0b\x0c\x1c-\x1f]'
+_NOT_WS_OR_LT = rb'[^ \t\n\r\x0b\x0c\x1c-\x1f<]'
+_PREFIX = rb'[ \t\r\x0b\x0c\x1c-\x1f]*(?:\x1b\[[0-9;]*[mK])*(?:\*|[\x80-\xff])[^\n]*'
+
+FIRST_CANDIDATE = re.compile(_PREFIX)
+NEXT_CANDIDATE = re.compile(rb'\n(' + _PREFIX + rb')')
+ANSI_ESCAPE_BYTES = re.compile(rb'\x1B\[[0-9;]*[mK]')
+ENTRY_PATTERN_BYTES = re.compile(
+    rb'^(\*+)' + _WS + rb'+(.*?)' + _WS + rb'{2,}(.+?)' + _WS + rb'*<(.+)$')
+# core.COMMON_ENTRY for bytes
+COMMON_ENTRY_BYTES = re.compile(
+    rb'^(\*+)' + _WS + rb'+(' + _NOT_WS + rb'+(?:' + _WS + _NOT_WS + rb'+)*)' + _WS + rb'{2,}(' +
+    _NOT_WS_OR_LT + rb'(?:[^<]*' + _NOT_WS_OR_LT + rb')?)' + _WS + rb'*<(.+)$')
+# bytes '\s' misses \x1c-\x1f but is much faster than a character class,
+# so COMMON_ENTRY_FAST is only used on lines SLOW_PATH_BYTES rules out.
+COMMON_ENTRY_FAST = re.compile(rb'^(\*+)\s+(\S+(?:\s\S+)*)\s{2,}([^\s<](?:[^<]*[^\s<])?)\s*<(.+)$')
+# ENTRY_PATTERN_BYTES in linear time, for the lines the common shape misses
+match_entry_bytes = EntryMatcher(_WS, ASCII_WHITESPACE).match
+SLOW_PATH_BYTES = re.compile(
+    rb'[\x1b\x1c-\x1f]|\xc2[\x85\xa0]|\xe1\x9a\x80|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80')
+UNICODE_SPACE = re.compile(
+    rb'\xc2[\x85\xa0]|\xe1\x9a\x80|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80')
+
+
+def parse_line_bytes(line: bytes) -> Optional[Entry]:
+    """
+    Bytes counterpart of core.parse_line.
+    """
+    if not line.isascii() and UNICODE_SPACE.search(line):
+        return parse_line(line.decode('utf-8'))
+
+    line = line.strip(ASCII_WHITESPACE)
+    if b'\x1b' in line:
+        line = ANSI_ESCAPE_BYTES.sub(b'', line)
+    if not line.startswith(b'*'):
+        return None
+    match = COMMON_ENTRY_BYTES.match(line)
+    groups = match.groups() if match is not None else match_entry_bytes(line)
+    if groups is None:
+        return None
+
+    stars, translation, suggestion, typed = groups
+    return len(stars), translation.decode('utf-8'), suggestion.decode('utf-8'), typed.count(b'/') + 1
+
+
+def iter_entries_buffer(buffer, start: int = 0, end: Optional[int] = None) -> Iterator[Entry]:
+    """
+    Yields the entries of the lines in buffer[start:end]. start must be the
+    beginning of a line.
+    """
+    if end is None:
+        end = len(buffer)
+
+    first = FIRST_CANDIDATE.match(buffer, start, end)
+    if first:
+        entry = parse_line_bytes(first.group())
+        if entry is not None:
+            yield entry
+
+    slow_path = SLOW_PATH_BYTES.search
+    match_common = COMMON_ENTRY_FAST.match
+    for candidate in NEXT_CANDIDATE.finditer(buffer, start, end):
+        line = candidate.group(1)
+        if slow_path(line):
+            entry = parse_line_bytes(line)
+            if entry is not None:
+                yield entry
+            continue
+        # Plain lines: strip() is exact here and they already start with '*'
+        # or a non-ASCII byte, which the patterns reject.
+        line = line.strip()
+        match = match_common(line)
+        if match is not None:
+            stars, translation, suggestion, typed = match.groups()
+        else:
+            groups = match_entry_bytes(line)
+            if groups is None:
+                continue
+            stars, translation, suggestion, typed = groups
+        yield len(stars), translation.decode('utf-8'), suggestion.decode('utf-8'), typed.count(b'/') + 1
+
+
+def aggregate_mmap(file_path: str, start: int = 0, end: Optional[int] = None) -> Aggregate:
+    """
+    Aggregates the lines in [start, end) of the log through a read-only
+    memory map.
+    """
+    aggregate = Aggregate(origin=start)
+    with open(file_path, 'rb') as file:
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return aggregate  # empty files cannot be mapped
+        with buffer:
+            aggregate.update(iter_entries_buffer(buffer, start, end))
+    return aggregate
+
+
+def count_lines(file_path: str, start: int = 0, end: Optional[int] = None) -> int:
+    """
+    Number of newlines in [start, end) of the file.
+    """
+    with open(file_path, 'rb') as file:
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            return 0
+        with buffer:
+            return buffer[start:end].count(b'\n')
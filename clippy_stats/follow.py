@@ -0,0 +1,189 @@
+"""
+Follow a clippy.org log while Plover keeps appending to it.
+
+LogFollower remembers the byte offset of the last complete line it parsed,
+so every refresh reads only the appended tail. A watcher tells the caller
+when there is something to read: inotify on Linux, stat polling elsewhere.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from typing import Callable, Optional, Set, Tuple
+
+from .core import Aggregate, parse_line
+
+
+class LogFollower:
+    """
+    Incrementally aggregates a growing log.
+
+    Only newline-terminated lines are consumed; an unterminated final line
+    is still being written and is picked up by the poll that completes it.
+    Truncation or rotation (a new file at the same path) restarts the
+    aggregate from the top of the new file.
+
+    factory makes the empty aggregate to start from, e.g. a bounded
+    heavy.HeavyHitters for a log that is never rotated.
+    """
+
+    def __init__(self, file_path: str, aggregate: Optional[Aggregate] = None, offset: int = 0,
+                 factory: Callable[[], Aggregate] = Aggregate):
+        self.file_path = file_path
+        self.factory = factory
+        self.aggregate = aggregate if aggregate is not None else factory()
+        self.offset = offset
+        self.identity = None
+
+    def reset(self):
+        self.aggregate = self.factory()
+        self.offset = 0
+
+    def poll(self) -> Tuple[Set[str], bool]:
+        """
+        Parses whatever was appended since the last poll.
+        Returns the translations that changed and whether the aggregate was
+        rebuilt from scratch because the file was truncated or replaced.
+        """
+        changed = set()
+        with open(self.file_path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            identity = (stat.st_dev, stat.st_ino)
+            was_reset = False
+            if (self.identity is not None and identity != self.identity) or stat.st_size < self.offset:
+                self.reset()
+                was_reset = True
+            self.identity = identity
+
+            file.seek(self.offset)
+            add = self.aggregate.add
+            for raw in file:
+                if not raw.endswith(b'\n'):
+                    break
+                self.offset += len(raw)
+                entry = parse_line(raw.decode('utf-8'))
+                if entry is not None:
+                    add(*entry)
+                    changed.add(entry[1])
+        return changed, was_reset
+
+
+class PollingWatcher:
+    """
+    Portable fallback: reports a change when the file's size, mtime or
+    inode differs from the last check.
+    """
+
+    def __init__(self, file_path: str, interval: float = 1.0):
+        self.file_path = file_path
+        self.interval = interval
+        self.last = self._signature()
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def changed(self) -> bool:
+        signature = self._signature()
+        if signature == self.last:
+            return False
+        self.last = signature
+        return True
+
+    def wait(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while not self.changed():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.interval, remaining))
+        return True
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Linux inotify watch on the log's directory, so writes, truncation and
+    rotation of the file all wake the caller without polling the disk.
+    """
+
+    IN_MODIFY = 0x002
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, file_path: str):
+        libc_name = ctypes.util.find_library('c')
+        if not sys.platform.startswith('linux') or libc_name is None:
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+
+        directory, name = os.path.split(os.path.abspath(file_path))
+        self.name = os.fsencode(name)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = (self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_FROM |
+                self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE)
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch failed")
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def changed(self) -> bool:
+        found = False
+        while True:
+            try:
+                buffer = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return found
+            position = 0
+            while position < len(buffer):
+                _, _, _, length = self.EVENT_HEADER.unpack_from(buffer, position)
+                position += self.EVENT_HEADER.size
+                name = buffer[position:position + length].rstrip(b'\0')
+                position += length
+                if name == self.name:
+                    found = True
+
+    def wait(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if select.select([self.fd], [], [], remaining)[0] and self.changed():
+                return True
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def make_watcher(file_path: str, interval: float = 1.0):
+    """
+    Returns an InotifyWatcher where the platform supports it, otherwise a
+    PollingWatcher checking every `interval` seconds.
+    """
+    try:
+        return InotifyWatcher(file_path)
+    except (OSError, AttributeError):
+        return PollingWatcher(file_path, interval)
@@ -0,0 +1,118 @@
+"""
+Approximate ranking in a fixed amount of memory.
+
+HeavyHitters counts translations with the Space-Saving algorithm (Metwally,
+Agrawal and El Abbadi, 2005). It keeps at most `capacity` translations; when
+a new one arrives and the table is full, the translation with the lowest
+count is evicted and the newcomer inherits that count as its possible
+overestimate. Memory therefore stays bounded however long the log or stream
+runs, which an exact Aggregate cannot promise.
+
+With N entries seen so far, m the lowest count in a full table and
+N / capacity the worst case of m, every kept translation satisfies
+
+    count - error <= true count <= count
+
+where error <= m <= N / capacity, and every translation whose true count
+is above m is guaranteed to be in the table. Clippy misses are heavily
+skewed towards a few words, so the top rows are normally exact
+(error == 0) long before the table fills.
+
+Entries have the same fields as Aggregate's. A newcomer's inherited count
+is scored at its first severity and stroke count, so scores carry the same
+relative error as the counts; the severity histogram only holds entries
+actually seen.
+"""
+
+import heapq
+from typing import Any, Dict, Iterable, List, Tuple
+
+from .core import MAX_SUGGESTIONS, Entry, count_suggestion, new_entry
+
+DEFAULT_CAPACITY = 10000
+
+
+class HeavyHitters:
+    """
+    A bounded stand-in for core.Aggregate: add(), update() and entry_map
+    work the same way, so rank(), Row, LogFollower and batch.aggregate_stream
+    accept it unchanged. Entries carry an extra 'error' field, the most
+    their count may exceed the true count by.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, max_suggestions: int = MAX_SUGGESTIONS,
+                 origin: int = 0):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.max_suggestions = max_suggestions
+        self.origin = origin
+        self.entry_map: Dict[str, Dict[str, Any]] = {}
+        self.total = 0
+        self.evicted = 0
+        # (count, translation) with exactly one item per kept translation.
+        # Counts only grow, so an item may be lower than the entry's count;
+        # stale items are refreshed when they reach the top of the heap.
+        self._heap: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.entry_map)
+
+    @property
+    def error_bound(self) -> int:
+        """
+        The largest overestimate any count can have right now: the lowest
+        count once the table is full, 0 before that.
+        """
+        if len(self.entry_map) < self.capacity:
+            return 0
+        return self._minimum()[0]
+
+    def _minimum(self) -> Tuple[int, str]:
+        heap, entry_map = self._heap, self.entry_map
+        while True:
+            count, translation = heap[0]
+            current = entry_map[translation]['count']
+            if current == count:
+                return count, translation
+            heapq.heapreplace(heap, (current, translation))
+
+    def add(self, severity: int, translation: str, suggestion: str, strokes: int = 1):
+        self.total += 1
+        entry = self.entry_map.get(translation)
+        if entry is None:
+            entry = new_entry()
+            if len(self.entry_map) < self.capacity:
+                entry['error'] = 0
+                heapq.heappush(self._heap, (1, translation))
+            else:
+                floor, victim = self._minimum()
+                del self.entry_map[victim]
+                self.evicted += 1
+                entry.update(count=floor, total=floor * severity, strokes=floor * strokes, error=floor)
+                # The victim's item is on top of the heap; the newcomer takes it over
+                heapq.heapreplace(self._heap, (floor + 1, translation))
+            self.entry_map[translation] = entry
+        entry['count'] += 1
+        entry['total'] += severity
+        entry['strokes'] += strokes
+        severities = entry['severities']
+        if severity > len(severities):
+            severities.extend([0] * (severity - len(severities)))
+        severities[severity - 1] += 1
+        count_suggestion(entry['suggestions'], suggestion, self.max_suggestions)
+
+    def update(self, entries: Iterable[Entry]) -> 'HeavyHitters':
+        add = self.add
+        for entry in entries:
+            add(*entry)
+        return self
+
+    def guaranteed(self, translation: str) -> bool:
+        """
+        Whether the translation is certain to belong in the table: its
+        lowest possible count is at least the highest possible count of
+        any translation that was evicted or never kept.
+        """
+        entry = self.entry_map.get(translation)
+        return entry is not None and entry['count'] - entry['error'] >= self.error_bound
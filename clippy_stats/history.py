@@ -0,0 +1,386 @@
+"""
+Long-term history of Clippy misses in a local SQLite database.
+
+Every entry line becomes a row in `events`, tagged with the source log and
+the session it was written in (sessions are delimited by the START and END
+lines Plover writes). `severities` and `suggestions` hold the running
+per-translation counts, updated with each batch, so ranking the whole
+history reads a few rows per translation instead of every event. They
+are exact; the suggestion cap only applies to the Aggregate read back.
+
+Logs are ingested incrementally, like the aggregate cache: a log that has
+only grown resumes from the last ingested line. A log whose start changed
+(rotated or rewritten) becomes a new source; its earlier events stay in
+the history under the retired one, which a file starting with the same
+bytes, such as the rotated log under its new name, resumes.
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from .cache import PREFIX_BYTES, prefix_hash
+from .core import MAX_SUGGESTIONS, Aggregate, new_entry, parse_line, strip_ansi
+
+BATCH_SIZE = 10000
+SCHEMA_VERSION = 4  # PRAGMA user_version
+
+SOURCES = """
+CREATE TABLE IF NOT EXISTS {name} (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    retired INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    prefix_length INTEGER NOT NULL,
+    prefix_hash TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    session_id INTEGER
+);
+"""
+
+SCHEMA = SOURCES.format(name='sources') + """
+CREATE UNIQUE INDEX IF NOT EXISTS sources_path ON sources(path) WHERE NOT retired;
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    label TEXT,
+    start_offset INTEGER NOT NULL,
+    end_offset INTEGER
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    session_id INTEGER REFERENCES sessions(id),
+    translation TEXT NOT NULL,
+    suggestion TEXT NOT NULL,
+    severity INTEGER NOT NULL,
+    strokes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS events_translation ON events(translation);
+CREATE INDEX IF NOT EXISTS events_session ON events(session_id);
+CREATE INDEX IF NOT EXISTS sessions_source ON sessions(source_id);
+CREATE TABLE IF NOT EXISTS severities (
+    translation TEXT NOT NULL,
+    severity INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    strokes INTEGER NOT NULL,
+    PRIMARY KEY (translation, severity)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS suggestions (
+    translation TEXT NOT NULL,
+    suggestion TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (translation, suggestion)
+) WITHOUT ROWID;
+"""
+
+# Called with (bytes done, bytes to ingest, lines done, None) after each batch,
+# the same signature as parallel.ProgressCallback
+HistoryProgress = Callable[[int, int, int, None], None]
+
+
+def default_history_path() -> Path:
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        return Path(os.environ['LOCALAPPDATA']) / 'clippy_stats' / 'history.sqlite3'
+    base = os.environ.get('XDG_DATA_HOME') or Path.home() / '.local' / 'share'
+    return Path(base) / 'clippy_stats' / 'history.sqlite3'
+
+
+class HistoryStore:
+    """
+    A connection to the history database. Like any sqlite3 connection it
+    must be used from the thread that opened it.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_suggestions: int = MAX_SUGGESTIONS):
+        self.path = Path(path) if path else default_history_path()
+        self.max_suggestions = max_suggestions
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.execute('PRAGMA foreign_keys = ON')
+        self.db.execute('PRAGMA journal_mode = WAL')
+        self.db.execute('PRAGMA synchronous = NORMAL')  # WAL stays consistent; a crash only loses the last batches
+        if self.db.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+            # Version 1 kept a last-seen severity and distinct suggestions;
+            # the events hold everything needed to count them instead.
+            # Version 2 events did not record strokes typed; they keep 0,
+            # which counts them as saving nothing
+            self.db.executescript('DROP TABLE IF EXISTS totals; DROP TABLE IF EXISTS suggestions; '
+                                  'DROP TABLE IF EXISTS severities;')
+            self._migrate_sources()
+            self.db.executescript(SCHEMA)
+            columns = {row[1] for row in self.db.execute('PRAGMA table_info(events)')}
+            if 'strokes' not in columns:
+                self.db.execute('ALTER TABLE events ADD COLUMN strokes INTEGER NOT NULL DEFAULT 0')
+            with self.db:
+                self._rebuild_totals()
+                self.db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        else:
+            self.db.executescript(SCHEMA)
+
+    def _migrate_sources(self):
+        """
+        Version 3 sources had a unique path and no retired column. SQLite
+        cannot drop a constraint, so the table is copied into a new one.
+        """
+        columns = {row[1] for row in self.db.execute('PRAGMA table_info(sources)')}
+        if not columns or 'retired' in columns:
+            return
+        self.db.execute('PRAGMA foreign_keys = OFF')  # events and sessions point at the table being replaced
+        try:
+            self.db.executescript(
+                'BEGIN; ' + SOURCES.format(name='sources_v4') +
+                'INSERT INTO sources_v4 (id, path, size, mtime_ns, prefix_length, prefix_hash, offset, session_id) '
+                'SELECT id, path, size, mtime_ns, prefix_length, prefix_hash, offset, session_id FROM sources; '
+                'DROP TABLE sources; ALTER TABLE sources_v4 RENAME TO sources; COMMIT;')
+        finally:
+            self.db.execute('PRAGMA foreign_keys = ON')
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self) -> 'HistoryStore':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def ingest(self, file_path: str, batch_size: int = BATCH_SIZE,
+               progress: Optional[HistoryProgress] = None) -> int:
+        """
+        Adds the complete lines of file_path that are not in the database
+        yet. Returns the number of events added. Each batch is committed
+        on its own, so an interrupted ingest resumes where it stopped.
+        """
+        path = os.path.abspath(file_path)
+        source_id, offset, session_id = self._open_source(path)
+        stat = os.stat(path)
+        total = stat.st_size - offset
+        added = lines = 0
+        events: List[Tuple[int, Optional[int], str, str, int, int]] = []
+
+        with open(path, 'rb') as file:
+            file.seek(offset)
+            position = offset
+            for raw in file:
+                if not raw.endswith(b'\n'):
+                    break  # still being written; picked up next time
+                line_start = position
+                position += len(raw)
+                lines += 1
+                text = raw.decode('utf-8')
+                entry = parse_line(text)
+                if entry is not None:
+                    events.append((source_id, session_id, entry[1], entry[2], entry[0], entry[3]))
+                elif 'START' in text or 'END' in text:
+                    # The same test parse_line uses to skip these lines
+                    line = strip_ansi(text.strip())
+                    if line.startswith('START'):
+                        session_id = self._start_session(source_id, line, line_start)
+                    elif line.startswith('END'):
+                        self._end_session(session_id, position)
+                        session_id = None
+                if len(events) >= batch_size:
+                    added += self._write(events, source_id, path, position, session_id, stat)
+                    if progress is not None:
+                        progress(position - offset, total, lines, None)
+            added += self._write(events, source_id, path, position, session_id, stat)
+        if progress is not None:
+            progress(position - offset, total, lines, None)
+        return added
+
+    @staticmethod
+    def _matches(path: str, prefix_length: int, known_hash: str, offset: int) -> bool:
+        """
+        Whether the file at path still holds what a source ingested from it.
+        """
+        try:
+            return os.path.getsize(path) >= offset and prefix_hash(path, prefix_length) == known_hash
+        except OSError:
+            return False
+
+    def _open_source(self, path: str) -> Tuple[int, int, Optional[int]]:
+        """
+        Returns (source id, offset to resume from, open session id) for the
+        log. When the log no longer matches its source, that source is
+        retired with its events. A source is then looked up by content: a
+        retired one, or one whose own file has moved on, that the log
+        starts like is resumed under the log's path.
+        """
+        row = self.db.execute(
+            'SELECT id, prefix_length, prefix_hash, offset, session_id FROM sources '
+            'WHERE path = ? AND NOT retired', (path,)).fetchone()
+        if row is not None:
+            source_id, prefix_length, known_hash, offset, session_id = row
+            if self._matches(path, prefix_length, known_hash, offset):
+                return source_id, offset, session_id
+            with self.db:
+                self.db.execute('UPDATE sources SET retired = 1 WHERE id = ?', (source_id,))
+
+        candidates = self.db.execute(
+            'SELECT id, path, retired, prefix_length, prefix_hash, offset, session_id FROM sources '
+            'WHERE offset > 0 ORDER BY id DESC').fetchall()
+        for source_id, source_path, retired, prefix_length, known_hash, offset, session_id in candidates:
+            if not retired and self._matches(source_path, prefix_length, known_hash, offset):
+                continue  # still in place; the log is a copy of it
+            if self._matches(path, prefix_length, known_hash, offset):
+                with self.db:
+                    self.db.execute('UPDATE sources SET retired = 1 WHERE path = ? AND NOT retired', (path,))
+                    self.db.execute('UPDATE sources SET path = ?, retired = 0 WHERE id = ?', (path, source_id))
+                return source_id, offset, session_id
+
+        with self.db:
+            cursor = self.db.execute(
+                'INSERT INTO sources (path, size, mtime_ns, prefix_length, prefix_hash, offset) '
+                'VALUES (?, 0, 0, 0, ?, 0)', (path, prefix_hash(path, 0)))
+        return cursor.lastrowid, 0, None
+
+    def _start_session(self, source_id: int, line: str, offset: int) -> int:
+        # Committed together with the next batch of events
+        cursor = self.db.execute(
+            'INSERT INTO sessions (source_id, label, start_offset) VALUES (?, ?, ?)',
+            (source_id, line[len('START'):].strip() or None, offset))
+        return cursor.lastrowid
+
+    def _end_session(self, session_id: Optional[int], offset: int):
+        if session_id is not None:
+            self.db.execute('UPDATE sessions SET end_offset = ? WHERE id = ?', (offset, session_id))
+
+    def _write(self, events, source_id: int, path: str, offset: int, session_id: Optional[int],
+               stat: os.stat_result) -> int:
+        """
+        Inserts a batch of events, folds it into severities and suggestions,
+        and records how far the source has been ingested, in one transaction.
+        """
+        # A batch cannot hold more distinct suggestions than events, so this
+        # one never drops any
+        batch = Aggregate(max_suggestions=max(1, len(events)))
+        batch.update((severity, translation, suggestion, strokes)
+                     for _, _, translation, suggestion, severity, strokes in events)
+        with self.db:
+            self.db.executemany(
+                'INSERT INTO events (source_id, session_id, translation, suggestion, severity, strokes) '
+                'VALUES (?, ?, ?, ?, ?, ?)', events)
+            self.db.executemany(
+                'INSERT INTO severities (translation, severity, count, strokes) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (translation, severity) DO UPDATE SET '
+                'count = count + excluded.count, strokes = strokes + excluded.strokes',
+                self._severity_strokes(events))
+            self.db.executemany(
+                'INSERT INTO suggestions (translation, suggestion, count) VALUES (?, ?, ?) '
+                'ON CONFLICT (translation, suggestion) DO UPDATE SET count = count + excluded.count',
+                ((translation, suggestion, count) for translation, data in batch.entry_map.items()
+                 for suggestion, count in data['suggestions'].items()))
+            prefix_length = min(PREFIX_BYTES, offset)
+            self.db.execute(
+                'UPDATE sources SET size = ?, mtime_ns = ?, prefix_length = ?, prefix_hash = ?, '
+                'offset = ?, session_id = ? WHERE id = ?',
+                (stat.st_size, stat.st_mtime_ns, prefix_length,
+                 prefix_hash(path, prefix_length), offset, session_id, source_id))
+        count = len(events)
+        events.clear()
+        return count
+
+    @staticmethod
+    def _severity_strokes(events) -> Iterable[Tuple[str, int, int, int]]:
+        """
+        (translation, severity, count, strokes) rows for a batch of events.
+        The Aggregate only sums strokes per translation, so these are
+        grouped here.
+        """
+        totals = {}
+        for _, _, translation, _, severity, strokes in events:
+            key = translation, severity
+            total = totals.get(key)
+            if total is None:
+                totals[key] = [1, strokes]
+            else:
+                total[0] += 1
+                total[1] += strokes
+        return ((translation, severity, count, strokes)
+                for (translation, severity), (count, strokes) in totals.items())
+
+    def forget(self, file_path: str):
+        """
+        Removes a log, the retired sources it was rotated from, and their
+        events, and rebuilds the totals without them.
+        """
+        path = os.path.abspath(file_path)
+        with self.db:
+            rows = self.db.execute('SELECT id FROM sources WHERE path = ?', (path,)).fetchall()
+            if not rows:
+                return
+            self.db.executemany('DELETE FROM events WHERE source_id = ?', rows)
+            self.db.executemany('DELETE FROM sessions WHERE source_id = ?', rows)
+            self.db.executemany('DELETE FROM sources WHERE id = ?', rows)
+            self._rebuild_totals()
+
+    def _rebuild_totals(self):
+        self.db.execute('DELETE FROM severities')
+        self.db.execute('DELETE FROM suggestions')
+        self.db.execute('INSERT INTO severities SELECT translation, severity, COUNT(*), SUM(strokes) FROM events '
+                        'GROUP BY translation, severity')
+        self.db.execute('INSERT INTO suggestions SELECT translation, suggestion, COUNT(*) FROM events '
+                        'GROUP BY translation, suggestion')
+
+    def _read_aggregate(self, severities: Iterable[Tuple[str, int, int, int]],
+                        suggestions: Iterable[Tuple[str, str, int]]) -> Aggregate:
+        """
+        An Aggregate from (translation, severity, count, strokes) rows and from
+        (translation, suggestion, count) rows, most frequent first.
+        """
+        aggregate = Aggregate(max_suggestions=self.max_suggestions)
+        entry_map = aggregate.entry_map
+        for translation, severity, count, strokes in severities:
+            entry = entry_map.get(translation)
+            if entry is None:
+                entry = entry_map[translation] = new_entry()
+            entry['count'] += count
+            entry['total'] += severity * count
+            entry['strokes'] += strokes
+            histogram = entry['severities']
+            if severity > len(histogram):
+                histogram.extend([0] * (severity - len(histogram)))
+            histogram[severity - 1] = count
+        for translation, suggestion, count in suggestions:
+            counts = entry_map[translation]['suggestions']
+            if len(counts) < self.max_suggestions:
+                counts[suggestion] = count
+        return aggregate
+
+    def aggregate(self) -> Aggregate:
+        """
+        The whole history as an Aggregate, read from the running totals.
+        """
+        return self._read_aggregate(
+            self.db.execute('SELECT translation, severity, count, strokes FROM severities'),
+            self.db.execute('SELECT translation, suggestion, count FROM suggestions ORDER BY count DESC, suggestion'))
+
+    def aggregate_sessions(self, session_ids: Iterable[int]) -> Aggregate:
+        """
+        The events of the given sessions as an Aggregate, grouped in SQL.
+        """
+        self.db.execute('CREATE TEMP TABLE IF NOT EXISTS chosen (id INTEGER PRIMARY KEY)')
+        self.db.execute('DELETE FROM chosen')
+        self.db.executemany('INSERT OR IGNORE INTO chosen VALUES (?)', ((i,) for i in session_ids))
+        return self._read_aggregate(
+            self.db.execute(
+                'SELECT translation, severity, COUNT(*), SUM(strokes) FROM events '
+                'WHERE session_id IN (SELECT id FROM chosen) GROUP BY translation, severity'),
+            self.db.execute(
+                'SELECT translation, suggestion, COUNT(*) AS count FROM events '
+                'WHERE session_id IN (SELECT id FROM chosen) GROUP BY translation, suggestion '
+                'ORDER BY count DESC, suggestion'))
+
+    def sessions(self) -> List[Tuple[int, str, Optional[str], int]]:
+        """
+        (session id, source path, START label, event count) for every
+        session, oldest source first.
+        """
+        return self.db.execute(
+            'SELECT sessions.id, sources.path, sessions.label, '
+            '(SELECT COUNT(*) FROM events WHERE events.session_id = sessions.id) '
+            'FROM sessions JOIN sources ON sources.id = sessions.source_id '
+            'ORDER BY sources.id, sessions.start_offset').fetchall()
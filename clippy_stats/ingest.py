@@ -0,0 +1,224 @@
+"""
+Background ingestion for the GUI.
+
+IngestWorker parses a log on a worker thread and reports back through a
+queue, which the Tk side drains from root.after callbacks. Nothing here
+touches Tk: the worker only ever puts messages on the queue.
+
+Messages are tuples whose first item is the kind:
+
+    ('progress', Progress)
+    ('partial', rows)          ranked rows of everything parsed so far,
+                               over copies of the entries the parse is
+                               still updating
+    ('done', follower, rows, search_index)
+                               follower is None unless a single log was
+                               parsed; search_index is a SearchIndex of rows
+    ('cancelled',)
+    ('error', exception)
+"""
+
+import queue
+import threading
+import time
+from typing import NamedTuple, Optional, Sequence
+
+from .batch import aggregate_batch, expand_inputs
+from .cache import AggregateCache, open_follower
+from .core import Aggregate, Cancelled, copy_entry, entry_row, rank
+from .history import HistoryStore
+from .profiling import Profiler
+from .search import SearchIndex
+from .sessions import SessionIndexCache, open_session_index
+from .strokes import StrokeIndex, StrokeIndexCache, load_stroke_index
+
+
+class Progress(NamedTuple):
+    done: int       # bytes parsed
+    total: int      # bytes to parse; a cached prefix is not counted
+    lines: int
+    elapsed: float  # seconds
+
+    @property
+    def fraction(self) -> float:
+        return self.done / self.total if self.total else 1.0
+
+    @property
+    def lines_per_second(self) -> float:
+        return self.lines / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """
+        Seconds left at the average rate so far, or None before any data.
+        """
+        if not self.done or not self.elapsed:
+            return None
+        return (self.total - self.done) * self.elapsed / self.done
+
+    def describe(self) -> str:
+        text = f"{self.done / 2**20:,.0f} / {self.total / 2**20:,.0f} MiB, {self.lines_per_second:,.0f} lines/s"
+        if self.eta is not None:
+            text += f", {self.eta:.0f}s left"
+        return text
+
+
+class IngestWorker(threading.Thread):
+    """
+    Brings a follower for file_path up to date, as cache.open_follower does,
+    on a daemon thread.
+
+    Ranked partial results are published at most every partial_interval
+    seconds, so a large table is not re-ranked after every chunk.
+
+    profiler times the worker's stages and counts what it read; the Tk
+    side may add its own stages once the worker is done.
+
+    When dictionaries lists Plover JSON dictionaries, their stroke index
+    is loaded into stroke_index before the final rank and the entries are
+    annotated with it. Dictionaries that cannot be read are left out and
+    listed in dictionary_errors.
+    """
+
+    dictionaries: Sequence[str] = ()
+    stroke_cache: Optional[StrokeIndexCache] = None
+    stroke_index: Optional[StrokeIndex] = None
+    dictionary_errors: Sequence[str] = ()
+
+    def __init__(self, file_path: str, cache: Optional[AggregateCache] = None, workers: int = 1,
+                 partial_interval: float = 1.0):
+        super().__init__(name='clippy-ingest', daemon=True)
+        self.file_path = file_path
+        self.cache = cache
+        self.workers = workers
+        self.partial_interval = partial_interval
+        self.messages: queue.Queue = queue.Queue()
+        self.cancelled = threading.Event()
+        self.started_at = 0.0
+        self.last_partial = 0.0
+        self.profiler = Profiler()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def run(self):
+        self.started_at = self.last_partial = time.perf_counter()
+        try:
+            with self.profiler.stage('parse'):
+                follower = open_follower(self.file_path, self.cache, self.workers, self._progress)
+            if self.profiler.bytes == follower.offset:
+                # The whole log was parsed, not resumed from the cache
+                self._count_matched(follower.aggregate)
+            self._done(follower, follower.aggregate)
+        except Cancelled:
+            self.messages.put(('cancelled',))
+        except Exception as e:
+            self.messages.put(('error', e))
+
+    def _progress(self, done: int, total: int, lines: int, aggregate: Optional[Aggregate]):
+        if self.cancelled.is_set():
+            raise Cancelled()
+        now = time.perf_counter()
+        self.profiler.bytes = done
+        self.profiler.counters['lines_read'] = lines
+        self.messages.put(('progress', Progress(done, total, lines, now - self.started_at)))
+        if aggregate is not None and now - self.last_partial >= self.partial_interval:
+            self.last_partial = now
+            with self.profiler.stage('rank'):
+                # The parse goes on updating the live entries while the Tk
+                # thread sorts and shows these rows
+                rows = [entry_row(row.translation, copy_entry(row.entry)) for row in rank(aggregate)]
+            self.messages.put(('partial', rows))
+
+    def _count_matched(self, aggregate: Aggregate):
+        self.profiler.counters['lines_matched'] = sum(data['count'] for data in aggregate.entry_map.values())
+
+    def _done(self, follower, aggregate: Aggregate):
+        if self.dictionaries:
+            with self.profiler.stage('strokes'):
+                errors = self.dictionary_errors = []
+                try:
+                    self.stroke_index = load_stroke_index(self.dictionaries, self.stroke_cache, errors)
+                except (OSError, ValueError):
+                    pass  # 'Strokes saved' falls back to Clippy's suggestions
+                else:
+                    self.stroke_index.annotate(aggregate.entry_map.items())
+        # The search index is built here rather than on the Tk thread
+        with self.profiler.stage('rank'):
+            rows = rank(aggregate)
+        with self.profiler.stage('search_index'):
+            search_index = SearchIndex(rows)
+        self.messages.put(('done', follower, rows, search_index))
+
+
+class HistoryWorker(IngestWorker):
+    """
+    Adds file_path (when given) to the history database, then publishes
+    the ranked history. Cancelling keeps the batches already committed.
+    """
+
+    def __init__(self, file_path: Optional[str], history_path: Optional[str] = None):
+        super().__init__(file_path)
+        self.history_path = history_path
+
+    def run(self):
+        self.started_at = time.perf_counter()
+        try:
+            with HistoryStore(self.history_path) as store:
+                with self.profiler.stage('parse'):
+                    if self.file_path is not None:
+                        store.ingest(self.file_path, progress=self._progress)
+                    aggregate = store.aggregate()
+                self._done(None, aggregate)
+        except Cancelled:
+            self.messages.put(('cancelled',))
+        except Exception as e:
+            self.messages.put(('error', e))
+
+
+class SessionWorker(IngestWorker):
+    """
+    Brings the session index of file_path up to date and publishes the
+    ranked aggregate of the sessions selected by a slice.
+    """
+
+    def __init__(self, file_path: str, sessions: slice, cache: Optional[SessionIndexCache] = None):
+        super().__init__(file_path)
+        self.sessions = sessions
+        self.session_cache = cache
+
+    def run(self):
+        try:
+            with self.profiler.stage('parse'):
+                index = open_session_index(self.file_path, self.session_cache)
+                if self.cancelled.is_set():
+                    raise Cancelled()
+                aggregate = index.aggregate(self.sessions)
+            self._done(None, aggregate)
+        except Cancelled:
+            self.messages.put(('cancelled',))
+        except Exception as e:
+            self.messages.put(('error', e))
+
+
+class BatchWorker(IngestWorker):
+    """
+    Ranks several, possibly compressed, logs together with
+    batch.aggregate_batch. Progress is reported as each file finishes.
+    """
+
+    def __init__(self, file_paths, workers: int = 1):
+        super().__init__(None, workers=workers)
+        self.file_paths = list(file_paths)
+
+    def run(self):
+        self.started_at = time.perf_counter()
+        try:
+            with self.profiler.stage('parse'):
+                aggregate, _ = aggregate_batch(expand_inputs(self.file_paths), self.workers, self._progress)
+            self._count_matched(aggregate)
+            self._done(None, aggregate)
+        except Cancelled:
+            self.messages.put(('cancelled',))
+        except Exception as e:
+            self.messages.put(('error', e))
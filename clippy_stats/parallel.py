@@ -0,0 +1,153 @@
+"""
+Multi-core parsing of large logs.
+
+The file is cut into byte ranges that start and end on line boundaries.
+Each range is aggregated in a worker process, and the per-range
+aggregates are merged with Aggregate.merge. The merged counts, scores
+and severities are identical to a serial parse of the same bytes; only a
+translation with more than max_suggestions distinct suggestions may end
+up with different counts for its rarest ones.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from .core import Aggregate, merge_all
+from .fastpath import aggregate_mmap, count_lines
+
+# Called with (bytes done, bytes in the span, lines done, aggregate) after
+# each range is merged
+ProgressCallback = Callable[[int, int, int, Aggregate], None]
+
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024  # below this a pool costs more than it saves
+MIN_CHUNK_BYTES = 4 * 1024 * 1024
+CHUNKS_PER_WORKER = 4
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def line_boundary(file, position: int) -> int:
+    """
+    The offset of the first line that starts at or after position.
+    """
+    if position <= 0:
+        return 0
+    file.seek(position - 1)
+    file.readline()
+    return file.tell()
+
+
+def last_line_end(file_path: str) -> int:
+    """
+    The offset just past the last newline, i.e. the end of the last
+    complete line.
+    """
+    with open(file_path, 'rb') as file:
+        position = file.seek(0, os.SEEK_END)
+        while position > 0:
+            step = min(64 * 1024, position)
+            file.seek(position - step)
+            block = file.read(step)
+            newline = block.rfind(b'\n')
+            if newline >= 0:
+                return position - step + newline + 1
+            position -= step
+    return 0
+
+
+def chunk_ranges(file_path: str, start: int, end: int, chunks: int,
+                 min_chunk_bytes: int = MIN_CHUNK_BYTES) -> List[Tuple[int, int]]:
+    """
+    Splits [start, end) into up to `chunks` newline-aligned ranges of at
+    least min_chunk_bytes each. start must itself be a line boundary.
+    """
+    chunks = max(1, min(chunks, (end - start) // min_chunk_bytes))
+    ranges = []
+    with open(file_path, 'rb') as file:
+        previous = start
+        for i in range(1, chunks):
+            boundary = min(end, line_boundary(file, start + (end - start) * i // chunks))
+            if boundary > previous:
+                ranges.append((previous, boundary))
+                previous = boundary
+    if end > previous:
+        ranges.append((previous, end))
+    return ranges
+
+
+def aggregate_range(file_path: str, start: int, end: int) -> Aggregate:
+    """
+    Aggregates the lines in [start, end). Runs inside worker processes.
+    """
+    return aggregate_mmap(file_path, start, end)
+
+
+def aggregate_parallel(file_path: str, start: int = 0, end: Optional[int] = None,
+                       workers: Optional[int] = None, min_chunk_bytes: int = MIN_CHUNK_BYTES) -> Aggregate:
+    """
+    Aggregates [start, end) of the log across a pool of worker processes.
+    end defaults to the end of the file. A small min_chunk_bytes splits
+    even tiny logs, e.g. to check the merge on a test corpus.
+    """
+    workers = workers or default_workers()
+    if end is None:
+        end = os.path.getsize(file_path)
+    ranges = chunk_ranges(file_path, start, end, workers * CHUNKS_PER_WORKER, min_chunk_bytes)
+    if workers == 1 or len(ranges) <= 1:
+        return merge_all(aggregate_range(file_path, *r) for r in ranges)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(aggregate_range, file_path, *r) for r in ranges]
+        return merge_all(future.result() for future in futures)
+
+
+def aggregate_span(file_path: str, start: int, end: int, workers: int = 1,
+                   progress: Optional[ProgressCallback] = None,
+                   aggregate: Optional[Aggregate] = None) -> Aggregate:
+    """
+    Aggregates the complete lines in [start, end) into aggregate (a new one
+    by default), in a process pool when there are several workers and at
+    least PARALLEL_MIN_BYTES to parse. The ranges are merged into that very
+    object, so a core.Aggregate subclass or a custom max_suggestions is
+    kept; it must have merge(), which heavy.HeavyHitters lacks.
+
+    With a progress callback the span is cut into ranges of about
+    MIN_CHUNK_BYTES, merged in log order, and the callback sees the
+    aggregate after every range. An exception raised by the callback
+    abandons the parse, e.g. to cancel it.
+    """
+    parallel = workers > 1 and end - start >= PARALLEL_MIN_BYTES
+    chunks = workers * CHUNKS_PER_WORKER if parallel else 1
+    if progress is not None:
+        chunks = max(chunks, (end - start) // MIN_CHUNK_BYTES)
+    ranges = chunk_ranges(file_path, start, end, chunks)
+    if aggregate is None:
+        aggregate = Aggregate(start)
+
+    if not parallel:
+        return _merge_ranges(file_path, ranges, (aggregate_range(file_path, *r) for r in ranges),
+                             progress, aggregate)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(aggregate_range, file_path, *r) for r in ranges]
+        try:
+            return _merge_ranges(file_path, ranges, (future.result() for future in futures),
+                                 progress, aggregate)
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def _merge_ranges(file_path: str, ranges: List[Tuple[int, int]], parts: Iterable[Aggregate],
+                  progress: Optional[ProgressCallback], aggregate: Aggregate) -> Aggregate:
+    lines = 0
+    span_start, span_end = (ranges[0][0], ranges[-1][1]) if ranges else (0, 0)
+    for (start, end), part in zip(ranges, parts):
+        aggregate.merge(part)
+        if progress is not None:
+            lines += count_lines(file_path, start, end)
+            progress(end - span_start, span_end - span_start, lines, aggregate)
+    return aggregate
@@ -0,0 +1,235 @@
+"""
+Stage timers and line counters for finding out where a load spends its time.
+
+A Profiler accumulates the wall time of named stages and a few counters;
+the GUI shows Profiler.describe() in its status bar after a load and the
+CLI writes Profiler.report() as JSON with --profile. Timers wrap whole
+stages, not single lines, so they cost next to nothing on the normal path.
+
+The normal path parses with fused, compiled scans (fastpath) that never
+see a line as a whole, so it can only count lines read and matched.
+profile_file() is the instrumented alternative used by --profile: the
+same parse as core.iter_entries, run block by block as separate stages
+(read, decode, strip_ansi, match, aggregate) with every rejected line
+counted by reason.
+"""
+
+import ctypes
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+
+from .core import Aggregate, match_entry, strip_ansi
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+READ_BYTES = 1024 * 1024
+
+# Why core.parse_line returns None for a line, in the order it checks
+REJECT_REASONS = ('blank', 'session_marker', 'not_an_entry', 'malformed_entry')
+
+
+def peak_memory() -> Optional[int]:
+    """
+    Peak resident memory of this process in bytes, or None where unknown.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024  # KiB on Linux
+    if os.name == 'nt':
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                        ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                        ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                        ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+    return None
+
+
+def process_uptime() -> Optional[float]:
+    """
+    Seconds since this process started, interpreter start-up included, or
+    None where unknown.
+    """
+    if os.name == 'nt':
+        from ctypes import wintypes
+
+        times = [wintypes.FILETIME() for _ in range(4)]  # creation, exit, kernel, user
+        now = wintypes.FILETIME()
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.kernel32.GetProcessTimes(process, *map(ctypes.byref, times)):
+            return None
+        ctypes.windll.kernel32.GetSystemTimeAsFileTime(ctypes.byref(now))
+
+        def ticks(filetime):  # 100 ns units
+            return filetime.dwHighDateTime << 32 | filetime.dwLowDateTime
+
+        return (ticks(now) - ticks(times[0])) / 1e7
+    try:
+        with open('/proc/self/stat', 'rb') as file:
+            # Fields after the parenthesised command name; starttime is field 22
+            started = int(file.read().rpartition(b')')[2].split()[19]) / os.sysconf('SC_CLK_TCK')
+        with open('/proc/uptime', 'rb') as file:
+            return float(file.read().split()[0]) - started
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class Profiler:
+    """
+    Wall time per stage and named counters.
+
+    Stage times are exclusive: while a stage runs inside another, e.g.
+    ranking a partial result in the middle of parsing, the outer stage's
+    clock is paused, so the stage times add up to the time measured.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.calls: Counter = Counter()
+        self.counters: Counter = Counter()
+        self.bytes = 0
+        self._stack: List[List[Any]] = []  # [name, resumed at]
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        now = time.perf_counter()
+        if self._stack:
+            outer = self._stack[-1]
+            self.stages[outer[0]] = self.stages.get(outer[0], 0.0) + now - outer[1]
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, resumed = self._stack.pop()
+            self.stages[name] = self.stages.get(name, 0.0) + now - resumed
+            self.calls[name] += 1
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] += amount
+
+    @property
+    def seconds(self) -> float:
+        return sum(self.stages.values())
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Everything measured, as JSON-ready data.
+        """
+        seconds = self.seconds
+        lines = self.counters.get('lines_read', 0)
+        return {
+            'seconds': seconds,
+            'bytes': self.bytes,
+            'bytes_per_second': self.bytes / seconds if seconds else None,
+            'lines_per_second': lines / seconds if seconds else None,
+            'peak_memory_bytes': peak_memory(),
+            'stages': {name: {'seconds': spent, 'calls': self.calls[name],
+                              'share': spent / seconds if seconds else None}
+                       for name, spent in self.stages.items()},
+            'counters': dict(self.counters),
+        }
+
+    def describe(self) -> str:
+        """
+        A one-line summary for a status bar.
+        """
+        parts = []
+        lines = self.counters.get('lines_read')
+        if lines and 'lines_matched' in self.counters:
+            matched = self.counters['lines_matched']
+            parts.append(f"{lines:,} lines, {matched:,} matched, {lines - matched:,} rejected")
+        elif lines:
+            # A load resumed from the cache only counts the lines it read
+            parts.append(f"{lines:,} lines")
+        seconds = self.seconds
+        if self.bytes and seconds:
+            parts.append(f"{self.bytes / 2**20 / seconds:,.1f} MiB/s")
+        parts.append(', '.join(f"{name} {spent:.2f}s" for name, spent in self.stages.items()))
+        peak = peak_memory()
+        if peak is not None:
+            parts.append(f"peak {peak / 2**20:,.0f} MiB")
+        return ' · '.join(part for part in parts if part)
+
+
+def classify(line: str) -> str:
+    """
+    The REJECT_REASONS item for a stripped, ANSI-free line that
+    core.parse_line would skip before trying to match an entry.
+    """
+    if not line:
+        return 'blank'
+    if line.startswith('START') or line.startswith('END'):
+        return 'session_marker'
+    return 'not_an_entry'
+
+
+def profile_file(file_path: str, profiler: Profiler, file: Optional[BinaryIO] = None) -> Aggregate:
+    """
+    Aggregates the log like core.aggregate_file, timing each stage of the
+    parse separately and counting lines read, matched and rejected by
+    reason. file, if given, is read instead of opening file_path, e.g. a
+    decompressing stream.
+    """
+    aggregate = Aggregate()
+    counters = profiler.counters
+    carry = b''
+    opened = file is None
+    if opened:
+        file = open(file_path, 'rb')
+    try:
+        while True:
+            with profiler.stage('read'):
+                block = file.read(READ_BYTES)
+            if not block and not carry:
+                break
+            with profiler.stage('decode'):
+                profiler.bytes += len(block)
+                if block:
+                    block = carry + block
+                    cut = block.rfind(b'\n') + 1
+                    carry, block = block[cut:], block[:cut]
+                else:
+                    block, carry = carry, b''  # an unterminated last line
+                lines = block.decode('utf-8').split('\n')
+                if lines and lines[-1] == '':
+                    lines.pop()
+            with profiler.stage('strip_ansi'):
+                lines = [strip_ansi(line.strip()) for line in lines]
+            with profiler.stage('match'):
+                entries = []
+                for line in lines:
+                    groups = match_entry(line) if line.startswith('*') else None
+                    if groups is not None:
+                        stars, translation, suggestion, typed = groups
+                        entries.append((len(stars), translation, suggestion, typed.count('/') + 1))
+                    elif line.startswith('*'):
+                        counters['rejected_malformed_entry'] += 1
+                    else:
+                        counters['rejected_' + classify(line)] += 1
+            with profiler.stage('aggregate'):
+                aggregate.update(entries)
+            counters['lines_read'] += len(lines)
+            counters['lines_matched'] += len(entries)
+    finally:
+        if opened:
+            file.close()
+    return aggregate
@@ -0,0 +1,157 @@
+"""
+Substring search over ranked rows, fast enough to run on every keystroke.
+
+SearchIndex keeps the lower-cased translation and suggestions of each row
+and a trigram index over them: for every three-character sequence, the
+rows containing it. A query of three characters or more only has to
+check the rows listed under its rarest trigram. Shorter queries are
+checked against every row, but they are only typed once per search.
+
+Typing refines: when the new query contains the previous one, only the
+previous matches are checked. Recent results are kept, so deleting
+characters again costs nothing.
+"""
+
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from .core import Row
+
+GRAM = 3
+RECENT_QUERIES = 32
+
+
+def trigrams(text: str) -> Set[str]:
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def search_text(row: Row) -> str:
+    # '\n' keeps trigrams from spanning the two fields; a query cannot contain it
+    return f"{row.translation}\n{row.suggestions}".lower()
+
+
+class SearchIndex:
+    """
+    Case-insensitive substring search over rows, answered as the positions
+    of the matching rows in ascending order.
+    """
+
+    def __init__(self, rows: Sequence[Row]):
+        self.rows = rows
+        self.texts: List[str] = []
+        self.positions: Dict[str, int] = {}
+        self.grams: Dict[str, array] = {}
+        self.unsorted: Set[str] = set()
+        self.recent: Dict[str, Sequence[int]] = {}
+        self._add_rows()
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def _index(self, position: int, text: str, known: str = ''):
+        """
+        Lists position under the trigrams of text, and no longer under
+        those only known, the row's previous text, had.
+        """
+        grams = self.grams
+        new = trigrams(text)
+        if known:
+            old = trigrams(known)
+            for gram in old - new:
+                postings = grams[gram]
+                postings.remove(position)
+                if not postings:
+                    del grams[gram]
+                    self.unsorted.discard(gram)
+            new -= old
+        for gram in new:
+            postings = grams.get(gram)
+            if postings is None:
+                postings = grams[gram] = array('I')
+            elif postings[-1] > position:
+                self.unsorted.add(gram)
+            postings.append(position)
+
+    def _add_rows(self):
+        for position in range(len(self.texts), len(self.rows)):
+            row = self.rows[position]
+            text = search_text(row)
+            self.texts.append(text)
+            self.positions[row.translation] = position
+            self._index(position, text)
+
+    def update(self, translations: Iterable[str]):
+        """
+        Catches up with rows appended to self.rows and with rows whose
+        suggestions changed, e.g. while following a log.
+        """
+        self._add_rows()
+        for translation in translations:
+            position = self.positions[translation]
+            text = search_text(self.rows[position])
+            old = self.texts[position]
+            if text != old:
+                # Suggestions can be evicted or reordered, not just added
+                self.texts[position] = text
+                self._index(position, text, known=old)
+        self.recent.clear()
+
+    def search(self, query: str) -> Optional[Sequence[int]]:
+        """
+        The positions of the rows containing query, in ascending order, or
+        None for an empty query (no filter).
+        """
+        query = query.strip().lower()
+        if not query:
+            return None
+        matches = self.recent.get(query)
+        if matches is not None:
+            return matches
+
+        texts = self.texts
+        candidates = self._refinable(query)
+        if candidates is None and len(query) >= GRAM:
+            candidates = self._candidates(query)
+            if candidates is None:
+                matches = []
+        if matches is None:
+            if candidates is None:
+                matches = [i for i, text in enumerate(texts) if query in text]
+            else:
+                matches = [i for i in candidates if query in texts[i]]
+
+        if len(self.recent) >= RECENT_QUERIES:
+            del self.recent[next(iter(self.recent))]
+        self.recent[query] = matches
+        return matches
+
+    def _refinable(self, query: str) -> Optional[Sequence[int]]:
+        """
+        The matches of the longest recent query that query contains, since
+        only those rows can match it.
+        """
+        best = None
+        for previous, matches in self.recent.items():
+            if previous in query and (best is None or len(matches) < len(best)):
+                best = matches
+        return best
+
+    def _candidates(self, query: str) -> Optional[Sequence[int]]:
+        """
+        The rows under the rarest trigram of query, or None when one of its
+        trigrams occurs nowhere.
+        """
+        grams = self.grams
+        rarest = None
+        for i in range(len(query) - GRAM + 1):
+            gram = query[i:i + GRAM]
+            postings = grams.get(gram)
+            if postings is None:
+                return None
+            if rarest is None or len(postings) < len(grams[rarest]):
+                rarest = gram
+        if rarest in self.unsorted:
+            # Rows re-indexed by update() were appended out of order
+            grams[rarest] = array('I', sorted(grams[rarest]))
+            self.unsorted.discard(rarest)
+        return grams[rarest]
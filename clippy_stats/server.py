@@ -0,0 +1,416 @@
+"""
+A localhost daemon that keeps a log's ranking in memory and serves it as JSON.
+
+    clippy-stats LOG --serve [PORT]
+
+One asyncio task follows the log while every request is answered from the
+rows already ranked in memory: a page is a slice of a cached sort
+permutation and a few kilobytes of JSON, however large the log. Clients
+are coroutines rather than threads, so many open viewers, most of them
+idle in /api/wait, cost next to nothing.
+
+Endpoints (GET or HEAD):
+
+    /                index.html, which then fetches only the page it shows
+    /api/status      the log, translation count, version and load state
+    /api/rows        ?offset=0&limit=100&sort=Score&reverse=1&q=text
+    /api/export.csv  every row matching sort, reverse and q, as CSV
+    /api/export.jsonl  the same rows as JSON Lines
+    /api/wait        ?version=N&timeout=30, answered once the ranking has
+                     moved past version N or when the timeout runs out
+
+Only the loopback interface is bound, nothing is fetched from the network,
+and requests naming any host other than a loopback one are refused, so a
+web page elsewhere cannot read the log through the browser.
+"""
+
+import asyncio
+import json
+import sys
+from collections import OrderedDict
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Sequence, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from .cache import AggregateCache, open_follower
+from .core import COLUMNS, Row, copy_entry, entry_row, rank
+from .export import CHUNK_WRITERS, EXPORT_BATCH
+from .follow import make_watcher
+from .search import SearchIndex
+from .strokes import StrokeIndex
+from .view import RowIndex
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+MAX_WAIT = 60.0  # seconds an /api/wait may hang
+MAX_REQUEST_BYTES = 16 * 1024
+CACHED_VIEWS = 16
+EXPORT_TYPES = {
+    '/api/export.csv': 'text/csv; charset=utf-8',
+    '/api/export.jsonl': 'application/x-ndjson; charset=utf-8',
+}
+LOOPBACK_HOSTS = {'localhost', '127.0.0.1', '::1'}
+INDEX_PATH = Path(__file__).resolve().parent.parent / 'index.html'
+
+Body = Union[bytes, AsyncIterator[bytes]]
+
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus, message: str = ''):
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+def row_json(row: Row) -> Dict[str, Any]:
+    return {'translation': row.translation, 'suggestions': row.suggestions,
+            'severity': row.severity, 'mean_severity': round(row.mean_severity, 2),
+            'count': row.count, 'score': row.score, 'strokes_saved': row.strokes_saved}
+
+
+def json_body(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def is_loopback(host: str) -> bool:
+    if host.startswith('['):
+        host = host[1:host.find(']')]
+    else:
+        host = host.rpartition(':')[0] or host
+    return host.lower() in LOOPBACK_HOSTS
+
+
+class LogServer:
+    """
+    The ranking of one followed log and the HTTP API over it.
+
+    rows, row_index and search_index are only ever replaced or appended to
+    on the event loop. The follower parses on a worker thread into its own
+    entries; the rows hold copies of them, which are swapped in on the
+    event loop after each poll, so a request never sees an entry change
+    while it sorts or reads it.
+    """
+
+    def __init__(self, file_path: str, cache: Optional[AggregateCache] = None, workers: int = 1,
+                 interval: float = 1.0, index_path: Path = INDEX_PATH,
+                 stroke_index: Optional[StrokeIndex] = None):
+        self.file_path = file_path
+        self.cache = cache
+        self.workers = workers
+        self.interval = interval
+        self.index_path = index_path
+        self.stroke_index = stroke_index
+        self.follower = None
+        self.rows = []
+        self.entry_rows: Dict[str, Row] = {}
+        self.row_index = RowIndex(self.rows)
+        self.search_index = SearchIndex(self.rows)
+        self.views: 'OrderedDict[Tuple[Optional[str], bool, str], Sequence[Row]]' = OrderedDict()
+        self.version = 0
+        self.loading = True
+        self.error = None
+        self.progress = 0.0
+        self.changed = None  # asyncio.Event set, and replaced, on every new version
+
+    # Ranking
+
+    def publish(self):
+        """
+        Starts a new version and wakes every client waiting for one.
+        """
+        self.version += 1
+        self.views.clear()
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def _on_progress(self, done: int, total: int, lines: int, aggregate):
+        # Called from the parsing thread; a float store is safe to share
+        self.progress = done / total if total else 1.0
+
+    async def load(self):
+        follower = await asyncio.to_thread(open_follower, self.file_path, self.cache, self.workers,
+                                           self._on_progress)
+        await self.rebuild(follower)
+        self.loading = False
+        self.publish()
+
+    async def rebuild(self, follower):
+        # Rows hold copies of the entries: follower.poll() updates the live
+        # ones on a thread while requests sort and read these
+        def build():
+            rows = [entry_row(row.translation, copy_entry(row.entry)) for row in rank(follower.aggregate)]
+            if self.stroke_index is not None:
+                self.stroke_index.annotate((row.translation, row.entry) for row in rows)
+            return rows, SearchIndex(rows)
+
+        self.follower = follower
+        self.rows, self.search_index = await asyncio.to_thread(build)
+        self.entry_rows = {row.translation: row for row in self.rows}
+        self.row_index = RowIndex(self.rows)
+
+    def update_rows(self, translations: Iterable[str]):
+        """
+        Like AnalyzerApp.update_rows, except that rows hold copies (see
+        rebuild): changed rows get fresh copies of their entries and new
+        translations are appended.
+        """
+        entry_map = self.follower.aggregate.entry_map
+        entries = [(translation, copy_entry(entry_map[translation])) for translation in translations]
+        if self.stroke_index is not None:
+            self.stroke_index.annotate(entries)
+        for translation, entry in entries:
+            row = self.entry_rows.get(translation)
+            if row is None:
+                row = self.entry_rows[translation] = entry_row(translation, entry)
+                self.rows.append(row)
+            else:
+                row.entry = entry
+        self.row_index.invalidate()
+        self.search_index.update(translations)
+
+    async def follow(self):
+        """
+        Re-ranks whenever the log changes. inotify wakes the loop as soon as
+        Plover writes; elsewhere the file is checked every interval.
+        """
+        loop = asyncio.get_running_loop()
+        watcher = make_watcher(self.file_path, self.interval)
+        wake = asyncio.Event()
+        fileno = getattr(watcher, 'fileno', None)
+        if fileno is not None:
+            loop.add_reader(fileno(), wake.set)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(wake.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                wake.clear()
+                if not watcher.changed():
+                    continue
+                changed, was_reset = await asyncio.to_thread(self.follower.poll)
+                if was_reset:
+                    await self.rebuild(self.follower)
+                elif changed:
+                    self.update_rows(changed)
+                if changed or was_reset:
+                    self.publish()
+        finally:
+            if fileno is not None:
+                loop.remove_reader(fileno())
+            watcher.close()
+
+    async def run_follower(self):
+        try:
+            await self.load()
+            await self.follow()
+        except Exception as e:
+            self.error = str(e)
+            self.loading = False
+            self.publish()
+            print(f"clippy-stats: failed to follow {self.file_path}: {e}", file=sys.stderr)
+
+    def view(self, sort: Optional[str], reverse: bool, query: str) -> Sequence[Row]:
+        """
+        The rows a client asked for, shared between clients paging through
+        the same sort and search until the next version.
+        """
+        key = (sort, reverse, query.strip().lower())
+        view = self.views.get(key)
+        if view is None:
+            view = self.row_index.view(sort, reverse, self.search_index.search(query))
+            if len(self.views) >= CACHED_VIEWS:
+                self.views.popitem(last=False)
+            self.views[key] = view
+        else:
+            self.views.move_to_end(key)
+        return view
+
+    # HTTP
+
+    def status(self) -> Dict[str, Any]:
+        return {'log': str(Path(self.file_path).resolve()), 'version': self.version,
+                'loading': self.loading, 'progress': self.progress, 'error': self.error,
+                'translations': len(self.rows), 'columns': COLUMNS}
+
+    async def respond(self, path: str, query: Dict[str, str]) -> Tuple[HTTPStatus, str, Body, Dict[str, str]]:
+        if path in ('/', '/index.html'):
+            try:
+                return HTTPStatus.OK, 'text/html; charset=utf-8', self.index_path.read_bytes(), {}
+            except OSError:
+                raise HttpError(HTTPStatus.NOT_FOUND, f"{self.index_path.name} not found")
+        if path == '/api/status':
+            return HTTPStatus.OK, 'application/json', json_body(self.status()), {}
+        if path == '/api/wait':
+            version = int_param(query, 'version', self.version, 0)
+            timeout = min(float_param(query, 'timeout', 30.0), MAX_WAIT)
+            if version >= self.version:
+                try:
+                    await asyncio.wait_for(self.changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            return HTTPStatus.OK, 'application/json', json_body(self.status()), {}
+
+        sort, reverse = sort_params(query)
+        text = query.get('q', '')
+        if path == '/api/rows':
+            offset = int_param(query, 'offset', 0, 0)
+            limit = min(int_param(query, 'limit', DEFAULT_LIMIT, 0), MAX_LIMIT)
+            view = self.view(sort, reverse, text)
+            page = view[offset:offset + limit]
+            return HTTPStatus.OK, 'application/json', json_body({
+                'version': self.version, 'loading': self.loading, 'total': len(self.rows),
+                'matched': len(view), 'offset': offset, 'limit': limit,
+                'rows': [row_json(row) for row in page],
+            }), {}
+        if path in EXPORT_TYPES:
+            fmt = path.rpartition('.')[2]
+            view = self.view(sort, reverse, text)
+            headers = {'Content-Disposition': f'attachment; filename="sorted_translations.{fmt}"'}
+            return HTTPStatus.OK, EXPORT_TYPES[path], stream_rows(view, fmt), headers
+        raise HttpError(HTTPStatus.NOT_FOUND)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serves one connection, with keep-alive, until the client hangs up.
+        """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.send_error(writer, HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE))
+                    break
+                if not await self.serve_request(head, writer):
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve_request(self, head: bytes, writer: asyncio.StreamWriter) -> bool:
+        """
+        Answers one request; returns whether the connection stays open.
+        """
+        request_line, *header_lines = head.decode('latin-1').rstrip('\r\n').split('\r\n')
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            method, target, version = request_line.split(' ')
+        except ValueError:
+            await self.send_error(writer, HttpError(HTTPStatus.BAD_REQUEST))
+            return False
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+        try:
+            if method not in ('GET', 'HEAD'):
+                # Bodies are never read, so the connection cannot be reused
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED)
+            if not is_loopback(headers.get('host', '')):
+                raise HttpError(HTTPStatus.FORBIDDEN, "only localhost may connect")
+            url = urlsplit(target)
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            status, content_type, body, extra = await self.respond(url.path, query)
+        except HttpError as e:
+            await self.send_error(writer, e, keep_alive and e.status != HTTPStatus.METHOD_NOT_ALLOWED)
+            return keep_alive and e.status != HTTPStatus.METHOD_NOT_ALLOWED
+
+        streamed = not isinstance(body, bytes)
+        keep_alive = keep_alive and not streamed
+        head_lines = [f"HTTP/1.1 {status.value} {status.phrase}",
+                      f"Content-Type: {content_type}",
+                      "Cache-Control: no-store",
+                      "X-Content-Type-Options: nosniff",
+                      f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if not streamed:
+            head_lines.append(f"Content-Length: {len(body)}")
+        head_lines += [f"{name}: {value}" for name, value in extra.items()]
+        writer.write(('\r\n'.join(head_lines) + '\r\n\r\n').encode('latin-1'))
+        if method == 'GET':
+            if streamed:
+                async for chunk in body:
+                    writer.write(chunk)
+                    await writer.drain()
+            else:
+                writer.write(body)
+        await writer.drain()
+        return keep_alive
+
+    async def send_error(self, writer: asyncio.StreamWriter, error: HttpError, keep_alive: bool = False):
+        body = json_body({'error': str(error)})
+        writer.write((f"HTTP/1.1 {error.status.value} {error.status.phrase}\r\n"
+                      f"Content-Type: application/json\r\n"
+                      f"Content-Length: {len(body)}\r\n"
+                      f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        self.changed = asyncio.Event()
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_REQUEST_BYTES)
+        follower_task = asyncio.create_task(self.run_follower())
+        address = server.sockets[0].getsockname()
+        print(f"clippy-stats: serving {self.file_path} on http://{address[0]}:{address[1]}/",
+              file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            follower_task.cancel()
+
+
+async def stream_rows(rows: Sequence[Row], fmt: str = 'csv') -> AsyncIterator[bytes]:
+    """
+    rows as CSV or JSON Lines, a batch at a time, yielding to other
+    clients between batches.
+    """
+    for text, _ in CHUNK_WRITERS[fmt](rows, batch_size=EXPORT_BATCH):
+        yield text.encode('utf-8')
+        await asyncio.sleep(0)
+
+
+def int_param(query: Dict[str, str], name: str, default: int, minimum: int) -> int:
+    try:
+        value = int(query[name]) if name in query else default
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer")
+    if value < minimum:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{name} must be at least {minimum}")
+    return value
+
+
+def float_param(query: Dict[str, str], name: str, default: float) -> float:
+    try:
+        value = float(query[name]) if name in query else default
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"{name} must be a number")
+    return max(value, 0.0)
+
+
+def sort_params(query: Dict[str, str]) -> Tuple[Optional[str], bool]:
+    """
+    The column to sort by (None for rank order) and whether to reverse it.
+    Column names are matched case-insensitively.
+    """
+    sort = query.get('sort', '')
+    column = None
+    if sort:
+        column = next((name for name in COLUMNS if name.lower() == sort.lower()), None)
+        if column is None:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"sort must be one of {', '.join(COLUMNS)}")
+    reverse = query.get('reverse', '').lower() in ('1', 'true', 'yes')
+    return column, reverse
+
+
+def serve(file_path: str, port: int = DEFAULT_PORT, cache: Optional[AggregateCache] = None,
+          workers: int = 1, interval: float = 1.0, host: str = DEFAULT_HOST,
+          stroke_index: Optional[StrokeIndex] = None):
+    """
+    Runs the daemon until interrupted.
+    """
+    asyncio.run(LogServer(file_path, cache, workers, interval, stroke_index=stroke_index).serve(host, port))
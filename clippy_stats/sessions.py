@@ -0,0 +1,217 @@
+"""
+Per-session segment index of a clippy.org log.
+
+Plover writes a START line when a session begins and an END line when it
+ends. SessionIndex cuts the log at those lines into segments and keeps the
+byte range, the START label and a small aggregate for each one. Questions
+like "my worst misses in the last 10 sessions" then merge ten precomputed
+aggregates instead of re-reading the log.
+
+The index is saved as a sidecar file beside the aggregate cache entry of
+the log and is validated the same way. When the log has grown, only the
+last segment (which may still be open) and the new bytes are parsed again.
+"""
+
+import mmap
+import re
+from typing import Any, List, Optional, Tuple
+
+from .cache import AggregateCache
+from .core import Aggregate
+from .fastpath import UNICODE_SPACE, iter_entries_buffer
+from .parallel import last_line_end
+
+INDEX_VERSION = 3
+
+# Lines that core.parse_line skips as session markers: after strip() and
+# removing leading ANSI codes they start with START or END. Leading
+# whitespace may include the Unicode spaces str.strip() removes.
+SESSION_MARKER = re.compile(
+    rb'(?m)^(?:[ \t\r\x0b\x0c\x1c-\x1f]|' + UNICODE_SPACE.pattern + rb')*'
+    rb'(?:\x1b\[[0-9;]*[mK])*(START|END)([^\n]*)')
+ANSI_ESCAPE_BYTES = re.compile(rb'\x1B\[[0-9;]*[mK]')
+
+
+def parse_session_range(text: str) -> slice:
+    """
+    Parses a session range in Python slice notation over the list of
+    sessions, oldest first: '3' is the fourth session, '-10:' the last ten,
+    '2:5' the third to fifth.
+    """
+    text = text.strip()
+    try:
+        if ':' not in text:
+            index = int(text)
+            return slice(index, index + 1 or None)
+        start, stop = text.split(':', 1)
+        return slice(int(start) if start.strip() else None, int(stop) if stop.strip() else None)
+    except ValueError:
+        raise ValueError(f"invalid session range: {text!r}") from None
+
+
+class Segment:
+    """
+    The lines in [start, end) of the log. label is the text after START for
+    a session, or None for lines outside any session. A session that has
+    not reached its END line yet is not closed.
+
+    Segments are stored as flat columns (translations, counts, severity
+    totals, strokes, severity histograms, suggestions and their counts), which load
+    several times faster than one dict per entry;
+    the aggregate is only rebuilt for the segments a query touches.
+    """
+
+    __slots__ = ('start', 'end', 'label', 'closed', '_aggregate', '_columns')
+
+    def __init__(self, start: int, end: int, label: Optional[str], closed: bool,
+                 aggregate: Optional[Aggregate] = None, columns: Optional[Tuple[tuple, ...]] = None):
+        self.start = start
+        self.end = end
+        self.label = label
+        self.closed = closed
+        self._aggregate = aggregate
+        self._columns = columns
+
+    @property
+    def is_session(self) -> bool:
+        return self.label is not None
+
+    @property
+    def aggregate(self) -> Aggregate:
+        if self._aggregate is None:
+            aggregate = Aggregate(self.start)
+            aggregate.entry_map = {
+                translation: {'count': count, 'total': total, 'strokes': strokes, 'severities': list(severities),
+                              'suggestions': dict(zip(suggestions, suggestion_counts))}
+                for translation, count, total, strokes, severities, suggestions, suggestion_counts
+                in zip(*self._columns)
+            }
+            self._aggregate = aggregate
+        return self._aggregate
+
+    def state(self) -> Tuple[Any, ...]:
+        if self._columns is None:
+            entry_map = self._aggregate.entry_map
+            self._columns = (
+                tuple(entry_map),
+                tuple(data['count'] for data in entry_map.values()),
+                tuple(data['total'] for data in entry_map.values()),
+                tuple(data['strokes'] for data in entry_map.values()),
+                tuple(tuple(data['severities']) for data in entry_map.values()),
+                tuple(tuple(data['suggestions']) for data in entry_map.values()),
+                tuple(tuple(data['suggestions'].values()) for data in entry_map.values()),
+            )
+        return self.start, self.end, self.label, self.closed, self._columns
+
+    @classmethod
+    def from_state(cls, state: Tuple[Any, ...]) -> 'Segment':
+        start, end, label, closed, columns = state
+        return cls(start, end, label, closed, columns=columns)
+
+
+def scan_segments(buffer, start: int, end: int) -> List[Segment]:
+    """
+    Splits the complete lines in buffer[start:end] into segments and
+    aggregates each of them. start must be the beginning of a line and
+    is taken to be outside any session.
+    """
+    spans = []  # (start, end, label, closed)
+    span_start, label = start, None
+    for marker in SESSION_MARKER.finditer(buffer, start, end):
+        if marker.group(1) == b'START':
+            spans.append((span_start, marker.start(), label, False))
+            span_start = marker.start()
+            label = ANSI_ESCAPE_BYTES.sub(b'', marker.group(2)).decode('utf-8').strip()
+        else:
+            line_end = min(end, marker.end() + 1)
+            spans.append((span_start, line_end, label, label is not None))
+            span_start, label = line_end, None
+    spans.append((span_start, end, label, False))
+
+    segments = []
+    for span_start, span_end, label, closed in spans:
+        aggregate = Aggregate(span_start).update(iter_entries_buffer(buffer, span_start, span_end))
+        # Lines outside sessions are only kept when they hold entries
+        if label is not None or aggregate.entry_map:
+            segments.append(Segment(span_start, span_end, label, closed, aggregate))
+    return segments
+
+
+class SessionIndex:
+    """
+    The segments of a log up to offset, the end of its last complete line.
+    """
+
+    def __init__(self, file_path: str, segments: Optional[List[Segment]] = None, offset: int = 0):
+        self.file_path = file_path
+        self.segments = segments if segments is not None else []
+        self.offset = offset
+
+    @property
+    def sessions(self) -> List[Segment]:
+        return [segment for segment in self.segments if segment.is_session]
+
+    def update(self) -> bool:
+        """
+        Indexes the lines appended since the last update. The last segment
+        is parsed again unless it is a closed session, since more of it
+        may have been written. Returns whether anything changed.
+        """
+        end = last_line_end(self.file_path)
+        if end <= self.offset:
+            return False
+        resume = self.offset
+        if self.segments and not self.segments[-1].closed:
+            resume = self.segments.pop().start
+
+        with open(self.file_path, 'rb') as file:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                self.segments.extend(scan_segments(buffer, resume, end))
+        self.offset = end
+        return True
+
+    def aggregate(self, sessions: slice = slice(None)) -> Aggregate:
+        """
+        Merges the aggregates of the sessions selected by the slice, counted
+        over sessions only, oldest first.
+        """
+        merged = Aggregate()
+        for segment in self.sessions[sessions]:
+            merged.merge(segment.aggregate)
+        return merged
+
+
+class SessionIndexCache(AggregateCache):
+    """
+    Stores session indexes beside the aggregate cache entries.
+    """
+
+    suffix = '.sessions'
+    magic = b'CLPS'
+    version = INDEX_VERSION
+
+    def load(self, file_path: str) -> Optional[SessionIndex]:
+        state = self.read_state(file_path)
+        if state is None:
+            return None
+        return SessionIndex(file_path, [Segment.from_state(s) for s in state['segments']], state['offset'])
+
+    def store(self, index: SessionIndex):
+        self.write_state(index.file_path, index.offset,
+                         {'segments': [segment.state() for segment in index.segments]})
+
+
+def open_session_index(file_path: str, cache: Optional[SessionIndexCache] = None) -> SessionIndex:
+    """
+    Loads the session index of file_path from the cache when it is still
+    valid, brings it up to date and stores it again.
+    """
+    index = cache.load(file_path) if cache is not None else None
+    if index is None:
+        index = SessionIndex(file_path)
+    if index.update() and cache is not None:
+        try:
+            cache.store(index)
+        except OSError:
+            pass  # a read-only cache directory only costs the next scan
+    return index
@@ -0,0 +1,107 @@
+"""
+The GUI's warm start: the last analyzed log and the top rows it showed.
+
+When the GUI finishes loading a log, and again when it closes, it saves
+the first SNAPSHOT_ROWS rows of the table as it was shown, with their
+entries, the log's size and mtime and the sort column. On the next
+launch those rows are painted before anything else happens; the log is
+then loaded in the background through the aggregate cache, which only
+parses what was appended since, and its rows replace the snapshot.
+
+Like the cache, a snapshot is zlib-compressed marshal data, so loading
+never executes code. A snapshot whose entries predate the current
+CACHE_VERSION layout is ignored.
+"""
+
+import marshal
+import os
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from .cache import CACHE_VERSION, default_cache_dir
+from .core import Row
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MAGIC = b'CLPW'
+SNAPSHOT_ROWS = 500
+
+
+class Snapshot(NamedTuple):
+    log: str
+    size: int
+    mtime_ns: int
+    translations: int               # rows in the full table, not just the saved ones
+    rows: List[Row]
+    sort_column: Optional[str]
+    sort_reverse: bool
+
+    def unchanged(self) -> bool:
+        """
+        Whether the log still has the size and mtime it had when saved.
+        """
+        try:
+            stat = os.stat(self.log)
+        except OSError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+
+def _header() -> bytes:
+    # Snapshot rows hold aggregate entries, so they follow the cache's layout
+    return bytes((SNAPSHOT_VERSION, CACHE_VERSION, marshal.version))
+
+
+def default_snapshot_path() -> Path:
+    return default_cache_dir() / 'last_session.snapshot'
+
+
+def save_snapshot(file_path: str, rows: Sequence[Row], translations: int, sort_column: Optional[str] = None,
+                  sort_reverse: bool = False, snapshot_path: Optional[str] = None):
+    """
+    Stores the first SNAPSHOT_ROWS of rows, in order, as the view of
+    file_path to restore on the next launch.
+    """
+    path = Path(snapshot_path) if snapshot_path else default_snapshot_path()
+    stat = os.stat(file_path)
+    state: Dict[str, Any] = {
+        'log': os.path.abspath(file_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'translations': translations,
+        'rows': [(row.translation, row.entry) for row in rows[:SNAPSHOT_ROWS]],
+        'sort_column': sort_column,
+        'sort_reverse': sort_reverse,
+    }
+    payload = SNAPSHOT_MAGIC + _header() + zlib.compress(marshal.dumps(state), 1)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_snapshot(snapshot_path: Optional[str] = None) -> Optional[Snapshot]:
+    """
+    The last saved snapshot, or None when there is none, it cannot be
+    read, or its log no longer exists.
+    """
+    path = Path(snapshot_path) if snapshot_path else default_snapshot_path()
+    try:
+        with open(path, 'rb') as file:
+            if file.read(len(SNAPSHOT_MAGIC) + 3) != SNAPSHOT_MAGIC + _header():
+                return None
+            state = marshal.loads(zlib.decompress(file.read()))
+    except (OSError, ValueError, EOFError, TypeError, zlib.error):
+        return None
+    if not os.path.exists(state['log']):
+        return None
+    return Snapshot(state['log'], state['size'], state['mtime_ns'], state['translations'],
+                    [Row(translation, entry) for translation, entry in state['rows']],
+                    state['sort_column'], state['sort_reverse'])
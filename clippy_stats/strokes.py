@@ -0,0 +1,240 @@
+"""
+Shortest outlines from Plover's JSON dictionaries.
+
+A StrokeIndex maps each translation to the fewest strokes any reachable
+outline takes. Dictionaries are stacked the way Plover stacks them: the
+first one listed wins, so an outline a higher-priority dictionary
+defines hides the same outline in the ones below it.
+
+Parsing a large dictionary takes a noticeable fraction of a second, so
+the index is stored in the cache directory, keyed by the dictionaries'
+paths, sizes and mtimes, as the sorted translations joined by NULs plus
+one byte of stroke count each. Loading that is one decompress and one
+split; lookups bisect the sorted list instead of building a dict.
+"""
+
+import configparser
+import hashlib
+import importlib.util
+import json
+import os
+import struct
+import tempfile
+import zlib
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .cache import AggregateCache
+
+STROKES_VERSION = 1
+MAX_STROKES = 255  # stored in one byte
+
+
+def plover_config_path() -> Path:
+    if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+        return Path(os.environ['LOCALAPPDATA']) / 'plover' / 'plover' / 'plover.cfg'
+    base = os.environ.get('XDG_CONFIG_HOME') or Path.home() / '.config'
+    return Path(base) / 'plover' / 'plover.cfg'
+
+
+def resolve_dictionary(entry: str, config_dir: Path) -> Optional[str]:
+    """
+    The file a dictionary entry in Plover's config names. Relative paths
+    are relative to the config directory. Plover 4 lists its bundled
+    dictionaries as 'asset:plover:assets/main.json', a resource of the
+    plover package; None when that package is not importable here.
+    """
+    if entry.startswith('asset:'):
+        package, _, resource = entry[len('asset:'):].partition(':')
+        try:
+            spec = importlib.util.find_spec(package)  # locates, without importing Plover
+        except (ImportError, ValueError):
+            return None
+        if spec is None or not spec.submodule_search_locations:
+            return None
+        return str(Path(list(spec.submodule_search_locations)[0]) / resource)
+    return str(config_dir / os.path.expanduser(entry))
+
+
+def plover_dictionaries(config_path: Optional[str] = None) -> List[str]:
+    """
+    The enabled JSON dictionaries in Plover's config that exist here,
+    highest priority first, or [] when there is no readable config.
+    """
+    path = Path(config_path) if config_path else plover_config_path()
+    config = configparser.RawConfigParser()
+    try:
+        config.read(path, encoding='utf-8')
+    except (configparser.Error, UnicodeDecodeError):
+        return []
+    paths = []
+    for section in config.sections():
+        if not section.startswith('System: ') or not config.has_option(section, 'dictionaries'):
+            continue
+        try:
+            entries = json.loads(config.get(section, 'dictionaries'))
+        except ValueError:
+            continue
+        for entry in entries:
+            # Older configs list bare paths
+            if isinstance(entry, dict):
+                if not entry.get('enabled', True):
+                    continue
+                entry = entry.get('path')
+            if isinstance(entry, str) and entry.lower().endswith('.json'):
+                resolved = resolve_dictionary(entry, path.parent)
+                if resolved is not None and os.path.isfile(resolved):
+                    paths.append(resolved)
+    return paths
+
+
+class StrokeIndex:
+    """
+    Sorted translations and the fewest strokes each takes.
+    """
+
+    def __init__(self, translations: Sequence[str] = (), strokes: Optional[array] = None):
+        self.translations = translations
+        self.strokes = strokes if strokes is not None else array('B')
+
+    @classmethod
+    def build(cls, paths: Iterable[str], errors: Optional[List[str]] = None) -> 'StrokeIndex':
+        """
+        Reads the JSON dictionaries in paths, highest priority first. With
+        an errors list, a dictionary that cannot be read is skipped and
+        why is appended to it; otherwise it raises OSError or ValueError.
+        """
+        defined = set()
+        best: Dict[str, int] = {}
+        for path in paths:
+            try:
+                with open(path, encoding='utf-8') as file:
+                    dictionary = json.load(file)
+                if not isinstance(dictionary, dict):
+                    raise ValueError(f"{path} is not a Plover JSON dictionary")
+            except (OSError, ValueError) as e:
+                if errors is None:
+                    raise
+                errors.append(f"{path}: {e}")
+                continue
+            for outline, translation in dictionary.items():
+                if outline in defined or not isinstance(translation, str) or '\0' in translation:
+                    continue
+                defined.add(outline)
+                strokes = min(outline.count('/') + 1, MAX_STROKES)
+                if strokes < best.get(translation, MAX_STROKES + 1):
+                    best[translation] = strokes
+        translations = sorted(best)
+        return cls(translations, array('B', [best[translation] for translation in translations]))
+
+    def __len__(self) -> int:
+        return len(self.translations)
+
+    def get(self, translation: str) -> Optional[int]:
+        i = bisect_left(self.translations, translation)
+        if i < len(self.translations) and self.translations[i] == translation:
+            return self.strokes[i]
+        return None
+
+    def annotate(self, entries: Iterable[Tuple[str, Dict[str, Any]]]):
+        """
+        Sets 'best' on each (translation, entry) pair, such as an
+        aggregate's entry_map.items(); Row.strokes_saved measures against
+        it. Translations the dictionaries lack keep Clippy's suggestions
+        as their measure.
+        """
+        for translation, entry in entries:
+            best = self.get(translation)
+            if best is None:
+                entry.pop('best', None)
+            else:
+                entry['best'] = best
+
+    def to_bytes(self) -> bytes:
+        text = '\0'.join(self.translations).encode('utf-8', 'surrogatepass')
+        return struct.pack('<I', len(self.strokes)) + self.strokes.tobytes() + text
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'StrokeIndex':
+        count, = struct.unpack_from('<I', data)
+        strokes = array('B', data[4:4 + count])
+        text = data[4 + count:].decode('utf-8', 'surrogatepass')
+        translations = text.split('\0') if count else []
+        if len(translations) != count:
+            raise ValueError("corrupt stroke index")
+        return cls(translations, strokes)
+
+
+class StrokeIndexCache(AggregateCache):
+    """
+    Stores stroke indexes beside the aggregate cache entries, one per set
+    of dictionaries.
+    """
+
+    suffix = '.strokes'
+    magic = b'CLPD'
+    version = STROKES_VERSION
+
+    def index_path(self, paths: Sequence[str]) -> Path:
+        key = hashlib.sha1()
+        for path in paths:
+            try:
+                stat = os.stat(path)
+                version = f"{stat.st_size}\0{stat.st_mtime_ns}"
+            except OSError:
+                version = "missing"  # skipped by build(); listed so that its return rebuilds
+            key.update(f"{os.path.abspath(path)}\0{version}\0".encode('utf-8', 'surrogateescape'))
+        return self.directory / (key.hexdigest() + self.suffix)
+
+    def load(self, paths: Sequence[str]) -> Optional[StrokeIndex]:
+        index_path = self.index_path(paths)
+        try:
+            with open(index_path, 'rb') as file:
+                if file.read(len(self.magic) + 1) != self.magic + bytes((self.version,)):
+                    raise ValueError("stale stroke index format")
+                index = StrokeIndex.from_bytes(zlib.decompress(file.read()))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error, zlib.error):
+            try:
+                os.unlink(index_path)
+            except OSError:
+                pass
+            return None
+        os.utime(index_path)
+        return index
+
+    def store(self, paths: Sequence[str], index: StrokeIndex):
+        payload = self.magic + bytes((self.version,)) + zlib.compress(index.to_bytes(), 1)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(payload)
+            os.replace(tmp_path, self.index_path(paths))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.evict()
+
+
+def load_stroke_index(paths: Sequence[str], cache: Optional[StrokeIndexCache] = None,
+                      errors: Optional[List[str]] = None) -> StrokeIndex:
+    """
+    The stroke index of the dictionaries in paths, highest priority first,
+    from the cache when none of them changed since it was stored. errors
+    is passed to StrokeIndex.build; an index that skipped a dictionary is
+    not cached, so the next load reports the error again.
+    """
+    index = cache.load(paths) if cache is not None else None
+    if index is None:
+        skipped = len(errors) if errors is not None else 0
+        index = StrokeIndex.build(paths, errors)
+        if cache is not None and (errors is None or len(errors) == skipped):
+            try:
+                cache.store(paths, index)
+            except OSError:
+                pass  # a read-only cache directory only costs the next build
+    return index
@@ -0,0 +1,120 @@
+"""
+Sorted views over ranked rows, without touching Tk.
+
+RowIndex builds one permutation per column the first time it is asked
+for and keeps it until the rows change. Ascending and descending views
+share that permutation; descending simply walks it backwards.
+
+A view can also be narrowed to a subset of the rows, such as the matches
+of a search.SearchIndex, keeping the subset in the column's order.
+"""
+
+from array import array
+from collections import deque
+from itertools import compress, repeat
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Sequence
+
+from .core import Row
+
+SORT_KEYS = {
+    'Translation': 'translation',
+    'Suggestions': 'suggestions',
+    'Severity': 'severity',
+    'Count': 'count',
+    'Score': 'score',
+    'Strokes saved': 'strokes_saved',
+}
+
+
+class SortedRows(Sequence):
+    """
+    rows seen through a permutation, optionally reversed. Indexing is O(1),
+    so a VirtualTable can render any window of it directly.
+    """
+
+    def __init__(self, rows: Sequence[Any], order: Sequence[int], reverse: bool = False):
+        self.rows = rows
+        self.order = order
+        self.reverse = reverse
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        length = len(self.order)
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            # Sequence iteration stops here; a reversed view would wrap around
+            raise IndexError('row index out of range')
+        if self.reverse:
+            index = length - 1 - index
+        return self.rows[self.order[index]]
+
+
+class RowIndex:
+    """
+    Lazily built, cached sort permutations over a list of rows. keys maps
+    each column to the row attribute it sorts by.
+    """
+
+    def __init__(self, rows: List[Row], keys: Dict[str, str] = SORT_KEYS):
+        self.rows = rows
+        self.keys = keys
+        self.orders: Dict[str, array] = {}
+        self.inverses: Dict[str, array] = {}
+
+    def invalidate(self):
+        self.orders.clear()
+        self.inverses.clear()
+
+    def order(self, column: str) -> array:
+        order = self.orders.get(column)
+        if order is None or len(order) != len(self.rows):
+            keys = list(map(attrgetter(self.keys[column]), self.rows))
+            order = self.orders[column] = array('I', sorted(range(len(keys)), key=keys.__getitem__))
+        return order
+
+    def inverse(self, column: str) -> array:
+        """
+        The place of each row in order(column).
+        """
+        order = self.order(column)
+        inverse = self.inverses.get(column)
+        if inverse is None or len(inverse) != len(order):
+            inverse = self.inverses[column] = array('I', [0]) * len(order)
+            for place, row in enumerate(order):
+                inverse[row] = place
+        return inverse
+
+    def subset_order(self, column: str, subset: Sequence[int]) -> array:
+        """
+        The rows in subset, given as positions, in order(column).
+        """
+        order = self.order(column)
+        if len(subset) == len(order):
+            return order
+        if len(subset) * 8 < len(order):
+            return array('I', sorted(subset, key=self.inverse(column).__getitem__))
+        # A large subset is cheaper to pick out of the full order with a mask
+        mask = bytearray(len(order))
+        deque(map(mask.__setitem__, subset, repeat(1)), maxlen=0)
+        return array('I', compress(order, map(mask.__getitem__, order)))
+
+    def view(self, column: Optional[str], reverse: bool = False,
+             subset: Optional[Sequence[int]] = None) -> Sequence[Row]:
+        """
+        The rows sorted by column, or in their original (ranked) order when
+        column is None. subset, the ascending positions of the rows to
+        keep, narrows the view.
+        """
+        if subset is None:
+            if column is None:
+                return self.rows
+            return SortedRows(self.rows, self.order(column), reverse)
+        if column is None:
+            return SortedRows(self.rows, subset, reverse)
+        return SortedRows(self.rows, self.subset_order(column, subset), reverse)
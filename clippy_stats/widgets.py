@@ -0,0 +1,153 @@
+"""
+Tk widgets shared by the Clippy Analyzer front-ends.
+"""
+
+from tkinter import font as tkfont
+from tkinter import ttk
+from typing import Any, Callable, Optional, Sequence
+
+from .core import row_values
+
+
+class VirtualTable:
+    """
+    A Treeview that shows a window onto a Python sequence of rows.
+
+    Only the rows that fit on screen (plus a small buffer) exist as Tk
+    items. Scrolling re-fills those items from `rows`, so building and
+    scrolling cost the same for a hundred rows or a million. The
+    scrollbar is driven from the row count rather than the Treeview.
+    """
+
+    buffer = 2
+
+    def __init__(self, parent, columns: Sequence[str], height: int = 15,
+                 formatter: Callable[[Any], Sequence[Any]] = row_values):
+        self.tree = ttk.Treeview(parent, columns=columns, show='headings', height=height,
+                                 selectmode='browse')
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.yview)
+        self.formatter = formatter
+        self.rows: Sequence[Any] = ()
+        self.top = 0
+        self.visible = height
+        self.items = []
+        self.selected: Optional[int] = None
+
+        self.tree.bind('<Configure>', self._on_configure)
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self._scroll_by(-3))
+        self.tree.bind('<Button-5>', lambda e: self._scroll_by(3))
+        for key, step in (('<Up>', -1), ('<Down>', 1), ('<Prior>', None), ('<Next>', None),
+                          ('<Home>', None), ('<End>', None)):
+            self.tree.bind(key, lambda e, k=key, s=step: self._on_key(k, s))
+
+    def set_rows(self, rows: Sequence[Any], keep_position: bool = False):
+        """
+        Shows a new sequence of rows. With keep_position the scroll offset
+        is kept, e.g. when the same rows are shown in a different order.
+        """
+        self.rows = rows
+        if keep_position:
+            self.refresh()
+            return
+        self.top = 0
+        self.selected = None
+        self.render()
+
+    def refresh(self):
+        """
+        Re-renders the current window, e.g. after rows changed in place.
+        """
+        self.top = max(0, min(self.top, len(self.rows) - self.visible))
+        self.render()
+
+    def render(self):
+        count = max(0, min(self.visible + self.buffer, len(self.rows) - self.top))
+        while len(self.items) < count:
+            self.items.append(self.tree.insert('', 'end'))
+        if len(self.items) > count:
+            self.tree.delete(*self.items[count:])
+            del self.items[count:]
+
+        for offset, iid in enumerate(self.items):
+            self.tree.item(iid, values=self.formatter(self.rows[self.top + offset]))
+
+        if self.selected is not None and 0 <= self.selected - self.top < count:
+            self.tree.selection_set(self.items[self.selected - self.top])
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+        self.tree.yview_moveto(0)
+
+        total = len(self.rows)
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, top: int):
+        top = max(0, min(top, len(self.rows) - self.visible))
+        if top != self.top:
+            self.top = top
+            self.render()
+
+    def yview(self, *args):
+        if args[0] == 'moveto':
+            self.scroll_to(round(float(args[1]) * len(self.rows)))
+        elif args[0] == 'scroll':
+            amount = int(args[1])
+            self._scroll_by(amount * self.visible if args[2] == 'pages' else amount)
+
+    def _scroll_by(self, amount: int):
+        self.scroll_to(self.top + amount)
+        return 'break'
+
+    def _row_height(self) -> int:
+        style = ttk.Style()
+        configured = style.lookup('Treeview', 'rowheight')
+        if configured:
+            return int(configured)
+        font = style.lookup('Treeview', 'font') or 'TkDefaultFont'
+        return tkfont.Font(font=font).metrics('linespace') + 4
+
+    def _on_configure(self, event):
+        row_height = self._row_height()
+        # The heading takes roughly one row
+        visible = max(1, event.height // row_height - 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.refresh()
+
+    def _on_select(self, event):
+        selection = self.tree.selection()
+        if selection and selection[0] in self.items:
+            self.selected = self.top + self.items.index(selection[0])
+
+    def _on_mousewheel(self, event):
+        if event.delta:
+            step = -event.delta // 120 if abs(event.delta) >= 120 else -event.delta
+            return self._scroll_by(step * 3)
+        return 'break'
+
+    def _on_key(self, key: str, step: Optional[int]):
+        if not self.rows:
+            return 'break'
+        current = self.selected if self.selected is not None else self.top
+        if key == '<Prior>':
+            target = current - self.visible
+        elif key == '<Next>':
+            target = current + self.visible
+        elif key == '<Home>':
+            target = 0
+        elif key == '<End>':
+            target = len(self.rows) - 1
+        else:
+            target = current + step
+        self.selected = max(0, min(target, len(self.rows) - 1))
+
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + self.visible:
+            self.top = self.selected - self.visible + 1
+        self.render()
+        return 'break'